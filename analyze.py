@@ -3,7 +3,9 @@ from pathlib import Path
 sys.path.append(str(Path(__file__).parent))
 
 import pandas as pd
-from src.inference import load_model, get_recommendations, search_titles
+from src.inference import (load_model, get_recommendations, get_text_recommendations,
+                           search_titles, suggest_titles)
+from src.artifacts import open_artifacts
 import logging
 
 logging.basicConfig(level=logging.INFO)
@@ -16,19 +18,23 @@ def interactive_recommend():
     logger.info("="*70 + "\n")
     
     df, sim, index_map = load_model()
+    model = None
     
     while True:
         print("\nOptions:")
         print("  1. Search titles")
         print("  2. Get recommendations")
         print("  3. Show sample titles")
-        print("  4. Exit")
+        print("  4. Recommend from a description")
+        print("  5. Exit")
         
-        choice = input("\nSelect (1-4): ").strip()
+        choice = input("\nSelect (1-5): ").strip()
         
         if choice == '1':
             query = input("Search: ").strip()
-            results = search_titles(query, df)
+            if model is None:
+                model = open_artifacts()
+            results = search_titles(query, df, model.title_search)
             print(f"\n🔍 Found {len(results)} results:")
             print(results.to_string(index=False))
             
@@ -46,6 +52,12 @@ def interactive_recommend():
                     print(f"   Genre: {row['listed_in']}")
             else:
                 print("\n❌ Title not found. Try searching first.")
+                if model is None:
+                    model = open_artifacts()
+                if model.title_search is not None:
+                    suggestions = suggest_titles(title, df, model.title_search)
+                    if suggestions:
+                        print(f"💡 Did you mean: {', '.join(suggestions)}")
                     
         elif choice == '3':
             sample = df.sample(20)['title'].tolist()
@@ -54,28 +66,46 @@ def interactive_recommend():
                 print(f"   {i}. {title}")
                 
         elif choice == '4':
+            query = input("Describe: ").strip()
+            if model is None:
+                model = open_artifacts()
+            if model.matrix is None:
+                print("\n❌ This model has no tfidf_matrix.npz. Re-run 'python main.py'.")
+                continue
+            recs = get_text_recommendations(query, df, model.vectorizer, model.matrix, top_k=5)
+            if recs is not None:
+                print(recs[['title', 'type', 'release_year', 'similarity_score']].to_string(index=False))
+            else:
+                print("\n❌ No matching titles for that description.")
+                
+        elif choice == '5':
             print("\n👋 Goodbye!\n")
             break
         else:
-            print("❌ Please select 1-4")
+            print("❌ Please select 1-5")
 
 def analyze_specific_title(title):
     """Analyze specific title"""
-    df, sim, index_map = load_model()
+    model = open_artifacts()
+    df, index_map = model.catalog, model.title_index
     
     print(f"\n🔎 Analyzing: {title}")
     print("="*70)
     
     if title not in index_map:
         print("❌ Title not found")
-        print("\n💡 Try searching instead:")
-        results = search_titles(title, df)
+        if model.title_search is not None:
+            results = search_titles(title, df, model.title_search, limit=10)
+            print("\n💡 Did you mean:")
+        else:
+            results = search_titles(title, df.take(None, ['title', 'type', 'release_year', 'rating']))
+            print("\n💡 Try searching instead:")
         if len(results) > 0:
             print(results[['title', 'type', 'release_year']].head(10).to_string(index=False))
         return
     
     idx = index_map[title]
-    content = df.iloc[idx]
+    content = df.row(idx)
     
     print(f"\n📌 Information:")
     print(f"   Title: {content['title']}")
@@ -91,7 +121,7 @@ def analyze_specific_title(title):
     print(f"\n🎯 Top 10 Similar Recommendations:")
     print("-" * 70)
     
-    recs = get_recommendations(title, df, sim, index_map, top_k=10)
+    recs = get_recommendations(title, df, model.sim, index_map, top_k=10)
     if recs is not None:
         print(recs[['title', 'type', 'release_year', 'similarity_score', 'listed_in']].to_string(index=False))
     print()
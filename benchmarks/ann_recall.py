@@ -0,0 +1,52 @@
+"""Recall@K / speed report of the LSH engine against exact cosine top-K.
+
+Usage:
+    python benchmarks/ann_recall.py --top-k 10 --sample 2000
+"""
+import sys
+import argparse
+import json
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.artifacts import open_artifacts
+from src.ann import ann_recall_report
+
+GRID = [
+    {"n_tables": 8, "n_bits": 14, "n_probes": 2},
+    {"n_tables": 16, "n_bits": 10, "n_probes": 2},
+    {"n_tables": 16, "n_bits": 8, "n_probes": 2},
+    {"n_tables": 32, "n_bits": 8, "n_probes": 2},
+    {"n_tables": 32, "n_bits": 6, "n_probes": 1},
+    {"n_tables": 64, "n_bits": 8, "n_probes": 2},
+]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--sample", type=int, default=2000)
+    parser.add_argument("--output", default="outputs/ann_recall_report.json")
+    args = parser.parse_args()
+
+    model = open_artifacts()
+    if model.matrix is None:
+        sys.exit("❌ Model has no tfidf_matrix.npz, run 'python main.py' first")
+
+    # ใช้ dense matrix จาก build_tfidf เป็น baseline ถ้ามี ไม่งั้นคำนวณ exact จาก matrix
+    exact = model.sim if model.manifest["similarity_mode"] == "dense" else None
+    report = ann_recall_report(model.matrix, GRID, exact=exact, top_k=args.top_k, sample=args.sample)
+
+    print(f"\n{model.matrix.shape[0]:,} titles | recall@{args.top_k} on {args.sample} sampled queries")
+    print(f"{'tables':>7} {'bits':>5} {'probes':>6} {'recall':>7} {'cands':>8} {'q/s':>9} {'exact q/s':>10}")
+    for r in report:
+        print(f"{r['n_tables']:>7} {r['n_bits']:>5} {r['n_probes']:>6} {r['recall_at_k']:>7.3f} "
+              f"{r['avg_candidates']:>8.0f} {r['queries_per_second']:>9,.0f} "
+              f"{r['exact_queries_per_second']:>10,.0f}")
+
+    Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n💾 {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""export_powerbi() time and peak memory on synthetic catalogs, against the old copy/apply/re-read export.
+
+Each run happens in a fresh process that first loads the preprocessed
+catalog from Parquet; "peak MB" is how far RSS rose above that during the
+export (exact on Linux, where the peak can be reset; elsewhere only growth
+beyond the loading peak is seen).
+
+Usage:
+    python benchmarks/bench_export.py --rows 100000 1000000
+"""
+import sys
+import argparse
+import logging
+import multiprocessing
+import resource
+import tempfile
+import time
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+
+import pandas as pd
+from src.load_data import load_netflix
+from src.preprocess import preprocess
+from src.export_powerbi import export_powerbi, clean_for_powerbi, COLUMN_ORDER, TEXT_COLUMNS
+from benchmarks.bench_preprocess import synthetic_catalog
+
+def copy_apply_export(df, output_file):
+    """The previous export: full copy, per-value clean, one to_csv, then a full re-read to count rows."""
+    df_export = df.copy()
+    for col in TEXT_COLUMNS:
+        df_export[col] = df_export[col].apply(clean_for_powerbi)
+    cols = [c for c in COLUMN_ORDER if c in df_export.columns]
+    df_export[cols].to_csv(output_file, index=False, encoding="utf-8-sig", quoting=1,
+                           escapechar='\\', doublequote=True, lineterminator='\n')
+    return len(pd.read_csv(output_file, encoding="utf-8-sig"))
+
+def _status_mb(field):
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1]) / 1024
+    return None
+
+def _reset_peak():
+    """Reset the peak RSS (VmHWM) to the current RSS; Linux only, False elsewhere."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+def _peak_mb():
+    # ru_maxrss เป็น KB บน Linux แต่เป็น byte บน macOS
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+def _run(method, parquet_file, output_file, queue):
+    logging.getLogger("src.export_powerbi").setLevel(logging.WARNING)
+    df = pd.read_parquet(parquet_file)
+    # นับเฉพาะหน่วยความจำที่เพิ่มจากตอน export ไม่รวม peak ตอนอ่าน parquet
+    hwm = _reset_peak()
+    before = _status_mb("VmRSS") if hwm else _peak_mb()
+    start = time.perf_counter()
+    if method == "streaming":
+        export_powerbi(df, output_file)
+    else:
+        copy_apply_export(df, output_file)
+    seconds = time.perf_counter() - start
+    queue.put((seconds, (_status_mb("VmHWM") if hwm else _peak_mb()) - before))
+
+def measure(method, parquet_file, output_file):
+    ctx = multiprocessing.get_context("spawn")
+    queue = ctx.Queue()
+    proc = ctx.Process(target=_run, args=(method, parquet_file, output_file, queue))
+    proc.start()
+    result = queue.get()
+    proc.join()
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[100000, 1000000])
+    args = parser.parse_args()
+
+    for name in ("src.load_data", "src.preprocess"):
+        logging.getLogger(name).setLevel(logging.WARNING)
+    base = load_netflix("data/netflix_titles.csv")
+
+    print(f"\n{'rows':>10} {'method':>11} {'seconds':>9} {'rows/s':>11} {'peak MB':>9} {'file MB':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for n_rows in args.rows:
+            parquet_file = Path(tmp) / "catalog.parquet"
+            preprocess(synthetic_catalog(base, n_rows)).to_parquet(parquet_file)
+            for method in ("copy-apply", "streaming"):
+                output_file = Path(tmp) / f"{method}.csv"
+                seconds, peak = measure(method, parquet_file, output_file)
+                size = output_file.stat().st_size / 1024 / 1024
+                print(f"{n_rows:>10,} {method:>11} {seconds:>9.2f} {n_rows / seconds:>11,.0f} "
+                      f"{peak:>9.0f} {size:>9.0f}")
+
+if __name__ == "__main__":
+    main()
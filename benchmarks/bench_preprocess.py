@@ -0,0 +1,58 @@
+"""preprocess() throughput on synthetic catalogs resampled from the real dataset.
+
+Usage:
+    python benchmarks/bench_preprocess.py --rows 10000 100000 1000000
+"""
+import sys
+import argparse
+import logging
+import time
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+
+import numpy as np
+import pandas as pd
+from src.preprocess import preprocess, clean_text, TEXT_COLUMNS
+
+def synthetic_catalog(base, n_rows, seed=42, dup_rate=0.01):
+    """n_rows sampled from base with fresh show_ids and ~dup_rate duplicated ids."""
+    rng = np.random.default_rng(seed)
+    df = base.iloc[rng.integers(0, len(base), n_rows)].reset_index(drop=True)
+    ids = np.char.add("s", np.arange(n_rows).astype(str))
+    dups = rng.random(n_rows) < dup_rate
+    ids[dups] = ids[rng.integers(0, n_rows, int(dups.sum()))]
+    df["show_id"] = ids
+    return df
+
+def rowwise_text(df):
+    """The old per-row clean_text callback, for comparison."""
+    text = df[TEXT_COLUMNS[0]].fillna("")
+    for col in TEXT_COLUMNS[1:]:
+        text = text + " " + df[col].fillna("")
+    return text.apply(clean_text)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    logging.getLogger("src.preprocess").setLevel(logging.WARNING)
+    base = pd.read_csv("data/netflix_titles.csv")
+
+    print(f"\n{'rows':>10} {'preprocess s':>13} {'rows/s':>12} {'row-wise text s':>16}")
+    for n_rows in args.rows:
+        df = synthetic_catalog(base, n_rows)
+        best = float("inf")
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            preprocess(df)
+            best = min(best, time.perf_counter() - start)
+
+        start = time.perf_counter()
+        rowwise_text(df)
+        rowwise_s = time.perf_counter() - start
+        print(f"{n_rows:>10,} {best:>13.3f} {n_rows / best:>12,.0f} {rowwise_s:>16.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""Benchmark recommendation throughput: per-title loop vs the batch API.
+
+Usage:
+    python benchmarks/bench_recommend.py --queries 5000 --top-k 10
+"""
+import sys
+import argparse
+import time
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+
+import numpy as np
+from src.artifacts import open_artifacts
+from src.inference import get_recommendations, get_recommendations_batch
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--queries", type=int, default=5000)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    model = open_artifacts()
+    catalog, sim, index_map = model.catalog, model.sim, model.title_index
+    rng = np.random.default_rng(args.seed)
+    positions = rng.integers(0, len(catalog), size=args.queries)
+    titles = [catalog.value("title", int(i)) for i in positions]
+
+    loop_n = min(len(titles), 500)
+    start = time.perf_counter()
+    for title in titles[:loop_n]:
+        get_recommendations(title, catalog, sim, index_map, top_k=args.top_k)
+    loop_qps = loop_n / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    get_recommendations_batch(titles, catalog, sim, index_map, top_k=args.top_k)
+    batch_qps = len(titles) / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    get_recommendations_batch(titles, catalog, sim, index_map, top_k=args.top_k, as_frame=True)
+    frame_qps = len(titles) / (time.perf_counter() - start)
+
+    print(f"\n{len(catalog):,} titles | mode={model.manifest['similarity_mode']} | top_k={args.top_k}")
+    print(f"  get_recommendations loop      : {loop_qps:>12,.0f} queries/s")
+    print(f"  get_recommendations_batch     : {batch_qps:>12,.0f} queries/s")
+    print(f"  get_recommendations_batch (df): {frame_qps:>12,.0f} queries/s")
+
+if __name__ == "__main__":
+    main()
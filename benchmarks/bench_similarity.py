@@ -0,0 +1,57 @@
+"""Benchmark blocked top-K similarity across worker counts.
+
+Usage:
+    python benchmarks/bench_similarity.py --workers 1 2 4 8 --rows 50000
+"""
+import sys
+import argparse
+import time
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+
+import os
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+from src.load_data import load_netflix
+from src.preprocess import preprocess
+from src.similarity import topk_neighbors, DEFAULT_TOP_K, DEFAULT_BLOCK_SIZE
+
+def build_matrix(rows, max_features):
+    """TF-IDF matrix of the real catalog, tiled up to the requested row count."""
+    texts = preprocess(load_netflix())["text"].tolist()
+    if rows and rows > len(texts):
+        texts = (texts * (rows // len(texts) + 1))[:rows]
+    elif rows:
+        texts = texts[:rows]
+    vectorizer = TfidfVectorizer(stop_words="english", max_features=max_features, dtype=np.float32)
+    return vectorizer.fit_transform(texts)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+",
+                        default=sorted({1, 2, 4, os.cpu_count() or 1}))
+    parser.add_argument("--rows", type=int, default=None)
+    parser.add_argument("--top-k", type=int, default=DEFAULT_TOP_K)
+    parser.add_argument("--block-size", type=int, default=DEFAULT_BLOCK_SIZE)
+    parser.add_argument("--max-features", type=int, default=5000)
+    args = parser.parse_args()
+
+    X = build_matrix(args.rows, args.max_features)
+    print(f"\nMatrix: {X.shape[0]:,} x {X.shape[1]:,} | top_k={args.top_k} | "
+          f"block_size={args.block_size} | cpus={os.cpu_count()}")
+    print(f"{'workers':>8} {'seconds':>10} {'rows/s':>12} {'speedup':>8} {'match':>6}")
+
+    baseline = None
+    for workers in args.workers:
+        start = time.perf_counter()
+        result = topk_neighbors(X, top_k=args.top_k, block_size=args.block_size, n_jobs=workers)
+        elapsed = time.perf_counter() - start
+
+        if baseline is None:
+            baseline = (elapsed, result)
+        match = np.array_equal(result.indices, baseline[1].indices)
+        print(f"{workers:>8} {elapsed:>10.2f} {X.shape[0] / elapsed:>12,.0f} "
+              f"{baseline[0] / elapsed:>7.2f}x {str(match):>6}")
+
+if __name__ == "__main__":
+    main()
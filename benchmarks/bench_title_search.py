@@ -0,0 +1,70 @@
+"""Latency of the title search index at catalog sizes well above the real one.
+
+Usage:
+    python benchmarks/bench_title_search.py --titles 100000 --queries 2000
+"""
+import sys
+import argparse
+import tempfile
+import time
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+
+import numpy as np
+import pandas as pd
+from src.title_search import write_title_search, TitleSearchIndex
+
+SUFFIXES = ["Part 2", "Returns", "The Movie", "Saga", "II", "Origins", "Chronicles", "Live"]
+
+def make_titles(base, n, rng):
+    """Real titles padded out with sequel-style variants up to n titles."""
+    extra = max(0, n - len(base))
+    picks = rng.integers(0, len(base), extra)
+    return base + [f"{base[i]} {rng.choice(SUFFIXES)}" for i in picks]
+
+def typo(title, rng):
+    """Drop one character to simulate a misspelled query."""
+    if len(title) < 4:
+        return title
+    i = rng.integers(1, len(title) - 1)
+    return title[:i] + title[i + 1:]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--titles", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    base = pd.read_csv("data/netflix_titles.csv")["title"].dropna().astype(str).tolist()
+    titles = make_titles(base, args.titles, rng)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        write_title_search(titles, tmp)
+        build_s = time.perf_counter() - start
+        index = TitleSearchIndex(Path(tmp) / "title_search")
+
+        sample = [titles[i] for i in rng.integers(0, len(base), args.queries)]
+        workloads = {
+            "exact": sample,
+            "prefix": [t[:max(2, len(t) // 3)] for t in sample],
+            "substring": [t.split()[-1] for t in sample],
+            "typo": [typo(t, rng) for t in sample],
+        }
+
+        print(f"\n{len(titles):,} titles | build {build_s:.2f}s")
+        print(f"{'workload':<10} {'p50 ms':>8} {'p99 ms':>8} {'top-1 hit':>10}")
+        for name, queries in workloads.items():
+            times, hits = [], 0
+            for query, expected in zip(queries, sample):
+                start = time.perf_counter()
+                positions, _, _ = index.search(query, args.limit)
+                times.append((time.perf_counter() - start) * 1000)
+                hits += len(positions) > 0 and titles[positions[0]] == expected
+            p50, p99 = np.percentile(times, [50, 99])
+            print(f"{name:<10} {p50:>8.3f} {p99:>8.3f} {hits / len(queries):>10.1%}")
+
+if __name__ == "__main__":
+    main()
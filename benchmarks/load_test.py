@@ -0,0 +1,75 @@
+"""Load-test the local recommendation service (start it first with `python serve.py`).
+
+Usage:
+    python benchmarks/load_test.py --requests 20000 --concurrency 64
+"""
+import sys
+import argparse
+import asyncio
+import json
+import time
+from pathlib import Path
+from urllib.parse import quote
+sys.path.append(str(Path(__file__).parent.parent))
+
+import numpy as np
+from src.artifacts import open_artifacts
+
+async def _request(reader, writer, path):
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode())
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while (line := await reader.readline()) not in (b"\r\n", b""):
+        if line.lower().startswith(b"content-length"):
+            length = int(line.split(b":")[1])
+    return status, await reader.readexactly(length)
+
+async def _client(host, port, paths, latencies, statuses):
+    reader, writer = await asyncio.open_connection(host, port)
+    for path in paths:
+        start = time.perf_counter()
+        status, _ = await _request(reader, writer, path)
+        latencies.append((time.perf_counter() - start) * 1000)
+        statuses[status] = statuses.get(status, 0) + 1
+    writer.close()
+
+async def run(args):
+    catalog = open_artifacts().catalog
+    rng = np.random.default_rng(args.seed)
+    # ชุด title ที่ถูกถามบ่อยจำกัดไว้ที่ --hot เพื่อให้เห็นผลของ cache
+    hot = rng.integers(0, len(catalog), size=args.hot)
+    picks = rng.choice(hot, size=args.requests)
+    paths = [f"/recommend?title={quote(catalog.value('title', int(i)))}&top_k={args.top_k}"
+             for i in picks]
+
+    latencies, statuses = [], {}
+    chunks = [paths[i::args.concurrency] for i in range(args.concurrency)]
+    start = time.perf_counter()
+    await asyncio.gather(*(_client(args.host, args.port, c, latencies, statuses) for c in chunks))
+    elapsed = time.perf_counter() - start
+
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    print(f"\n{args.requests:,} requests | concurrency {args.concurrency} | {elapsed:.2f} s")
+    print(f"  throughput : {args.requests / elapsed:,.0f} req/s")
+    print(f"  latency    : p50 {p50:.2f} ms | p95 {p95:.2f} ms | p99 {p99:.2f} ms")
+    print(f"  statuses   : {statuses}")
+
+    reader, writer = await asyncio.open_connection(args.host, args.port)
+    _, body = await _request(reader, writer, "/metrics")
+    writer.close()
+    print(f"  server     : {json.dumps(json.loads(body), indent=2)}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--hot", type=int, default=2000, help="Distinct titles queried")
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=42)
+    asyncio.run(run(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+"""Time and memory of every pipeline stage on synthetic catalogs of increasing size.
+
+For each size a fresh process generates a synthetic catalog (see
+benchmarks/synthetic.py) in a temporary working directory and runs
+load_netflix, preprocess, generate_all_plots, export_powerbi, build_tfidf,
+get_recommendations and export_all_recommendations in order, recording
+wall time, CPU time (including finished worker processes), peak RSS above
+the stage's starting RSS (this process only; Linux) and rows per second.
+The report is written as JSON; pass an earlier report as --baseline to
+see the change per stage.
+
+Usage:
+    python benchmarks/suite.py --rows 10000 100000 1000000
+    python benchmarks/suite.py --rows 10000 100000 --baseline outputs/benchmarks/suite_<old>.json
+"""
+import sys
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+
+REPORT_DIR = Path("outputs/benchmarks")
+
+def _status_mb(field):
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+def _reset_peak():
+    """Reset the peak RSS (VmHWM) to the current RSS; Linux only, False elsewhere."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+def _cpu_seconds():
+    t = os.times()
+    return t.user + t.system + t.children_user + t.children_system
+
+def measure(func, rows):
+    """Run func() and return (result, metrics); rows is the number of items it processes."""
+    hwm = _reset_peak()
+    rss = _status_mb("VmRSS")
+    wall, cpu = time.perf_counter(), _cpu_seconds()
+    result = func()
+    wall, cpu = time.perf_counter() - wall, _cpu_seconds() - cpu
+    peak = _status_mb("VmHWM") if hwm else None
+    return result, {
+        "rows": rows,
+        "seconds": wall,
+        "cpu_seconds": cpu,
+        "rows_per_s": rows / wall if wall > 0 else None,
+        "peak_rss_mb": peak - rss if peak is not None else None,
+        "rss_mb": rss,
+    }
+
+def run_size(n_rows, options, workdir):
+    """All stages on one synthetic catalog, inside workdir; returns {stage: metrics}."""
+    import numpy as np
+    from benchmarks.synthetic import write_synthetic_csv
+    repo = Path(__file__).resolve().parent.parent
+    os.chdir(workdir)
+    logging.disable(logging.WARNING)
+
+    from src.load_data import load_netflix
+    from src.preprocess import preprocess
+    from src.eda import generate_all_plots
+    from src.export_powerbi import export_powerbi
+    from src.model_tfidf import build_tfidf
+    from src.artifacts import open_artifacts
+    from src.inference import get_recommendations
+    from export_recs import export_all_recommendations
+
+    csv = write_synthetic_csv("data/catalog.csv", n_rows, options["seed"], repo / "data" / "netflix_titles.csv")
+    report = {}
+    raw, report["load_netflix"] = measure(lambda: load_netflix(csv), n_rows)
+    df, report["preprocess"] = measure(lambda: preprocess(raw), len(raw))
+    del raw
+    _, report["generate_all_plots"] = measure(lambda: generate_all_plots(df, workers=options["workers"]), len(df))
+    _, report["export_powerbi"] = measure(lambda: export_powerbi(df), len(df))
+    _, report["build_tfidf"] = measure(
+        lambda: build_tfidf(df, mode="topk", top_k=options["top_k"], n_jobs=options["workers"]), len(df))
+    del df
+
+    model = open_artifacts()
+    positions = np.random.default_rng(options["seed"]).integers(0, len(model), options["queries"])
+    titles = [model.catalog.value("title", int(i)) for i in positions]
+
+    def recommend():
+        for title in titles:
+            get_recommendations(title, model.catalog, model.sim, model.title_index, top_k=options["top_k"])
+
+    _, report["get_recommendations"] = measure(recommend, len(titles))
+    _, report["export_all_recommendations"] = measure(
+        lambda: export_all_recommendations(top_k=options["top_k"]), len(model))
+    return report
+
+def _child(n_rows, options, queue):
+    with tempfile.TemporaryDirectory() as workdir:
+        try:
+            queue.put(("ok", run_size(n_rows, options, workdir)))
+        except Exception as e:
+            queue.put(("error", f"{type(e).__name__}: {e}"))
+
+def run_in_process(n_rows, options):
+    ctx = multiprocessing.get_context("spawn")
+    queue = ctx.Queue()
+    proc = ctx.Process(target=_child, args=(n_rows, options, queue))
+    proc.start()
+    status, result = queue.get()
+    proc.join()
+    if status != "ok":
+        raise RuntimeError(f"❌ Benchmark at {n_rows:,} rows failed: {result}")
+    return result
+
+def environment():
+    import numpy as np
+    import pandas as pd
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, cwd=Path(__file__).parent).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+def print_report(report, baseline=None):
+    base = {(r["catalog_rows"], r["stage"]): r for r in (baseline or {}).get("results", [])}
+    print(f"\n{'catalog':>10} {'stage':<28} {'seconds':>9} {'cpu s':>8} {'rows/s':>12} {'peak MB':>8}"
+          + (f" {'vs base':>8}" if base else ""))
+    for r in report["results"]:
+        peak = f"{r['peak_rss_mb']:>8.0f}" if r["peak_rss_mb"] is not None else f"{'-':>8}"
+        line = (f"{r['catalog_rows']:>10,} {r['stage']:<28} {r['seconds']:>9.2f} {r['cpu_seconds']:>8.2f} "
+                f"{r['rows_per_s'] or 0:>12,.0f} {peak}")
+        old = base.get((r["catalog_rows"], r["stage"]))
+        if old:
+            line += f" {r['seconds'] / old['seconds']:>7.2f}x"
+        print(line)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=1000, help="get_recommendations calls to time")
+    parser.add_argument("--workers", type=int, default=-1)
+    parser.add_argument("--out", help="Report path (default outputs/benchmarks/suite_<time>.json)")
+    parser.add_argument("--baseline", help="Earlier report to compare against")
+    args = parser.parse_args()
+
+    options = {"seed": args.seed, "top_k": args.top_k, "queries": args.queries, "workers": args.workers}
+    report = {"environment": environment(), "options": options, "results": []}
+    for n_rows in args.rows:
+        print(f"⏳ {n_rows:,} rows...")
+        for stage, metrics in run_in_process(n_rows, options).items():
+            report["results"].append({"catalog_rows": n_rows, "stage": stage, **metrics})
+
+    out = Path(args.out) if args.out else REPORT_DIR / f"suite_{time.strftime('%Y%m%dT%H%M%S')}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+    print(f"\n📄 Report: {out}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""Recall@K / speed / memory of SVD embeddings against exact TF-IDF cosine top-K.
+
+Usage:
+    python benchmarks/svd_recall.py --dims 64 128 256 --top-k 10 --sample 1000
+"""
+import sys
+import argparse
+import json
+import time
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.artifacts import open_artifacts
+from src.embedding import SVDEmbedding, embedding_report
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dims", type=int, nargs="+", default=[64, 128, 256])
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--sample", type=int, default=1000)
+    parser.add_argument("--output", default="outputs/svd_recall_report.json")
+    args = parser.parse_args()
+
+    model = open_artifacts()
+    if model.matrix is None:
+        sys.exit("❌ Model has no tfidf_matrix.npz, run 'python main.py' first")
+
+    report = []
+    for dims in args.dims:
+        start = time.perf_counter()
+        embedding = SVDEmbedding(dims).fit(model.matrix)
+        fit_s = time.perf_counter() - start
+        report.append({**embedding_report(model.matrix, embedding, args.top_k, sample=args.sample),
+                       "fit_seconds": fit_s})
+
+    print(f"\n{model.matrix.shape[0]:,} titles | recall@{args.top_k} on {args.sample} sampled queries")
+    print(f"{'dims':>5} {'recall':>7} {'var':>6} {'fit s':>7} {'q/s':>9} {'exact q/s':>10} {'MB':>7} {'tfidf MB':>9}")
+    for r in report:
+        print(f"{r['dims']:>5} {r['recall_at_k']:>7.3f} {r['explained_variance']:>6.1%} {r['fit_seconds']:>7.2f} "
+              f"{r['queries_per_second']:>9,.0f} {r['exact_queries_per_second']:>10,.0f} "
+              f"{r['embedding_mb']:>7.1f} {r['tfidf_mb']:>9.1f}")
+
+    Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n💾 {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""Synthetic Netflix-style catalogs of any size, drawn from the real dataset's column distributions.
+
+Categorical columns (type, rating, country, listed_in, duration, release
+year/date added) are sampled from their empirical distributions, ratings,
+durations and genres conditioned on type. Titles, descriptions and
+people are generated from the real word/name frequencies, so vocabulary
+and the number of distinct people grow with the catalog instead of
+repeating the 8.8k real rows.
+
+Usage:
+    python benchmarks/synthetic.py --rows 100000 --out data/synthetic_100k.csv
+"""
+import sys
+import argparse
+import time
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+
+import numpy as np
+import pandas as pd
+from src.load_data import load_netflix
+
+# จำนวนคนต่อเรื่องในข้อมูลจริง (~36k คนใน cast / 8.8k เรื่อง) ใช้กำหนดขนาด pool ของชื่อ
+PEOPLE_PER_TITLE = 4.5
+
+def _empirical(values):
+    """(values, probabilities) of a column, missing values included as None."""
+    counts = pd.Series(values, dtype=object).fillna("\0").value_counts()
+    keys = np.array(counts.index, dtype=object)
+    keys[keys == "\0"] = None
+    return keys, (counts / counts.sum()).to_numpy()
+
+def _tokens(values, pattern=r"[^\s,]+"):
+    return pd.Series(values).dropna().str.findall(pattern).explode().dropna()
+
+def _join_rows(pool, counts, rng, sep):
+    """One string per row made of counts[i] items drawn from pool (empty -> None)."""
+    picks = pool[rng.integers(0, len(pool), counts.sum())]
+    ends = np.cumsum(counts)
+    rows = [sep.join(picks[e - c:e]) if c else None for c, e in zip(counts.tolist(), ends.tolist())]
+    return np.array(rows, dtype=object)
+
+class CatalogProfile:
+    """Column distributions of a raw catalog, used to generate synthetic rows."""
+
+    def __init__(self, base):
+        self.types = _empirical(base["type"])
+        self.by_type = {}
+        for kind in self.types[0]:
+            if kind is None:
+                continue
+            rows = base[base["type"] == kind]
+            self.by_type[kind] = {col: _empirical(rows[col]) for col in ("rating", "duration", "listed_in")}
+        self.country = _empirical(base["country"])
+        self.dates = base[["release_year", "date_added"]].to_numpy(dtype=object)
+
+        self.title_words = _empirical(_tokens(base["title"], r"\S+"))
+        self.title_len = _empirical(base["title"].str.split().str.len().dropna())
+        self.desc_words = _empirical(_tokens(base["description"], r"\S+"))
+        self.desc_len = _empirical(base["description"].str.split().str.len().dropna())
+
+        names = _tokens(pd.concat([base["director"], base["cast"]]), r"[^,]+").str.strip().str.split()
+        self.first_names = names.str[0].dropna().unique()
+        self.last_names = names.str[-1].dropna().unique()
+        self.directors = _empirical(base["director"].str.count(",").add(1).fillna(0).astype(int))
+        self.cast = _empirical(base["cast"].str.count(",").add(1).fillna(0).astype(int))
+
+    def _sample(self, dist, n, rng):
+        keys, p = dist
+        return keys[rng.choice(len(keys), size=n, p=p)]
+
+    def _words(self, words, counts, rng):
+        """One string per row of counts[i] words drawn by frequency."""
+        picks = self._sample(words, int(counts.sum()), rng)
+        ends = np.cumsum(counts)
+        return np.array([" ".join(picks[e - c:e]) for c, e in zip(counts.tolist(), ends.tolist())],
+                        dtype=object)
+
+    def generate(self, n_rows, seed=42):
+        """A raw catalog frame with the same columns as data/netflix_titles.csv."""
+        rng = np.random.default_rng(seed)
+        kinds = self._sample(self.types, n_rows, rng)
+        df = pd.DataFrame({"show_id": np.char.add("s", np.arange(1, n_rows + 1).astype(str)),
+                           "type": kinds})
+
+        for col in ("rating", "duration", "listed_in"):
+            values = np.empty(n_rows, dtype=object)
+            for kind, dists in self.by_type.items():
+                mask = kinds == kind
+                if not mask.any():
+                    continue
+                values[mask] = self._sample(dists[col], int(mask.sum()), rng)
+            df[col] = values
+
+        titles = pd.Series(self._words(self.title_words, self._sample(self.title_len, n_rows, rng)
+                                       .astype(np.int64), rng))
+        dup = titles.groupby(titles).cumcount()
+        titles[dup > 0] = titles[dup > 0] + " " + (dup[dup > 0] + 1).astype(str)
+        df["title"] = titles.to_numpy(dtype=object)
+
+        pool_size = max(1000, int(n_rows * PEOPLE_PER_TITLE))
+        people = np.char.add(np.char.add(
+            self.first_names[rng.integers(0, len(self.first_names), pool_size)].astype(str), " "),
+            self.last_names[rng.integers(0, len(self.last_names), pool_size)].astype(str)).astype(object)
+        df["director"] = _join_rows(people, self._sample(self.directors, n_rows, rng).astype(np.int64), rng, ", ")
+        df["cast"] = _join_rows(people, self._sample(self.cast, n_rows, rng).astype(np.int64), rng, ", ")
+        df["country"] = self._sample(self.country, n_rows, rng)
+
+        dates = self.dates[rng.integers(0, len(self.dates), n_rows)]
+        df["date_added"] = dates[:, 1]
+        df["release_year"] = dates[:, 0].astype(np.int64)
+        df["description"] = self._words(self.desc_words, self._sample(self.desc_len, n_rows, rng)
+                                        .astype(np.int64), rng)
+        return df[["show_id", "type", "title", "director", "cast", "country", "date_added",
+                   "release_year", "rating", "duration", "listed_in", "description"]]
+
+def write_synthetic_csv(path, n_rows, seed=42, base_path="data/netflix_titles.csv"):
+    """Generate n_rows synthetic titles and write them as a CSV shaped like the real dataset."""
+    profile = CatalogProfile(load_netflix(base_path))
+    df = profile.generate(n_rows, seed)
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    df.to_csv(path, index=False)
+    return path
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", required=True)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    write_synthetic_csv(args.out, args.rows, args.seed)
+    print(f"✅ {args.rows:,} synthetic titles -> {args.out} ({time.perf_counter() - start:.1f}s)")
+
+if __name__ == "__main__":
+    main()
@@ -1,85 +1,264 @@
 import sys
+import argparse
 from pathlib import Path
 sys.path.append(str(Path(__file__).parent))
 
+import json
+import time
+import numpy as np
 import pandas as pd
-from tqdm import tqdm
-from src.inference import load_model, get_recommendations
+from concurrent.futures import ProcessPoolExecutor
+from src.artifacts import open_artifacts, MANIFEST_FILE
+from src.inference import get_recommendations_batch, topk_for_positions
+from src.delta import export_delta_blocks, compact_deltas
+from src.pipeline import hash_path
 import logging
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def export_all_recommendations():
+OUTPUT_FILE = "outputs/netflix_recommendations.csv"
+EXPORT_COLUMNS = ['source_title', 'title', 'type', 'similarity_score', 'listed_in']
+BLOCK_SIZE = 4096
+RECS_DELTA = "recommendations"
+
+def _source_rows(titles):
+    """Row positions that the title index resolves to (last row of each duplicated title)."""
+    return np.flatnonzero(~pd.Series(titles).duplicated(keep='last').to_numpy())
+
+def _shard_range(n, shard, num_shards):
+    return n * shard // num_shards, n * (shard + 1) // num_shards
+
+def _block_frame(rows, sim, columns, top_k):
+    """Long-format recommendations for one block of source rows."""
+    indices, scores = topk_for_positions(rows, sim, top_k)
+    valid = indices >= 0
+    source = np.repeat(rows, indices.shape[1]).reshape(indices.shape)[valid]
+    neighbors = indices[valid]
+    frame = {'source_show_id': columns['show_id'][source]} if 'show_id' in columns else {}
+    return pd.DataFrame({
+        **frame,
+        'source_title': columns['title'][source],
+        'title': columns['title'][neighbors],
+        'type': columns['type'][neighbors],
+        'similarity_score': scores[valid],
+        'listed_in': columns['listed_in'][neighbors]
+    })
+
+def _load_checkpoint(path, expected):
+    if not path.exists():
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        state = json.load(f)
+    if any(state.get(k) != v for k, v in expected.items()):
+        logger.warning("⚠️ Checkpoint does not match this export, starting over")
+        return None
+    return state
+
+def _save_checkpoint(path, state):
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    tmp.replace(path)
+
+def export_shard(output_file, top_k=5, fmt="csv", shard=0, num_shards=1,
+                 block_size=BLOCK_SIZE, resume=True):
+    """Stream one shard of the full-catalog export to disk, block by block.
+
+    CSV output is a single file; Parquet output is a directory with one part
+    per block. Progress is checkpointed after every block so an interrupted
+    export continues where it stopped.
+    """
+    model = open_artifacts()
+    sim = model.sim
+    columns = {
+        col: model.catalog.take(None, [col])[col].to_numpy(dtype=object)
+        for col in ('title', 'type', 'listed_in')
+    }
+    rows = _source_rows(columns['title'])
+    lo, hi = _shard_range(len(rows), shard, num_shards)
+    rows = rows[lo:hi]
+
+    output = Path(output_file)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    checkpoint = output.parent / f"{output.name}.checkpoint.json"
+    # hash ของ manifest แยกโมเดลที่ build/update ใหม่แม้จำนวนเรื่องเท่าเดิม
+    expected = {'model': hash_path(model.model_dir / MANIFEST_FILE), 'n_items': len(model),
+                'top_k': top_k, 'fmt': fmt, 'shard': shard, 'num_shards': num_shards,
+                'block_size': block_size}
+
+    state = _load_checkpoint(checkpoint, expected) if resume else None
+    if state is None:
+        state = dict(expected, next_block=0, rows_written=0, bytes_written=0)
+        if fmt == "csv":
+            output.unlink(missing_ok=True)
+        else:
+            output.mkdir(parents=True, exist_ok=True)
+            for part in output.glob("part-*.parquet"):
+                part.unlink()
+    elif state['next_block'] > 0:
+        logger.info(f"↩️ Resuming {output} from block {state['next_block']}")
+
+    if fmt == "csv" and output.exists():
+        # ตัดส่วนที่เขียนค้างไว้หลัง checkpoint ล่าสุดทิ้ง
+        with open(output, "r+b") as f:
+            f.truncate(state['bytes_written'])
+
+    starts = list(range(0, len(rows), block_size))
+    for block_no in range(state['next_block'], len(starts)):
+        block = _block_frame(rows[starts[block_no]:starts[block_no] + block_size],
+                             sim, columns, top_k)
+        if fmt == "csv":
+            first = state['bytes_written'] == 0
+            with open(output, "a", encoding="utf-8-sig" if first else "utf-8", newline="") as f:
+                block.to_csv(f, index=False, header=first)
+            state['bytes_written'] = output.stat().st_size
+        else:
+            block.to_parquet(output / f"part-{block_no:05d}.parquet", index=False)
+
+        state['next_block'] = block_no + 1
+        state['rows_written'] += len(block)
+        _save_checkpoint(checkpoint, state)
+
+    checkpoint.unlink(missing_ok=True)
+    return state['rows_written']
+
+def _merge_csv_shards(parts, output):
+    """Concatenate shard CSVs into one file, keeping only the first header.
+
+    Shards with no source rows write no file and are skipped; parts are
+    removed only after the merged file is complete.
+    """
+    parts = [p for p in parts if p.exists() and p.stat().st_size > 0]
+    tmp = output.with_name("tmp_" + output.name)
+    with open(tmp, "wb") as out:
+        for i, part in enumerate(parts):
+            with open(part, "rb") as f:
+                if i > 0:
+                    f.readline()
+                while chunk := f.read(1 << 20):
+                    out.write(chunk)
+    tmp.replace(output)
+    for part in parts:
+        part.unlink()
+
+def export_all_recommendations(top_k=5, fmt="csv", workers=1, shard=None, num_shards=1,
+                               block_size=BLOCK_SIZE, resume=True):
     """Export all recommendations"""
     logger.info("\n" + "="*60)
     logger.info("📤 Export All Recommendations")
     logger.info("="*60 + "\n")
-    
-    df, sim, index_map = load_model()
-    
-    all_recs = []
-    titles = list(index_map.keys())
-    
-    logger.info(f"🚀 Generating recommendations for {len(titles):,} titles...\n")
-    
-    for title in tqdm(titles, desc="Processing"):
-        recs = get_recommendations(title, df, sim, index_map, top_k=5)
-        if recs is not None:
-            recs = recs.copy()
-            recs['source_title'] = title
-            all_recs.append(recs[['source_title', 'title', 'type', 
-                                   'similarity_score', 'listed_in']])
-    
-    if all_recs:
-        final = pd.concat(all_recs, ignore_index=True)
-        output_file = "outputs/netflix_recommendations.csv"
-        final.to_csv(output_file, index=False, encoding='utf-8-sig')
-        
-        logger.info(f"\n✅ Export successful!")
-        logger.info(f"   📁 {output_file}")
-        logger.info(f"   📊 {len(final):,} rows")
-        logger.info(f"   💾 {Path(output_file).stat().st_size / 1024 / 1024:.2f} MB")
-        logger.info("="*60 + "\n")
+
+    start = time.perf_counter()
+    output = Path(OUTPUT_FILE)
+    if fmt == "parquet":
+        output = output.with_suffix(".parquet")
+
+    if shard is not None:
+        # ส่วนหนึ่งของงานที่แบ่งไปรันหลายเครื่อง/หลาย process เอง
+        output = output.with_name(f"{output.stem}_shard{shard}of{num_shards}{output.suffix}")
+        rows = export_shard(output, top_k, fmt, shard, num_shards, block_size, resume)
+    elif workers > 1:
+        parts = [output.with_name(f"{output.stem}_part{i}{output.suffix}") for i in range(workers)]
+        logger.info(f"🚀 Exporting in {workers} shards...")
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(export_shard, part, top_k, fmt, i, workers, block_size, resume)
+                for i, part in enumerate(parts)
+            ]
+            rows = sum(f.result() for f in futures)
+        if fmt == "csv":
+            _merge_csv_shards(parts, output)
+        else:
+            output.mkdir(parents=True, exist_ok=True)
+            for i, part in enumerate(parts):
+                for file in sorted(part.glob("part-*.parquet")):
+                    file.replace(output / f"shard{i}-{file.name}")
+                part.rmdir()
     else:
-        logger.error("❌ Could not generate recommendations\n")
+        rows = export_shard(output, top_k, fmt, 0, 1, block_size, resume)
+
+    size = sum(p.stat().st_size for p in output.glob("*")) if output.is_dir() else output.stat().st_size
+    logger.info(f"\n✅ Export successful!")
+    logger.info(f"   📁 {output}")
+    logger.info(f"   📊 {rows:,} rows")
+    logger.info(f"   💾 {size / 1024 / 1024:.2f} MB")
+    logger.info(f"   ⏱️ {time.perf_counter() - start:.2f} s")
+    logger.info("="*60 + "\n")
+
+def export_recommendation_delta(top_k=5, block_size=BLOCK_SIZE):
+    """Write only the recommendation lists that changed since the last delta export (keyed by show_id)."""
+    model = open_artifacts()
+    columns = {
+        col: model.catalog.take(None, [col])[col].to_numpy(dtype=object)
+        for col in ('show_id', 'title', 'type', 'listed_in')
+    }
+    rows = _source_rows(columns['title'])
+    # แต่ละ source_show_id อยู่ใน block เดียว จึงเทียบ hash และเขียนทีละ block ได้
+    blocks = (_block_frame(rows[i:i + block_size], model.sim, columns, top_k)
+              for i in range(0, len(rows), block_size))
+    return export_delta_blocks(blocks, RECS_DELTA, key="source_show_id")
 
 def export_sample(n=100):
     """Export sample n recommendations"""
     logger.info(f"\n📤 Export Sample {n} Recommendations\n")
-    
-    df, sim, index_map = load_model()
-    sample_titles = df.sample(n)['title'].tolist()
-    
-    all_recs = []
-    for title in tqdm(sample_titles, desc="Processing"):
-        recs = get_recommendations(title, df, sim, index_map, top_k=5)
-        if recs is not None:
-            recs = recs.copy()
-            recs['source_title'] = title
-            all_recs.append(recs)
-    
-    if all_recs:
-        final = pd.concat(all_recs, ignore_index=True)
+
+    model = open_artifacts()
+    positions = np.random.default_rng().choice(len(model), size=min(n, len(model)), replace=False)
+    sample_titles = [model.catalog.value('title', int(i)) for i in positions]
+
+    final = get_recommendations_batch(sample_titles, model.catalog, model.sim,
+                                      model.title_index, top_k=5, as_frame=True)
+    if len(final) > 0:
         output_file = f"outputs/sample_{n}_recommendations.csv"
         final.to_csv(output_file, index=False, encoding='utf-8-sig')
         logger.info(f"\n✅ Export successful: {output_file}\n")
 
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Export recommendations")
+    parser.add_argument("--all", action="store_true", help="Export the full catalog without the menu")
+    parser.add_argument("--sample", type=int, help="Export recommendations for n random titles")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--format", choices=["csv", "parquet"], default="csv")
+    parser.add_argument("--workers", type=int, default=1, help="Shards exported in parallel")
+    parser.add_argument("--shard", type=int, help="Export only this shard (0-based)")
+    parser.add_argument("--num-shards", type=int, default=1)
+    parser.add_argument("--block-size", type=int, default=BLOCK_SIZE)
+    parser.add_argument("--no-resume", action="store_true", help="Ignore any existing checkpoint")
+    parser.add_argument("--delta", action="store_true",
+                        help="Write only changed recommendation lists to outputs/delta/recommendations/")
+    parser.add_argument("--compact", action="store_true",
+                        help="Fold the recommendation deltas into a new base snapshot")
+    return parser.parse_args(argv)
+
 if __name__ == "__main__":
-    print("\nSelect:")
-    print("  1. Export all (takes time)")
-    print("  2. Export sample 100 titles")
-    print("  3. Export sample 500 titles")
-    
-    choice = input("\nSelect (1-3): ").strip()
-    
-    if choice == '1':
-        confirm = input("⚠️  This will take time. Confirm? (y/n): ").strip().lower()
-        if confirm == 'y':
-            export_all_recommendations()
-    elif choice == '2':
-        export_sample(100)
-    elif choice == '3':
-        export_sample(500)
+    args = parse_args()
+
+    if args.delta:
+        export_recommendation_delta(top_k=args.top_k, block_size=args.block_size)
+    elif args.compact:
+        compact_deltas(RECS_DELTA)
+    elif args.all or args.shard is not None:
+        export_all_recommendations(
+            top_k=args.top_k, fmt=args.format, workers=args.workers,
+            shard=args.shard, num_shards=args.num_shards,
+            block_size=args.block_size, resume=not args.no_resume
+        )
+    elif args.sample:
+        export_sample(args.sample)
     else:
-        print("❌ Please select 1-3")
\ No newline at end of file
+        print("\nSelect:")
+        print("  1. Export all")
+        print("  2. Export sample 100 titles")
+        print("  3. Export sample 500 titles")
+
+        choice = input("\nSelect (1-3): ").strip()
+
+        if choice == '1':
+            export_all_recommendations()
+        elif choice == '2':
+            export_sample(100)
+        elif choice == '3':
+            export_sample(500)
+        else:
+            print("❌ Please select 1-3")
@@ -1,76 +1,258 @@
 import sys
+import argparse
 from pathlib import Path
 sys.path.append(str(Path(__file__).parent))
 
 import mlflow
 from src.load_data import load_netflix, get_data_info
-from src.preprocess import preprocess, get_preprocessing_summary
+from src.preprocess import get_preprocessing_summary
+from src.cache import load_preprocessed, cache_key, cache_path, read_cached
+from src.artifacts import write_manifest, MANIFEST_FILE
+from src.pipeline import Stage, run_pipeline
+from src.aggregates import build_cube, AggregateCube, aggregate_path
 from src.eda import generate_all_plots
-from src.export_powerbi import export_powerbi, export_summary_stats
-from src.model_tfidf import build_tfidf, analyze_model_performance
+from src.export_powerbi import (export_powerbi, export_summary_stats, export_star_schema,
+                                export_powerbi_delta, compact_powerbi_deltas, STAR_DIR, POWERBI_DELTA)
+from src.delta import DELTA_DIR
+from src.model_tfidf import build_tfidf, analyze_model_performance, MODEL_DIR, SIM_STATS_FILE
+from src.similarity import DEFAULT_TOP_K, DEFAULT_BLOCK_SIZE
+from src.update import update_model, IDF_DRIFT_THRESHOLD, OOV_DRIFT_THRESHOLD
+from src.ann import DEFAULT_TABLES, DEFAULT_BITS, DEFAULT_PROBES
+from src.embedding import DEFAULT_DIMS
+from src.instrument import enable_profiling, log_to_mlflow, PROFILE_DIR
 import logging
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def main():
-    logger.info("\n" + "="*70)
-    logger.info("🎬 Netflix Data Science Project - Recommendation System")
-    logger.info("="*70 + "\n")
-    
-    try:
-        # 1. Load Data
-        logger.info("📥 Step 1: Loading Data")
-        logger.info("-" * 70)
-        df_raw = load_netflix()
-        if df_raw is None:
-            return
-        get_data_info(df_raw)
-        
-        # 2. Preprocess
-        logger.info("🔧 Step 2: Data Preprocessing")
-        logger.info("-" * 70)
-        df = preprocess(df_raw)
-        get_preprocessing_summary(df_raw, df)
-        
-        # 3. EDA
-        logger.info("📊 Step 3: Exploratory Data Analysis")
-        logger.info("-" * 70)
-        generate_all_plots(df)
-        
-        # 4. Export
-        logger.info("💾 Step 4: Exporting Data")
-        logger.info("-" * 70)
-        export_powerbi(df)
-        stats_df = export_summary_stats(df)
-        logger.info("")
-        
-        # 5. Build Model
-        logger.info("🤖 Step 5: Building Recommendation Model")
-        logger.info("-" * 70)
-        
+SRC_DIR = Path(__file__).parent / "src"
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Netflix recommendation pipeline")
+    parser.add_argument("--mode", choices=["dense", "topk"],
+                        help="Store the full similarity matrix (default) or only top-K neighbors "
+                             "(default for --engine lsh/svd)")
+    parser.add_argument("--top-k", type=int, default=DEFAULT_TOP_K,
+                        help="Neighbors kept per title in topk mode")
+    parser.add_argument("--block-size", type=int, default=DEFAULT_BLOCK_SIZE,
+                        help="Rows per similarity tile")
+    parser.add_argument("--workers", type=int, default=-1,
+                        help="Worker processes for similarity tiles (-1 = all cores)")
+    parser.add_argument("--max-features", type=int, default=5000)
+    parser.add_argument("--precision", choices=["float32", "float16", "uint8"], default="float32",
+                        help="Stored similarity score precision (compact ones also use uint16 neighbor ids)")
+    parser.add_argument("--stats-sample", type=int, metavar="N",
+                        help="Estimate similarity statistics from N random scores instead of a full pass")
+    parser.add_argument("--engine", choices=["exact", "lsh", "svd"], default="exact",
+                        help="Exact cosine top-K, approximate LSH neighbors or SVD embeddings (topk mode)")
+    parser.add_argument("--lsh-tables", type=int, default=DEFAULT_TABLES)
+    parser.add_argument("--lsh-bits", type=int, default=DEFAULT_BITS)
+    parser.add_argument("--lsh-probes", type=int, default=DEFAULT_PROBES)
+    parser.add_argument("--svd-dims", type=int, default=DEFAULT_DIMS,
+                        help="Embedding dimensions for --engine svd (64-256 is typical)")
+    parser.add_argument("--data", default="data/netflix_titles.csv", help="Raw catalog CSV")
+    parser.add_argument("--refresh-cache", action="store_true",
+                        help="Re-run preprocessing even if the cached catalog matches")
+    parser.add_argument("--star-schema", action="store_true",
+                        help="Also export Power BI fact/dimension/bridge tables (Parquet)")
+    parser.add_argument("--delta", action="store_true",
+                        help="Power BI export writes only changed rows to outputs/delta/powerbi/")
+    parser.add_argument("--compact-deltas", action="store_true",
+                        help="Fold the Power BI deltas into a new base snapshot and exit")
+    parser.add_argument("--force", nargs="+", metavar="STAGE",
+                        choices=["catalog", "aggregate", "eda", "export", "model", "all"],
+                        help="Re-run these stages even if their inputs are unchanged")
+    parser.add_argument("--profile", nargs="+", metavar="STAGE", default=[],
+                        help="cProfile these pipeline stages or functions (e.g. model build_tfidf) "
+                             f"into {PROFILE_DIR}/ and the MLflow run")
+    parser.add_argument("--update", metavar="CSV",
+                        help="Apply new/changed rows (keyed by show_id) to the existing model")
+    parser.add_argument("--idf-drift-threshold", type=float, default=IDF_DRIFT_THRESHOLD)
+    parser.add_argument("--oov-drift-threshold", type=float, default=OOV_DRIFT_THRESHOLD)
+    args = parser.parse_args(argv)
+    # dense เป็นค่าเริ่มต้นเดิม (metric avg_similarity ฯลฯ เทียบกับ run เก่าได้); lsh/svd ใช้ได้เฉพาะ topk
+    if args.mode is None:
+        args.mode = "dense" if args.engine == "exact" else "topk"
+    return args
+
+def run_update(args):
+    """Incremental model update instead of the full pipeline."""
+    logger.info(f"🔁 Updating model from {args.update}")
+    df_new = load_netflix(args.update)
+    mlflow.set_experiment("Netflix_Recommendation")
+    with mlflow.start_run(run_name="incremental_update"):
+        report = update_model(
+            df_new,
+            idf_threshold=args.idf_drift_threshold,
+            oov_threshold=args.oov_drift_threshold,
+            block_size=args.block_size,
+            n_jobs=args.workers
+        )
+        mlflow.log_param("update_mode", report.pop("mode"))
+        for key, value in report.items():
+            mlflow.log_metric(key, value)
+        log_to_mlflow()
+
+def build_stages(args, run_id=None):
+    """load+preprocess -> aggregate cube -> (EDA | Power BI export | model build), as pipeline stages.
+
+    run_id is the MLflow run the model stage logs into (a new run if None).
+    """
+    cache_file = cache_path(cache_key(args.data))
+    refresh = args.refresh_cache or bool({"catalog", "all"} & set(args.force or []))
+
+    def catalog(results):
+        df, df_raw, _ = load_preprocessed(args.data, refresh=refresh)
+        if df_raw is not None:
+            get_data_info(df_raw)
+            get_preprocessing_summary(df_raw, df)
+        return df
+
+    def aggregate(results):
+        cube = build_cube(results["catalog"])
+        cube.save()
+        return cube
+
+    def eda(results):
+        generate_all_plots(results["aggregate"], skip_unchanged=True)
+
+    def export(results):
+        if args.delta:
+            export_powerbi_delta(results["catalog"])
+            if args.star_schema:
+                export_star_schema(results["catalog"])
+        else:
+            report = export_powerbi(results["catalog"], star_schema=args.star_schema)
+            logger.info(f"   Power BI export: {report['rows']:,} rows, {report['seconds']:.2f}s, "
+                        f"peak RSS {report['peak_rss_mb'] or 0:.0f} MB")
+        export_summary_stats(results["aggregate"])
+
+    def model(results):
+        df = results["catalog"]
         mlflow.set_experiment("Netflix_Recommendation")
-        with mlflow.start_run():
-            vectorizer, sim = build_tfidf(df)
+        # run ที่เปิดใน main thread มองไม่เห็นจาก worker thread จึงเปิดต่อด้วย run_id
+        with mlflow.start_run(run_id=run_id):
+            vectorizer, sim = build_tfidf(
+                df,
+                max_features=args.max_features,
+                mode=args.mode,
+                top_k=args.top_k,
+                block_size=args.block_size,
+                n_jobs=args.workers,
+                engine=args.engine,
+                ann_params=model_params["ann_params"],
+                embed_params=model_params["embed_params"],
+                precision=args.precision
+            )
+            manifest = write_manifest(MODEL_DIR, source_cache=str(cache_file))
             
-            metrics = analyze_model_performance(df, sim)
+            metrics = analyze_model_performance(df, sim, sample=args.stats_sample, block_size=args.block_size,
+                                                stats_file=MODEL_DIR / SIM_STATS_FILE)
             
             mlflow.log_param("total_items", len(df))
-            mlflow.log_param("tfidf_max_features", 5000)
+            mlflow.log_param("tfidf_max_features", args.max_features)
             mlflow.log_param("unique_titles", df['title'].nunique())
+            mlflow.log_param("similarity_mode", args.mode)
+            mlflow.log_param("score_precision", args.precision)
+            if args.mode == "topk":
+                mlflow.log_param("top_k", args.top_k)
+                mlflow.log_param("workers", args.workers)
+                mlflow.log_param("engine", args.engine)
+            if args.engine == "svd":
+                mlflow.log_param("svd_dims", args.svd_dims)
+                report = manifest["embedding"]["report"]
+                for key in ("recall_at_k", "explained_variance", "queries_per_second",
+                            "exact_queries_per_second", "embedding_mb", "tfidf_mb", "topk_seconds"):
+                    mlflow.log_metric(f"svd_{key}", report[key])
+            for key, value in (manifest.get("quantization") or {}).items():
+                if isinstance(value, (int, float)):
+                    mlflow.log_metric(f"quant_{key}", float(value))
             
             for key, value in metrics.items():
                 mlflow.log_metric(key, value)
+            if metrics:
+                mlflow.log_artifact(str(MODEL_DIR / SIM_STATS_FILE))
+
+    # block_size/workers ไม่เปลี่ยนผลลัพธ์ จึงไม่อยู่ใน fingerprint
+    model_params = {
+        "max_features": args.max_features,
+        "mode": args.mode,
+        "top_k": args.top_k if args.mode == "topk" else None,
+        "engine": args.engine,
+        "ann_params": {
+            'n_tables': args.lsh_tables,
+            'n_bits': args.lsh_bits,
+            'n_probes': args.lsh_probes
+        } if args.engine == "lsh" else None,
+        "embed_params": {"dims": args.svd_dims} if args.engine == "svd" else None,
+        "precision": args.precision
+    }
+
+    return [
+        Stage("catalog", catalog,
+              inputs=[args.data] + [SRC_DIR / f for f in ("load_data.py", "preprocess.py", "cache.py")],
+              outputs=[cache_file],
+              load=lambda results: read_cached(cache_file)),
+        Stage("aggregate", aggregate, deps=["catalog"], inputs=[SRC_DIR / "aggregates.py"],
+              outputs=[aggregate_path()],
+              load=lambda results: AggregateCube.load()),
+        Stage("eda", eda, deps=["aggregate"], inputs=[SRC_DIR / "eda.py"], outputs=["outputs/plots"],
+              exclusive=True),
+        Stage("export", export, deps=["catalog", "aggregate"],
+              inputs=[SRC_DIR / f for f in ("export_powerbi.py", "delta.py", "aggregates.py")],
+              outputs=[DELTA_DIR / POWERBI_DELTA / "manifest.json" if args.delta
+                       else "outputs/cleaned_netflix_powerbi.csv", "outputs/summary_statistics.csv"]
+                      + ([STAR_DIR] if args.star_schema else []),
+              params={"star_schema": args.star_schema, "delta": args.delta}),
+        Stage("model", model, deps=["catalog"],
+              inputs=[SRC_DIR / f for f in ("model_tfidf.py", "similarity.py", "ann.py", "embedding.py",
+                                            "artifacts.py", "title_search.py", "similarity_stats.py",
+                                            "quantize.py", "filters.py")],
+              outputs=[MODEL_DIR / MANIFEST_FILE],
+              params=model_params, exclusive=True),
+    ]
+
+def main(argv=None):
+    args = parse_args(argv)
+    enable_profiling(args.profile)
+    if args.update:
+        run_update(args)
+        return
+    if args.compact_deltas:
+        compact_powerbi_deltas()
+        return
+    
+    logger.info("\n" + "="*70)
+    logger.info("🎬 Netflix Data Science Project - Recommendation System")
+    logger.info("="*70 + "\n")
+    
+    try:
+        force = list(args.force or [])
+        if args.refresh_cache:
+            force.append("catalog")
+        mlflow.set_experiment("Netflix_Recommendation")
+        with mlflow.start_run(run_name="pipeline") as run:
+            try:
+                report = run_pipeline(build_stages(args, run.info.run_id), force=force)
+                mlflow.set_tags({f"stage.{name}": info["status"] for name, info in report.items()})
+            finally:
+                # บันทึกเวลา/หน่วยความจำของ stage ที่จบแล้ว แม้ pipeline จะล้ม
+                log_to_mlflow()
         
         # Summary
         logger.info("="*70)
         logger.info("🎉 PIPELINE COMPLETED SUCCESSFULLY!")
         logger.info("="*70)
+        logger.info("\n⏱️ Stages:")
+        for name, info in report.items():
+            logger.info(f"   {name:<9} {info['status']:<8} {info['seconds']:.1f}s")
         logger.info("\n📂 Output Files:")
+        logger.info("   ├── ⚡ outputs/cache/ (preprocessed catalog)")
+        logger.info(f"   ├── 🧮 {aggregate_path()} (aggregate cube)")
         logger.info("   ├── 📊 outputs/plots/ (7 plots)")
         logger.info("   ├── 💾 outputs/cleaned_netflix_powerbi.csv")
         logger.info("   ├── 📈 outputs/summary_statistics.csv")
-        logger.info("   └── 🤖 outputs/models/ (3 files)")
+        logger.info(f"   └── 🤖 {MODEL_DIR}/ (model artifacts, listed in {MANIFEST_FILE})")
         logger.info("\n💡 Next Steps:")
         logger.info("   • Run 'python analyze.py' to test model")
         logger.info("   • Run 'python export_recs.py' to export recommendations")
@@ -82,4 +264,4 @@ def main():
         raise
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,309 @@
+import sys
+import argparse
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent))
+
+import asyncio
+import json
+import math
+import time
+from collections import OrderedDict, defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, parse_qs
+import numpy as np
+from src.artifacts import open_artifacts
+from src.filters import FILTER_KEYS, RATING_ORDER, normalize_filters
+from src.inference import (get_recommendations_batch, get_text_recommendations_batch,
+                           search_titles, suggest_titles)
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MAX_TOP_K = 50
+LATENCY_WINDOW = 10000
+RESULT_COLUMNS = ['title', 'type', 'release_year', 'rating', 'listed_in', 'description']
+STATUS_TEXT = {200: "OK", 400: "Bad Request", 404: "Not Found",
+               405: "Method Not Allowed", 500: "Internal Server Error", 501: "Not Implemented"}
+
+class LRUCache:
+    """Bounded least-recently-used cache for hot responses."""
+
+    def __init__(self, maxsize=4096):
+        self.maxsize = maxsize
+        self.data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        if key in self.data:
+            self.data.move_to_end(key)
+            self.hits += 1
+            return self.data[key]
+        self.misses += 1
+        return None
+
+    def put(self, key, value):
+        if self.maxsize <= 0:
+            return
+        self.data[key] = value
+        self.data.move_to_end(key)
+        if len(self.data) > self.maxsize:
+            self.data.popitem(last=False)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {'size': len(self.data), 'maxsize': self.maxsize, 'hits': self.hits,
+                'misses': self.misses, 'hit_rate': self.hits / total if total else 0.0}
+
+class LatencyTracker:
+    """Latency samples per endpoint over a rolling window."""
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self.samples = defaultdict(lambda: deque(maxlen=window))
+        self.counts = defaultdict(int)
+
+    def record(self, endpoint, seconds):
+        self.samples[endpoint].append(seconds * 1000)
+        self.counts[endpoint] += 1
+
+    def report(self):
+        report = {}
+        for endpoint, samples in self.samples.items():
+            values = np.fromiter(samples, dtype=np.float64)
+            p50, p95, p99 = np.percentile(values, [50, 95, 99])
+            report[endpoint] = {'count': self.counts[endpoint], 'p50_ms': p50, 'p95_ms': p95,
+                                'p99_ms': p99, 'max_ms': float(values.max())}
+        return report
+
+def _clean(value):
+    """Make numpy scalars and NaN JSON-serializable."""
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    return value
+
+class RecommendationService:
+    """Holds the warm model and answers requests; scoring runs in a thread pool."""
+
+    def __init__(self, model_dir=None, cache_size=4096, workers=4, engine="exact"):
+        self.model = open_artifacts(model_dir) if model_dir else open_artifacts()
+        self.ann = self.model.ann if engine == "lsh" else self.model.embedding if engine == "svd" else None
+        if engine != "exact" and self.ann is None:
+            logger.warning(f"⚠️ No {engine.upper()} index in this model, using exact text scoring")
+        if self.model.title_search is None:
+            self.titles = self.model.catalog.take(None, ['title', 'type', 'release_year', 'rating'])
+        self.cache = LRUCache(cache_size)
+        self.latency = LatencyTracker()
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        if self.model.matrix is not None:
+            self.model.vectorizer  # โหลดล่วงหน้า ไม่ให้ request แรกช้า
+        logger.info(f"✅ Model warm: {len(self.model):,} titles")
+
+    def _results(self, indices, scores):
+        """JSON rows for neighbor positions, read straight from the catalog."""
+        catalog = self.model.catalog
+        results = []
+        for rank, (pos, score) in enumerate(zip(indices.tolist(), scores.tolist()), 1):
+            if pos < 0:
+                break
+            row = {'rank': rank}
+            row.update({col: _clean(catalog.value(col, pos)) for col in RESULT_COLUMNS})
+            row['similarity_score'] = score
+            results.append(row)
+        return results
+
+    def _recommend(self, title, fixed):
+        top_k, filters = fixed
+        mask = matrix = None
+        if filters:
+            if self.model.filters is None:
+                return 501, {'error': "Filters need the model's filter index; "
+                                      "rebuild the model with 'python main.py'"}
+            mask, matrix = self.model.filters.mask(dict(filters)), self.model.scoring_matrix
+        result = get_recommendations_batch([title], self.model.catalog, self.model.sim,
+                                           self.model.title_index, top_k=top_k, mask=mask, matrix=matrix)
+        if result.query[0] < 0:
+            payload = {'error': f"Title not found: {title}"}
+            if self.model.title_search is not None:
+                payload['suggestions'] = suggest_titles(title, self.model.catalog, self.model.title_search)
+            return 404, payload
+        payload = {'title': title, 'top_k': top_k}
+        if filters:
+            payload['filters'] = dict(filters)
+        payload['results'] = self._results(result.indices[0], result.scores[0])
+        return 200, payload
+
+    def _search(self, query, limit):
+        if self.model.title_search is not None:
+            matches = search_titles(query, self.model.catalog, self.model.title_search, limit)
+        else:
+            matches = search_titles(query, self.titles, limit=limit)
+        results = [{k: _clean(v) for k, v in row.items()} for row in matches.to_dict(orient='records')]
+        return 200, {'query': query, 'results': results}
+
+    def _similar_to_text(self, text, top_k):
+        if self.model.matrix is None:
+            return 501, {'error': "Free-text recommendations need tfidf_matrix.npz; "
+                                  "rebuild the model with 'python main.py'"}
+        result = get_text_recommendations_batch([text], self.model.vectorizer,
+                                                self.model.matrix, top_k=top_k, ann=self.ann)
+        return 200, {'query': text, 'top_k': top_k,
+                     'results': self._results(result.indices[0], result.scores[0])}
+
+    async def handle(self, method, path, params, body):
+        """Route a request and return (status, payload)."""
+        loop = asyncio.get_running_loop()
+
+        if path == '/metrics':
+            return 200, {'latency': self.latency.report(), 'cache': self.cache.stats(),
+                         'items': len(self.model)}
+        if path == '/health':
+            return 200, {'status': 'ok'}
+
+        if method == 'POST' and body:
+            try:
+                parsed = json.loads(body)
+            except json.JSONDecodeError:
+                return 400, {'error': "Body must be JSON"}
+            if not isinstance(parsed, dict):
+                return 400, {'error': "Body must be a JSON object"}
+            params = {**params, **parsed}
+
+        try:
+            top_k = max(1, min(int(params.get('top_k', 5)), MAX_TOP_K))
+            limit = max(1, min(int(params.get('limit', 20)), 100))
+        except (TypeError, ValueError):
+            return 400, {'error': "top_k and limit must be integers"}
+
+        if path == '/recommend':
+            arg = str(params.get('title', '')).strip()
+            try:
+                filters = normalize_filters({k: params[k] for k in FILTER_KEYS if k in params})
+            except (TypeError, ValueError):
+                return 400, {'error': "Filters: type, rating, country, genre (comma-separated), "
+                                      f"max_rating (one of {', '.join(RATING_ORDER)}), "
+                                      "min_year and max_year (integers)"}
+            func, fixed = self._recommend, (top_k, tuple(sorted(filters.items())) if filters else None)
+        elif path == '/search':
+            arg = str(params.get('q', '')).strip()
+            func, fixed = self._search, limit
+        elif path == '/similar-to-text':
+            arg = str(params.get('q', params.get('text', ''))).strip()
+            func, fixed = self._similar_to_text, top_k
+        else:
+            return 404, {'error': f"Unknown endpoint: {path}"}
+
+        if not arg:
+            return 400, {'error': "Missing query parameter"}
+
+        key = (path, arg, fixed)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        response = await loop.run_in_executor(self.executor, func, arg, fixed)
+        if response[0] == 200:
+            self.cache.put(key, response)
+        return response
+
+async def _read_request(reader):
+    """Parse one HTTP/1.1 request; returns None when the client closed the connection.
+
+    body is None when Content-Length is not a non-negative integer.
+    """
+    line = await reader.readline()
+    if not line:
+        return None
+    method, target, _ = line.decode('latin-1').split(' ', 2)
+    headers = {}
+    while True:
+        header = await reader.readline()
+        if header in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = header.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    try:
+        length = int(headers.get('content-length', 0))
+    except ValueError:
+        length = -1
+    if length < 0:
+        # ไม่รู้ว่า body ยาวเท่าไร อ่าน request ถัดไปต่อไม่ได้ จึงตอบ 400 แล้วปิด connection
+        return method.upper(), target, {**headers, 'connection': 'close'}, None
+    body = await reader.readexactly(length) if length else b''
+    return method.upper(), target, headers, body
+
+def _encode_response(status, payload, keep_alive):
+    body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+    head = (
+        f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}\r\n"
+        "Content-Type: application/json; charset=utf-8\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+    )
+    return head.encode('latin-1') + body
+
+def make_handler(service):
+    async def handle_connection(reader, writer):
+        try:
+            while True:
+                request = await _read_request(reader)
+                if request is None:
+                    break
+                method, target, headers, body = request
+                start = time.perf_counter()
+                url = urlsplit(target)
+                params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+
+                if body is None:
+                    status, payload = 400, {'error': "Content-Length must be a non-negative integer"}
+                elif method not in ('GET', 'POST'):
+                    status, payload = 405, {'error': f"Method not allowed: {method}"}
+                else:
+                    try:
+                        status, payload = await service.handle(method, url.path, params, body)
+                    except Exception as e:
+                        logger.error(f"❌ Request failed: {e}")
+                        status, payload = 500, {'error': str(e)}
+
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                writer.write(_encode_response(status, payload, keep_alive))
+                await writer.drain()
+                if url.path != '/metrics':
+                    service.latency.record(url.path, time.perf_counter() - start)
+                if not keep_alive:
+                    break
+        except (ConnectionResetError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+    return handle_connection
+
+async def serve(host="127.0.0.1", port=8000, cache_size=4096, workers=4, model_dir=None,
+                engine="exact"):
+    service = RecommendationService(model_dir, cache_size=cache_size, workers=workers, engine=engine)
+    server = await asyncio.start_server(make_handler(service), host, port)
+    logger.info(f"🌐 Serving on http://{host}:{port} "
+                "(/recommend, /search, /similar-to-text, /metrics)")
+    async with server:
+        await server.serve_forever()
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Local recommendation HTTP service")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--cache-size", type=int, default=4096, help="LRU entries (0 disables)")
+    parser.add_argument("--workers", type=int, default=4, help="Scoring threads")
+    parser.add_argument("--model-dir", default=None)
+    parser.add_argument("--engine", choices=["exact", "lsh", "svd"], default="exact",
+                        help="Scoring for /similar-to-text (lsh/svd need a model built with that --engine)")
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    args = parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port, args.cache_size, args.workers, args.model_dir,
+                          args.engine))
+    except KeyboardInterrupt:
+        print("\n👋 Server stopped\n")
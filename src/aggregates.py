@@ -0,0 +1,136 @@
+import pandas as pd
+import numpy as np
+import time
+from pathlib import Path
+from src.cache import read_cached, _write_cached, _parquet_available
+from src.instrument import instrumented
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+AGGREGATE_FILE = Path("outputs/aggregates")
+
+# ตารางเก็บ key เป็น str; group ที่เป็นตัวเลขแปลงกลับเป็น float ตอนอ่าน
+NUMERIC_GROUPS = {"release_year", "year_added", "movie_duration"}
+SCALAR_GROUP = "total"
+
+def aggregate_path(path=AGGREGATE_FILE):
+    """Parquet when pyarrow is installed, otherwise a pickle (as in src.cache)."""
+    return Path(path).with_suffix(".parquet" if _parquet_available() else ".pkl")
+
+def _codes(values):
+    """Integer codes and distinct values; categoricals reuse their codes, NaN gets -1."""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return values.cat.codes.to_numpy(), values.cat.categories
+    return pd.factorize(values)
+
+def _count(codes, n_keys, weights=None):
+    valid = codes >= 0
+    w = None if weights is None else weights[valid]
+    return np.bincount(codes[valid], weights=w, minlength=n_keys)
+
+def _rows(group, keys, counts):
+    keep = counts > 0
+    return pd.DataFrame({
+        "group": group,
+        "key": pd.Index(keys)[keep].astype(str),
+        "value": counts[keep].astype(np.float64),
+    })
+
+@instrumented
+def build_cube(df):
+    """Every count and total used by the plots and the summary export, in one pass over df.
+
+    Each source column is reduced to integer codes once and counted with
+    np.bincount; genres are split per distinct listed_in value and weighted
+    by how often that value occurs, and movie-only counts use a mask over
+    the type codes instead of a filtered copy of the frame.
+    """
+    start = time.perf_counter()
+    parts = []
+
+    type_codes, types = _codes(df["type"])
+    parts.append(_rows("type", types, _count(type_codes, len(types))))
+    movie_code = types.get_loc("Movie") if "Movie" in types else -2
+
+    rating_codes, ratings = _codes(df["rating"])
+    parts.append(_rows("rating", ratings, _count(rating_codes, len(ratings))))
+
+    genre_codes, genre_lists = _codes(df["listed_in"])
+    per_list = _count(genre_codes, len(genre_lists))
+    genres = pd.Series(genre_lists, dtype=object).str.split(",").explode().str.strip()
+    genre_counts = pd.Series(per_list[genres.index.to_numpy()], index=genres.to_numpy()).groupby(level=0).sum()
+    parts.append(_rows("genre", genre_counts.index, genre_counts.to_numpy()))
+
+    country_codes, countries = _codes(df["country_first"])
+    parts.append(_rows("country_first", countries, _count(country_codes, len(countries))))
+
+    for col in ("release_year", "year_added"):
+        codes, keys = _codes(df[col])
+        parts.append(_rows(col, keys, _count(codes, len(keys))))
+
+    duration_codes, durations = _codes(df["duration_value"])
+    is_movie = (type_codes == movie_code).astype(np.float64)
+    parts.append(_rows("movie_duration", durations, _count(duration_codes, len(durations), is_movie)))
+
+    totals = {
+        "rows": len(df),
+        "unique_titles": df["title"].nunique(),
+        "has_director": df["has_director"].sum(),
+        "has_cast": df["has_cast"].sum(),
+        "genre_count": df["genre_count"].sum(),
+    }
+    parts.append(pd.DataFrame({"group": SCALAR_GROUP, "key": list(totals),
+                               "value": np.array(list(totals.values()), dtype=np.float64)}))
+
+    table = pd.concat(parts, ignore_index=True)
+    table["group"] = table["group"].astype("category")
+    logger.info(f"🧮 Aggregated {len(df):,} rows into {len(table):,} cells "
+                f"in {time.perf_counter() - start:.3f}s")
+    return AggregateCube(table)
+
+class AggregateCube:
+    """Long (group, key, value) table of counts with lookups for plots and summaries."""
+
+    def __init__(self, table):
+        self.table = table
+        self._groups = {name: part for name, part in table.groupby("group", observed=True)}
+
+    def counts(self, group):
+        """Counts per key, largest first (ties by key), like Series.value_counts()."""
+        part = self._groups.get(group, self.table.iloc[:0])
+        keys = part["key"].astype(np.float64) if group in NUMERIC_GROUPS else part["key"]
+        counts = pd.Series(part["value"].to_numpy().astype(np.int64), index=pd.Index(keys, name=group),
+                           name="count")
+        return counts.sort_index(kind="stable").sort_values(ascending=False, kind="stable")
+
+    def total(self, name):
+        part = self._groups[SCALAR_GROUP]
+        return float(part.loc[part["key"] == name, "value"].iloc[0])
+
+    def save(self, path=AGGREGATE_FILE):
+        path = aggregate_path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        _write_cached(self.table, path)
+        logger.info(f"💾 Saved aggregate table: {path}")
+        return path
+
+    @classmethod
+    def load(cls, path=AGGREGATE_FILE):
+        return cls(read_cached(aggregate_path(path)))
+
+def as_cube(data):
+    """Accept either a preprocessed DataFrame or an existing AggregateCube."""
+    return data if isinstance(data, AggregateCube) else build_cube(data)
+
+def weighted_median(counts):
+    """Median of the values in counts.index repeated counts times (same as Series.median())."""
+    counts = counts.sort_index()
+    cum = np.cumsum(counts.to_numpy())
+    n = cum[-1]
+    values = counts.index.to_numpy()
+    upper = values[np.searchsorted(cum, n // 2, side="right")]
+    if n % 2:
+        return float(upper)
+    return float((values[np.searchsorted(cum, n // 2 - 1, side="right")] + upper) / 2)
@@ -0,0 +1,224 @@
+import numpy as np
+import time
+from pathlib import Path
+from src.similarity import TopKNeighbors
+from src.artifacts import save_array, _open_npy
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DEFAULT_TABLES = 32
+DEFAULT_BITS = 8
+DEFAULT_PROBES = 2
+DEFAULT_QUERY_BLOCK = 512
+MASK_CELLS = 1 << 26
+
+class LSHIndex:
+    """Random-hyperplane (SimHash) LSH over L2-normalized TF-IDF rows.
+
+    Each of n_tables hashes a row to an n_bits sign pattern of random
+    projections; candidates are the rows sharing a bucket with the query in
+    any table (plus n_probes neighboring buckets per table, obtained by
+    flipping the lowest-margin bits). Candidates are re-ranked with the exact
+    cosine score. More tables/probes raise recall, more bits make buckets
+    smaller and queries faster.
+    """
+
+    def __init__(self, n_tables=DEFAULT_TABLES, n_bits=DEFAULT_BITS, n_probes=DEFAULT_PROBES, seed=42):
+        if not 1 <= n_bits <= 62:
+            raise ValueError("❌ n_bits must be between 1 and 62")
+        self.n_tables = n_tables
+        self.n_bits = n_bits
+        self.n_probes = min(n_probes, n_bits)
+        self.seed = seed
+        self.X = None
+        self.planes = None
+        self.codes = None
+        self.order = None
+
+    @property
+    def params(self):
+        return {"n_tables": self.n_tables, "n_bits": self.n_bits,
+                "n_probes": self.n_probes, "seed": self.seed}
+
+    def _project(self, Q):
+        proj = np.asarray(Q @ self.planes, dtype=np.float32)
+        return proj.reshape(Q.shape[0], self.n_tables, self.n_bits)
+
+    def _hash(self, proj):
+        weights = np.left_shift(1, np.arange(self.n_bits, dtype=np.int64))
+        return (proj > 0).astype(np.int64) @ weights
+
+    def fit(self, X):
+        rng = np.random.default_rng(self.seed)
+        self.X = X.tocsr()
+        self.planes = rng.standard_normal((X.shape[1], self.n_tables * self.n_bits)).astype(np.float32)
+        codes = self._hash(self._project(self.X)).T
+        self.order = np.argsort(codes, axis=1, kind="stable").astype(np.int32)
+        self.codes = np.take_along_axis(codes, self.order, axis=1)
+        return self
+
+    def _probe_codes(self, proj):
+        """(n_queries, n_tables, 1 + n_probes) bucket codes: the home bucket plus one-bit flips."""
+        codes = self._hash(proj)
+        if self.n_probes == 0:
+            return codes[:, :, None]
+        flips = np.argpartition(np.abs(proj), self.n_probes - 1, axis=2)[:, :, :self.n_probes]
+        probed = codes[:, :, None] ^ np.left_shift(1, flips.astype(np.int64))
+        return np.concatenate([codes[:, :, None], probed], axis=2)
+
+    def candidates(self, Q):
+        """(query_row, candidate) pairs from all probed buckets, deduplicated."""
+        probe = self._probe_codes(self._project(Q))
+        q_parts, c_parts = [], []
+        for t in range(self.n_tables):
+            codes_t = probe[:, t, :]
+            lo = np.searchsorted(self.codes[t], codes_t, side="left").ravel()
+            hi = np.searchsorted(self.codes[t], codes_t, side="right").ravel()
+            lengths = hi - lo
+            total = int(lengths.sum())
+            if total == 0:
+                continue
+            # ต่อช่วง [lo, hi) ของทุก bucket เป็น array เดียวแบบ vectorized
+            starts = np.repeat(lo - np.cumsum(lengths) + lengths, lengths)
+            positions = starts + np.arange(total)
+            q_parts.append(np.repeat(np.repeat(np.arange(Q.shape[0]), probe.shape[2]), lengths))
+            c_parts.append(self.order[t][positions])
+        # dedupe ผ่าน bitmap (query x catalog) เร็วกว่า np.unique และได้ลำดับ (q, c) มาเลย
+        seen = np.zeros((Q.shape[0], self.X.shape[0]), dtype=bool)
+        for q, c in zip(q_parts, c_parts):
+            seen[q, c] = True
+        return np.nonzero(seen)
+
+    def _rescore(self, Q, q, c):
+        """Exact cosine of each (query, candidate) pair, reading the candidates' nonzeros in place."""
+        if len(q) == 0:
+            return np.empty(0, dtype=np.float32)
+        Qd = Q.toarray().astype(np.float32)
+        indptr = self.X.indptr
+        lengths = indptr[c + 1] - indptr[c]
+        total = int(lengths.sum())
+        starts = np.repeat(indptr[c] - np.cumsum(lengths) + lengths, lengths)
+        nz = starts + np.arange(total)
+        prods = self.X.data[nz] * Qd[np.repeat(q, lengths), self.X.indices[nz]]
+        return np.bincount(np.repeat(np.arange(len(q)), lengths), weights=prods,
+                           minlength=len(q)).astype(np.float32)
+
+    def query(self, Q, top_k, exclude=None):
+        """Approximate top-k for query rows Q (sparse, L2-normalized).
+
+        exclude gives one row position per query to leave out (e.g. the
+        query title itself). Missing slots are padded with -1 / -inf.
+        """
+        Q = Q.tocsr()
+        step = max(1, MASK_CELLS // max(self.X.shape[0], 1))
+        if Q.shape[0] > step:
+            exclude = None if exclude is None else np.asarray(exclude)
+            parts = [self.query(Q[i:i + step], top_k, None if exclude is None else exclude[i:i + step])
+                     for i in range(0, Q.shape[0], step)]
+            return np.vstack([p[0] for p in parts]), np.vstack([p[1] for p in parts])
+
+        q, c = self.candidates(Q)
+        if exclude is not None:
+            keep = c != np.asarray(exclude)[q]
+            q, c = q[keep], c[keep]
+
+        scores = self._rescore(Q, q, c)
+        order = np.lexsort((c, -scores, q))
+        q, c, scores = q[order], c[order], scores[order]
+        rank = np.arange(len(q)) - np.searchsorted(q, q, side="left")
+        keep = rank < top_k
+
+        indices = np.full((Q.shape[0], top_k), -1, dtype=np.int32)
+        top_scores = np.full((Q.shape[0], top_k), -np.inf, dtype=np.float32)
+        indices[q[keep], rank[keep]] = c[keep]
+        top_scores[q[keep], rank[keep]] = scores[keep]
+        return indices, top_scores
+
+    def save(self, model_dir, prefix="ann_lsh"):
+        model_dir = Path(model_dir)
+        save_array(model_dir / f"{prefix}_planes.npy", self.planes)
+        save_array(model_dir / f"{prefix}_codes.npy", self.codes)
+        save_array(model_dir / f"{prefix}_order.npy", self.order)
+        return {"type": "lsh", "prefix": prefix, **self.params}
+
+    @classmethod
+    def load(cls, model_dir, spec, X):
+        model_dir = Path(model_dir)
+        index = cls(spec["n_tables"], spec["n_bits"], spec["n_probes"], spec["seed"])
+        index.X = X.tocsr()
+        index.planes = np.asarray(_open_npy(model_dir / f"{spec['prefix']}_planes.npy"))
+        index.codes = _open_npy(model_dir / f"{spec['prefix']}_codes.npy")
+        index.order = _open_npy(model_dir / f"{spec['prefix']}_order.npy")
+        return index
+
+def ann_topk_neighbors(X, top_k, index, block_size=DEFAULT_QUERY_BLOCK):
+    """Approximate top-k neighbors of every row using an LSHIndex fitted on X."""
+    n = X.shape[0]
+    k = max(0, min(top_k, n - 1))
+    indices = np.empty((n, k), dtype=np.int32)
+    scores = np.empty((n, k), dtype=np.float32)
+    for start in range(0, n, block_size):
+        stop = min(start + block_size, n)
+        rows = np.arange(start, stop)
+        indices[start:stop], scores[start:stop] = index.query(X[rows], k, exclude=rows)
+    return TopKNeighbors(indices, scores)
+
+def recall_at_k(approx, exact):
+    """Mean share of the exact top-k neighbors that the approximate lists recovered."""
+    hits = 0
+    total = 0
+    for a, e in zip(approx, exact):
+        e = e[e >= 0]
+        hits += len(np.intersect1d(a[a >= 0], e))
+        total += len(e)
+    return hits / total if total else 1.0
+
+def ann_recall_report(X, grid, exact=None, top_k=10, sample=2000, seed=42):
+    """Recall@k and query speed of LSH settings against exact cosine top-k.
+
+    exact may be a stored TopKNeighbors from an exact build or a dense
+    cosine_similarity matrix; by default the exact neighbors of the sampled
+    rows are computed here. grid is a list of LSHIndex keyword dicts.
+    """
+    from src.similarity import select_topk, topk_rows
+
+    rng = np.random.default_rng(seed)
+    rows = np.sort(rng.choice(X.shape[0], size=min(sample, X.shape[0]), replace=False))
+    start = time.perf_counter()
+    if exact is None:
+        exact_idx = topk_rows(X, rows, top_k)[0]
+    elif isinstance(exact, TopKNeighbors):
+        exact_idx = np.asarray(exact.indices[rows, :top_k])
+    else:
+        block = np.array(exact[rows], dtype=np.float32)
+        block[np.arange(len(rows)), rows] = -np.inf
+        exact_idx = select_topk(block, top_k)[0]
+    exact_qps = len(rows) / (time.perf_counter() - start)
+
+    report = []
+    for params in grid:
+        start = time.perf_counter()
+        index = LSHIndex(**params).fit(X)
+        build_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        approx, _ = index.query(X[rows], top_k, exclude=rows)
+        query_s = time.perf_counter() - start
+
+        step = max(1, MASK_CELLS // X.shape[0])
+        n_candidates = sum(len(index.candidates(X[rows[i:i + step]])[0])
+                           for i in range(0, len(rows), step))
+
+        report.append({
+            **index.params,
+            "top_k": top_k,
+            "recall_at_k": recall_at_k(approx, exact_idx),
+            "avg_candidates": n_candidates / len(rows),
+            "build_seconds": build_s,
+            "queries_per_second": len(rows) / query_s,
+            "exact_queries_per_second": exact_qps
+        })
+        logger.info(f"  LSH {index.params}: recall@{top_k}={report[-1]['recall_at_k']:.3f}")
+    return report
@@ -0,0 +1,329 @@
+import pandas as pd
+import numpy as np
+import joblib
+import hashlib
+import json
+import os
+from pathlib import Path
+from src.similarity import TopKNeighbors
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MODEL_DIR = Path("outputs/models")
+ARTIFACT_VERSION = 1
+MANIFEST_FILE = "manifest.json"
+
+CATALOG_COLUMNS = [
+    "show_id", "title", "type", "release_year", "rating",
+    "duration", "listed_in", "description", "country_first", "text"
+]
+
+def title_key(title):
+    """Stable 64-bit hash of a title, used for lookups without loading the index map."""
+    digest = hashlib.blake2b(str(title).strip().encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+def save_array(path, array):
+    """np.save via a temp file + rename, so readers that have the old file mapped are not broken."""
+    path = Path(path)
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        np.save(f, array)
+    os.replace(tmp, path)
+
+def _open_npy(path):
+    """Memory-map a .npy file; empty arrays cannot be mapped so they are read normally."""
+    try:
+        return np.load(path, mmap_mode="r")
+    except ValueError:
+        return np.load(path)
+
+def _write_string_column(values, out_dir, col):
+    """Store a text column as one UTF-8 blob plus int64 offsets so single rows can be sliced out."""
+    nulls = pd.isna(values)
+    encoded = [b"" if null else str(v).encode("utf-8") for v, null in zip(values, nulls)]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    save_array(out_dir / f"{col}.blob.npy", np.frombuffer(b"".join(encoded), dtype=np.uint8))
+    save_array(out_dir / f"{col}.offsets.npy", offsets)
+    if nulls.any():
+        save_array(out_dir / f"{col}.nulls.npy", np.asarray(nulls, dtype=bool))
+    return {"kind": "str", "has_nulls": bool(nulls.any())}
+
+def write_catalog(df, model_dir=MODEL_DIR):
+    """Write title metadata as per-column memory-mappable arrays plus a title hash index."""
+    out_dir = Path(model_dir) / "catalog"
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    columns = {}
+    for col in CATALOG_COLUMNS:
+        if col not in df.columns:
+            continue
+        values = df[col].to_numpy()
+        if pd.api.types.is_numeric_dtype(df[col]):
+            save_array(out_dir / f"{col}.npy", values)
+            columns[col] = {"kind": "num", "dtype": str(values.dtype)}
+        else:
+            columns[col] = _write_string_column(values, out_dir, col)
+
+    keys = np.fromiter((title_key(t) for t in df["title"]), dtype=np.uint64, count=len(df))
+    order = np.argsort(keys, kind="stable")
+    save_array(out_dir / "title_hash.npy", keys[order])
+    save_array(out_dir / "title_hash_pos.npy", order.astype(np.int64))
+
+    return columns
+
+def write_manifest(model_dir=MODEL_DIR, **fields):
+    """Create or update manifest.json with the given fields."""
+    path = Path(model_dir) / MANIFEST_FILE
+    manifest = {}
+    if path.exists():
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    manifest.update(fields)
+    manifest["format_version"] = ARTIFACT_VERSION
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+    return manifest
+
+def write_artifacts(df, mode, top_k=None, model_dir=MODEL_DIR):
+    """Write the catalog and a fresh manifest describing the current model build."""
+    path = Path(model_dir) / MANIFEST_FILE
+    path.unlink(missing_ok=True)
+    columns = write_catalog(df, model_dir)
+    from src.filters import write_filters
+    return write_manifest(
+        model_dir,
+        n_items=len(df),
+        similarity_mode=mode,
+        top_k=top_k if mode == "topk" else None,
+        catalog_columns=columns,
+        filters=write_filters(df, model_dir)
+    )
+
+class Catalog:
+    """Read-only title metadata backed by memory-mapped column files.
+
+    Columns are opened on first access, so looking up one title only
+    touches the pages that hold that row.
+    """
+
+    def __init__(self, path, columns, n_items):
+        self.path = Path(path)
+        self.columns = columns
+        self.n_items = n_items
+        self._open = {}
+
+    def __len__(self):
+        return self.n_items
+
+    def _column(self, col):
+        if col not in self._open:
+            spec = self.columns[col]
+            if spec["kind"] == "num":
+                self._open[col] = _open_npy(self.path / f"{col}.npy")
+            else:
+                nulls = None
+                if spec.get("has_nulls"):
+                    nulls = _open_npy(self.path / f"{col}.nulls.npy")
+                self._open[col] = (
+                    _open_npy(self.path / f"{col}.blob.npy"),
+                    _open_npy(self.path / f"{col}.offsets.npy"),
+                    nulls
+                )
+        return self._open[col]
+
+    def value(self, col, i):
+        data = self._column(col)
+        if self.columns[col]["kind"] == "num":
+            return data[i].item()
+        blob, offsets, nulls = data
+        if nulls is not None and nulls[i]:
+            return np.nan
+        return bytes(blob[offsets[i]:offsets[i + 1]]).decode("utf-8")
+
+    def row(self, i, columns=None):
+        columns = columns or list(self.columns)
+        return pd.Series({col: self.value(col, i) for col in columns}, name=int(i))
+
+    def take(self, positions, columns=None):
+        """Rows at the given positions as a DataFrame (positions=None means all rows)."""
+        columns = columns or list(self.columns)
+        if positions is None:
+            positions = np.arange(self.n_items)
+        positions = np.asarray(positions, dtype=np.int64)
+        data = {}
+        for col in columns:
+            if self.columns[col]["kind"] == "num":
+                data[col] = np.asarray(self._column(col)[positions])
+            elif len(positions) * 16 < self.n_items:
+                data[col] = [self.value(col, i) for i in positions]
+            else:
+                data[col] = self._decode_many(col, positions)
+        return pd.DataFrame(data, index=positions)
+
+    def _decode_many(self, col, positions):
+        """Decode many rows from one in-memory copy of the blob instead of slicing the map per row."""
+        blob, offsets, nulls = self._column(col)
+        raw = blob.tobytes()
+        starts, ends = offsets[positions], offsets[positions + 1]
+        values = [raw[a:b].decode("utf-8") for a, b in zip(starts.tolist(), ends.tolist())]
+        if nulls is not None:
+            for j in np.flatnonzero(nulls[positions]):
+                values[j] = np.nan
+        return values
+
+class TitleIndex:
+    """Mapping-like title -> row position lookup over the sorted hash arrays."""
+
+    def __init__(self, catalog):
+        self.catalog = catalog
+        self.keys = _open_npy(catalog.path / "title_hash.npy")
+        self.positions = _open_npy(catalog.path / "title_hash_pos.npy")
+
+    def get(self, title, default=None):
+        title = str(title).strip()
+        key = np.uint64(title_key(title))
+        lo = np.searchsorted(self.keys, key, side="left")
+        hi = np.searchsorted(self.keys, key, side="right")
+        # ชื่อซ้ำให้ตำแหน่งสุดท้าย เหมือน index_map เดิม
+        for j in range(hi - 1, lo - 1, -1):
+            pos = int(self.positions[j])
+            if self.catalog.value("title", pos) == title:
+                return pos
+        return default
+
+    def __contains__(self, title):
+        return self.get(title) is not None
+
+    def __getitem__(self, title):
+        pos = self.get(title)
+        if pos is None:
+            raise KeyError(title)
+        return pos
+
+    def __len__(self):
+        return len(self.keys)
+
+class ModelArtifacts:
+    """Lazily opened model directory described by manifest.json."""
+
+    def __init__(self, model_dir, manifest):
+        self.model_dir = Path(model_dir)
+        self.manifest = manifest
+        self.catalog = Catalog(self.model_dir / "catalog", manifest["catalog_columns"],
+                               manifest["n_items"])
+        self.title_index = TitleIndex(self.catalog)
+        self._sim = None
+        self._vectorizer = None
+        self._matrix = None
+        self._ann = None
+        self._embedding = None
+        self._filters = None
+        self._title_search = None
+
+    def __len__(self):
+        return self.manifest["n_items"]
+
+    @property
+    def sim(self):
+        if self._sim is None:
+            self._sim = load_similarity(self.model_dir, self.manifest.get("score_encoding"))
+        return self._sim
+
+    @property
+    def matrix(self):
+        """L2-normalized TF-IDF matrix (CSR), or None if this build did not persist it."""
+        if self._matrix is None and self.manifest.get("tfidf_matrix"):
+            import scipy.sparse as sp
+            self._matrix = sp.load_npz(self.model_dir / self.manifest["tfidf_matrix"]).tocsr()
+        return self._matrix
+
+    @property
+    def ann(self):
+        """Approximate nearest-neighbor index saved with the model, or None."""
+        spec = self.manifest.get("ann")
+        if self._ann is None and spec and self.matrix is not None:
+            from src.ann import LSHIndex
+            self._ann = LSHIndex.load(self.model_dir, spec, self.matrix)
+        return self._ann
+
+    @property
+    def embedding(self):
+        """SVD embedding saved with the model (engine="svd"), or None."""
+        spec = self.manifest.get("embedding")
+        if self._embedding is None and spec:
+            from src.embedding import SVDEmbedding
+            self._embedding = SVDEmbedding.load(self.model_dir, spec)
+        return self._embedding
+
+    @property
+    def filters(self):
+        """Bitmap filter index over type/rating/year/country/genre, or None for older builds."""
+        if self._filters is None and self.manifest.get("filters"):
+            from src.filters import FilterIndex, FILTER_DIR
+            self._filters = FilterIndex(self.model_dir / FILTER_DIR, self.manifest["filters"], len(self))
+        return self._filters
+
+    @property
+    def scoring_matrix(self):
+        """Row vectors whose dot products give the stored similarity scores (SVD embeddings or TF-IDF)."""
+        if self.embedding is not None:
+            return self.embedding.embeddings
+        return self.matrix
+
+    @property
+    def title_search(self):
+        """Prefix/substring/fuzzy title search index, or None for builds without one."""
+        if self._title_search is None and self.manifest.get("title_search"):
+            from src.title_search import TitleSearchIndex
+            self._title_search = TitleSearchIndex(self.model_dir / self.manifest["title_search"])
+        return self._title_search
+
+    @property
+    def vectorizer(self):
+        if self._vectorizer is None:
+            self._vectorizer = joblib.load(self.model_dir / "tfidf_vectorizer.pkl")
+        return self._vectorizer
+
+def load_similarity(model_dir=MODEL_DIR, encoding=None):
+    """Memory-map the top-K neighbor index if present, otherwise the dense matrix.
+
+    Compact (float16/uint8) artifacts are decoded on access; encoding is the
+    manifest's "score_encoding" and is read from the manifest if not given.
+    """
+    from src.quantize import decoded_similarity
+
+    model_dir = Path(model_dir)
+    if encoding is None and (model_dir / MANIFEST_FILE).exists():
+        with open(model_dir / MANIFEST_FILE, "r", encoding="utf-8") as f:
+            encoding = json.load(f).get("score_encoding")
+    if (model_dir / "tfidf_topk_indices.npy").exists():
+        sim = TopKNeighbors(
+            _open_npy(model_dir / "tfidf_topk_indices.npy"),
+            _open_npy(model_dir / "tfidf_topk_scores.npy")
+        )
+    else:
+        sim = _open_npy(model_dir / "tfidf_similarity.npy")
+    return decoded_similarity(sim, encoding)
+
+def open_artifacts(model_dir=MODEL_DIR):
+    """Open a model directory without reading any array data up front."""
+    path = Path(model_dir) / MANIFEST_FILE
+    if not path.exists():
+        raise FileNotFoundError(f"❌ No {MANIFEST_FILE} in {model_dir}. Run 'python main.py' first.")
+
+    with open(path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+
+    version = manifest.get("format_version")
+    if version != ARTIFACT_VERSION:
+        raise ValueError(
+            f"❌ Model artifacts are format v{version}, expected v{ARTIFACT_VERSION}. "
+            "Rebuild with 'python main.py'."
+        )
+    return ModelArtifacts(model_dir, manifest)
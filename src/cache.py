@@ -0,0 +1,87 @@
+import pandas as pd
+import hashlib
+import os
+from pathlib import Path
+from src.load_data import load_netflix
+from src.preprocess import preprocess
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = Path("outputs/cache")
+KEEP_ENTRIES = 3
+HASH_CHUNK = 1 << 20
+# โค้ดที่มีผลต่อ frame ที่ cache ไว้
+CODE_FILES = ["load_data.py", "preprocess.py"]
+
+def code_version():
+    """Hash of the loading/preprocessing source, so edits to either invalidate the cache."""
+    digest = hashlib.blake2b(digest_size=8)
+    for name in CODE_FILES:
+        digest.update((Path(__file__).parent / name).read_bytes())
+    return digest.hexdigest()
+
+def cache_key(raw_path):
+    """Content hash of the raw CSV combined with the code version."""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(raw_path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+            digest.update(chunk)
+    digest.update(code_version().encode("ascii"))
+    return digest.hexdigest()
+
+def _parquet_available():
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+def cache_path(key, cache_dir=CACHE_DIR):
+    """Parquet when pyarrow is installed, otherwise a pickle of the frame."""
+    suffix = "parquet" if _parquet_available() else "pkl"
+    return Path(cache_dir) / f"catalog_{key}.{suffix}"
+
+def read_cached(path):
+    path = Path(path)
+    if path.suffix == ".parquet":
+        return pd.read_parquet(path)
+    return pd.read_pickle(path)
+
+def _write_cached(df, path):
+    tmp = path.with_name(path.name + ".tmp")
+    if path.suffix == ".parquet":
+        df.to_parquet(tmp)
+    else:
+        df.to_pickle(tmp)
+    os.replace(tmp, path)
+
+def _prune(cache_dir, keep):
+    """Drop all but the `keep` most recently used cache entries."""
+    entries = sorted(Path(cache_dir).glob("catalog_*.*"), key=lambda p: p.stat().st_mtime, reverse=True)
+    for stale in entries[keep:]:
+        stale.unlink(missing_ok=True)
+
+def load_preprocessed(raw_path="data/netflix_titles.csv", cache_dir=CACHE_DIR, refresh=False):
+    """Preprocessed catalog for raw_path, from the columnar cache when its key matches.
+
+    Returns (df, raw_df, path): raw_df is the freshly loaded raw frame on a
+    cache miss and None on a hit; path is the cache file backing df.
+    """
+    Path(cache_dir).mkdir(parents=True, exist_ok=True)
+    key = cache_key(raw_path)
+    path = cache_path(key, cache_dir)
+
+    if path.exists() and not refresh:
+        df = read_cached(path)
+        os.utime(path)
+        logger.info(f"⚡ Using cached catalog {path} ({len(df):,} rows)")
+        return df, None, path
+
+    raw = load_netflix(raw_path)
+    df = preprocess(raw)
+    _write_cached(df, path)
+    _prune(cache_dir, KEEP_ENTRIES)
+    logger.info(f"💾 Cached preprocessed catalog: {path}")
+    return df, raw, path
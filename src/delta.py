@@ -0,0 +1,223 @@
+import pandas as pd
+import numpy as np
+import json
+import os
+import time
+from pathlib import Path
+from src.cache import read_cached, _write_cached, _parquet_available
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DELTA_DIR = Path("outputs/delta")
+MANIFEST_FILE = "manifest.json"
+
+def write_csv(df, path):
+    """Default writer for snapshots and deltas (same escaping as the Power BI export)."""
+    df.to_csv(path, index=False, encoding="utf-8-sig", escapechar='\\', doublequote=True,
+              lineterminator='\n')
+
+def read_csv(path):
+    """Read a snapshot or delta back exactly as written (every value as text)."""
+    return pd.read_csv(path, encoding="utf-8-sig", dtype=str, keep_default_na=False, escapechar='\\')
+
+def key_hashes(df, key):
+    """One uint64 per key value over all of its rows (order-sensitive when a key has several rows)."""
+    rows = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    codes, keys = pd.factorize(df[key].astype(str))
+    rank = pd.Series(codes).groupby(codes).cumcount().to_numpy().astype(np.uint64)
+    combined = np.zeros(len(keys), dtype=np.uint64)
+    # uint64 ล้นแล้ววนรอบ (mod 2^64) ตามปกติของ numpy
+    np.add.at(combined, codes, rows * (2 * rank + 1))
+    return pd.Series(combined, index=pd.Index(keys, name=key), name="hash")
+
+def _diff_hashes(old, hashes):
+    """(inserted, updated) boolean masks over hashes.index, compared with the stored hashes."""
+    inserted = ~hashes.index.isin(old.index)
+    known = hashes.index[~inserted]
+    updated = np.zeros(len(hashes), dtype=bool)
+    updated[~inserted] = old.loc[known].to_numpy() != hashes.loc[known].to_numpy()
+    return inserted, updated
+
+def _hash_path(set_dir):
+    return set_dir / ("hashes.parquet" if _parquet_available() else "hashes.pkl")
+
+def _read_manifest(set_dir):
+    path = set_dir / MANIFEST_FILE
+    if not path.exists():
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def _write_manifest(set_dir, manifest):
+    path = set_dir / MANIFEST_FILE
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, path)
+
+def _save_hashes(set_dir, hashes):
+    frame = hashes.reset_index()
+    frame["hash"] = frame["hash"].astype(np.uint64)
+    _write_cached(frame, _hash_path(set_dir))
+
+def _load_hashes(set_dir, key):
+    frame = read_cached(_hash_path(set_dir))
+    return pd.Series(frame["hash"].to_numpy(), index=pd.Index(frame[key].astype(str), name=key), name="hash")
+
+def _stamp(set_dir):
+    """Timestamp for file names, unique within set_dir."""
+    stamp = time.strftime("%Y%m%dT%H%M%S")
+    n = 1
+    while any(set_dir.glob(f"*_{stamp}*")):
+        n += 1
+        stamp = f"{time.strftime('%Y%m%dT%H%M%S')}-{n}"
+    return stamp
+
+def export_delta(df, name, key="show_id", out_dir=DELTA_DIR, write=write_csv, suffix=".csv"):
+    """Write only the rows of df that changed since the last export of this set.
+
+    The first export writes a full base snapshot. Later ones compare per-key
+    row hashes with the stored ones and write a dated upsert file (inserted
+    and updated keys, all of their rows) and a delete file (removed keys).
+    Returns the manifest entry for this export, or None if nothing changed.
+    """
+    set_dir = Path(out_dir) / name
+    set_dir.mkdir(parents=True, exist_ok=True)
+    manifest = _read_manifest(set_dir)
+    if manifest is not None and manifest["key"] != key:
+        raise ValueError(f"❌ Delta set '{name}' is keyed by {manifest['key']}, not {key}")
+
+    hashes = key_hashes(df, key)
+    stamp = _stamp(set_dir)
+
+    if manifest is None:
+        base = f"base_{stamp}{suffix}"
+        write(df, set_dir / base)
+        _save_hashes(set_dir, hashes)
+        _write_manifest(set_dir, {"name": name, "key": key, "base": base, "base_keys": len(hashes),
+                                  "deltas": []})
+        logger.info(f"📸 Delta set '{name}': wrote base snapshot {base} ({len(hashes):,} keys)")
+        return {"stamp": stamp, "inserted": len(hashes), "updated": 0, "deleted": 0, "base": base}
+
+    old = _load_hashes(set_dir, key)
+    inserted, updated = _diff_hashes(old, hashes)
+    deleted = old.index[~old.index.isin(hashes.index)]
+
+    entry = {"stamp": stamp, "inserted": int(inserted.sum()), "updated": int(updated.sum()),
+             "deleted": len(deleted)}
+    if not (inserted.any() or updated.any() or len(deleted)):
+        logger.info(f"✅ Delta set '{name}': no changes")
+        return None
+
+    changed_keys = hashes.index[inserted | updated]
+    upserts = df[df[key].astype(str).isin(changed_keys)]
+    entry["upserts"] = f"upserts_{stamp}{suffix}"
+    write(upserts, set_dir / entry["upserts"])
+    entry["deletes"] = f"deletes_{stamp}.csv"
+    write_csv(pd.DataFrame({key: deleted.to_numpy()}), set_dir / entry["deletes"])
+
+    _save_hashes(set_dir, hashes)
+    manifest["deltas"].append(entry)
+    _write_manifest(set_dir, manifest)
+    logger.info(f"🔺 Delta set '{name}': ➕ {entry['inserted']:,} inserted | ✏️ {entry['updated']:,} updated "
+                f"| 🗑️ {entry['deleted']:,} deleted -> {entry['upserts']}")
+    return entry
+
+def _append_csv(df, path, first):
+    """write_csv for one block of a streamed file (BOM and header only on the first block)."""
+    df.to_csv(path, mode="w" if first else "a", header=first, index=False,
+              encoding="utf-8-sig" if first else "utf-8", escapechar='\\', doublequote=True,
+              lineterminator='\n')
+
+def export_delta_blocks(blocks, name, key="show_id", out_dir=DELTA_DIR):
+    """export_delta for a frame that arrives as an iterable of blocks (CSV only).
+
+    Every key must have all of its rows in one block. Only the per-key
+    hashes are held for the whole set; base or upsert rows are appended
+    to the output file as each block is compared, so the full frame is
+    never in memory. Produces the same files and hashes as export_delta.
+    """
+    set_dir = Path(out_dir) / name
+    set_dir.mkdir(parents=True, exist_ok=True)
+    manifest = _read_manifest(set_dir)
+    if manifest is not None and manifest["key"] != key:
+        raise ValueError(f"❌ Delta set '{name}' is keyed by {manifest['key']}, not {key}")
+
+    old = _load_hashes(set_dir, key) if manifest is not None else None
+    stamp = _stamp(set_dir)
+    out = set_dir / (f"base_{stamp}.csv" if old is None else f"upserts_{stamp}.csv")
+    parts, n_inserted, n_updated, written = [], 0, 0, False
+    for block in blocks:
+        hashes = key_hashes(block, key)
+        parts.append(hashes)
+        if old is not None:
+            inserted, updated = _diff_hashes(old, hashes)
+            n_inserted += int(inserted.sum())
+            n_updated += int(updated.sum())
+            block = block[block[key].astype(str).isin(hashes.index[inserted | updated])]
+        if len(block):
+            _append_csv(block, out, first=not written)
+            written = True
+    hashes = (pd.concat(parts) if parts
+              else pd.Series([], dtype=np.uint64, index=pd.Index([], name=key), name="hash"))
+
+    if old is None:
+        if not written:
+            write_csv(pd.DataFrame(columns=[key]), out)
+        _save_hashes(set_dir, hashes)
+        _write_manifest(set_dir, {"name": name, "key": key, "base": out.name, "base_keys": len(hashes),
+                                  "deltas": []})
+        logger.info(f"📸 Delta set '{name}': wrote base snapshot {out.name} ({len(hashes):,} keys)")
+        return {"stamp": stamp, "inserted": len(hashes), "updated": 0, "deleted": 0, "base": out.name}
+
+    deleted = old.index[~old.index.isin(hashes.index)]
+    entry = {"stamp": stamp, "inserted": n_inserted, "updated": n_updated, "deleted": len(deleted)}
+    if not (written or len(deleted)):
+        logger.info(f"✅ Delta set '{name}': no changes")
+        return None
+
+    if not written:
+        write_csv(pd.DataFrame(columns=[key]), out)
+    entry["upserts"] = out.name
+    entry["deletes"] = f"deletes_{stamp}.csv"
+    write_csv(pd.DataFrame({key: deleted.to_numpy()}), set_dir / entry["deletes"])
+
+    _save_hashes(set_dir, hashes)
+    manifest["deltas"].append(entry)
+    _write_manifest(set_dir, manifest)
+    logger.info(f"🔺 Delta set '{name}': ➕ {entry['inserted']:,} inserted | ✏️ {entry['updated']:,} updated "
+                f"| 🗑️ {entry['deleted']:,} deleted -> {entry['upserts']}")
+    return entry
+
+def compact_deltas(name, out_dir=DELTA_DIR, read=read_csv, write=write_csv, suffix=".csv"):
+    """Fold the base snapshot and every delta of a set into a new base snapshot."""
+    set_dir = Path(out_dir) / name
+    manifest = _read_manifest(set_dir)
+    if manifest is None:
+        raise FileNotFoundError(f"❌ No delta set '{name}' in {out_dir}")
+    if not manifest["deltas"]:
+        logger.info(f"✅ Delta set '{name}': nothing to compact")
+        return set_dir / manifest["base"]
+
+    key = manifest["key"]
+    snapshot = read(set_dir / manifest["base"])
+    for entry in manifest["deltas"]:
+        upserts = read(set_dir / entry["upserts"])
+        deletes = read_csv(set_dir / entry["deletes"])[key]
+        replaced = snapshot[key].isin(upserts[key]) | snapshot[key].isin(deletes)
+        snapshot = pd.concat([snapshot[~replaced], upserts], ignore_index=True)
+
+    stamp = _stamp(set_dir)
+    base = f"base_{stamp}{suffix}"
+    write(snapshot, set_dir / base)
+    old_files = [manifest["base"]] + [e[f] for e in manifest["deltas"] for f in ("upserts", "deletes")]
+    _write_manifest(set_dir, {"name": name, "key": key, "base": base,
+                              "base_keys": int(snapshot[key].nunique()), "deltas": []})
+    for file in old_files:
+        (set_dir / file).unlink(missing_ok=True)
+        (set_dir / f"{file}.sha256").unlink(missing_ok=True)
+    logger.info(f"🗜️ Delta set '{name}': compacted {len(manifest['deltas'])} deltas into {base} "
+                f"({len(snapshot):,} rows)")
+    return set_dir / base
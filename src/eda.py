@@ -1,11 +1,23 @@
 import matplotlib.pyplot as plt
 import seaborn as sns
+import hashlib
+import inspect
+import json
+import pickle
+import time
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from src.aggregates import as_cube, weighted_median
+from src.similarity import resolve_n_jobs
+from src.instrument import instrumented
 import logging
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+PLOT_DIR = "outputs/plots"
+PLOT_STATE_FILE = ".plot_state.json"
+
 sns.set_theme(style="whitegrid")
 plt.rcParams['font.family'] = 'sans-serif'
 plt.rcParams['font.sans-serif'] = ['Arial', 'DejaVu Sans', 'Liberation Sans']
@@ -22,137 +34,228 @@ def save_plot(filename):
         logger.error(f"❌ Failed to save plot {filename}: {e}")
         plt.close()
 
-def plot_top_genres(df, out="outputs/plots/top_genres.png"):
-    """Plot top 20 genres."""
+# แต่ละกราฟแยกเป็น aggregate (อ่านจาก AggregateCube ได้ข้อมูลเล็กๆ) กับ render (ทำใน worker)
+
+def aggregate_top_genres(cube):
+    top = cube.counts("genre").head(20).reset_index()
+    top.columns = ['Genre', 'Count']
+    return top
+
+def render_top_genres(top, out):
+    plt.figure(figsize=(10, 6))
+    sns.barplot(data=top, x='Count', y='Genre', hue='Genre', legend=False, palette='viridis')
+    plt.title("Top 20 Netflix Genres", fontsize=15, fontweight='bold')
+    plt.xlabel("Number of Titles")
+    plt.ylabel("")
+    save_plot(out)
+
+def aggregate_top_countries(cube):
+    top = cube.counts("country_first").head(20).reset_index()
+    top.columns = ['Country', 'Count']
+    return top[top['Country'] != 'Unknown']
+
+def render_top_countries(top, out):
+    plt.figure(figsize=(10, 6))
+    sns.barplot(data=top, x='Count', y='Country', hue='Country', legend=False, palette='magma')
+    plt.title("Top Producing Countries", fontsize=15, fontweight='bold')
+    plt.xlabel("Number of Titles")
+    plt.ylabel("")
+    save_plot(out)
+
+def aggregate_content_type(cube):
+    type_counts = cube.counts("type").reset_index()
+    type_counts.columns = ['Type', 'Count']
+    return type_counts
+
+def render_content_type(type_counts, out):
+    plt.figure(figsize=(8, 6))
+    colors = ['#e50914', "#5e5e5e"]
+    plt.pie(type_counts['Count'], labels=type_counts['Type'], autopct='%1.1f%%',
+            startangle=90, colors=colors, textprops={'fontsize': 12})
+    plt.title("Content Type Distribution", fontsize=15, fontweight='bold')
+    save_plot(out)
+
+def aggregate_ratings(cube):
+    ratings = cube.counts("rating").head(15).reset_index()
+    ratings.columns = ['Rating', 'Count']
+    return ratings
+
+def render_ratings(ratings, out):
+    plt.figure(figsize=(10, 6))
+    sns.barplot(data=ratings, x='Count', y='Rating', hue='Rating', 
+               legend=False, palette='rocket')
+    plt.title("Top 15 Content Ratings", fontsize=15, fontweight='bold')
+    plt.xlabel("Number of Titles")
+    plt.ylabel("")
+    save_plot(out)
+
+def aggregate_release_trend(cube):
+    year_counts = cube.counts("release_year").sort_index()
+    return year_counts[year_counts.index >= 1990]
+
+def render_release_trend(year_counts, out):
+    plt.figure(figsize=(12, 6))
+    plt.plot(year_counts.index, year_counts.values, linewidth=2, color='#e50914')
+    plt.fill_between(year_counts.index, year_counts.values, alpha=0.3, color='#e50914')
+    plt.title("Content Release Trend (1990+)", fontsize=15, fontweight='bold')
+    plt.xlabel("Year")
+    plt.ylabel("Number of Titles")
+    plt.grid(True, alpha=0.3)
+    save_plot(out)
+
+def aggregate_duration(cube):
+    """Movie durations as (value -> count); the histogram is drawn from these weights."""
+    counts = cube.counts("movie_duration").sort_index()
+    return {'counts': counts, 'median': weighted_median(counts)}
+
+def render_duration(data, out):
+    counts = data['counts']
+    plt.figure(figsize=(10, 6))
+    plt.hist(counts.index, bins=30, weights=counts.values, color='#e50914', alpha=0.7, edgecolor='black')
+    plt.axvline(data['median'], color='yellow', linestyle='--', 
+               linewidth=2, label=f"Median: {data['median']:.0f} min")
+    plt.title("Movie Duration Distribution", fontsize=15, fontweight='bold')
+    plt.xlabel("Duration (minutes)")
+    plt.ylabel("Frequency")
+    plt.legend()
+    save_plot(out)
+
+def aggregate_added_trend(cube):
+    added_counts = cube.counts("year_added").sort_index()
+    return added_counts[added_counts.index >= 2010]
+
+def render_added_trend(added_counts, out):
+    plt.figure(figsize=(12, 6))
+    plt.bar(added_counts.index, added_counts.values, color='#221f1f', alpha=0.8)
+    plt.title("Content Added to Netflix by Year", fontsize=15, fontweight='bold')
+    plt.xlabel("Year Added")
+    plt.ylabel("Number of Titles")
+    plt.xticks(rotation=45)
+    save_plot(out)
+
+# (ชื่อ, ไฟล์, aggregate, render) เรียงตามลำดับเดิมของ generate_all_plots
+PLOTS = [
+    ("Content Type", "content_type.png", aggregate_content_type, render_content_type),
+    ("Top Genres", "top_genres.png", aggregate_top_genres, render_top_genres),
+    ("Top Countries", "top_countries.png", aggregate_top_countries, render_top_countries),
+    ("Ratings", "ratings.png", aggregate_ratings, render_ratings),
+    ("Release Trend", "release_trend.png", aggregate_release_trend, render_release_trend),
+    ("Duration", "duration.png", aggregate_duration, render_duration),
+    ("Added Trend", "added_trend.png", aggregate_added_trend, render_added_trend),
+]
+
+def _plot(name, aggregate, render, df, out):
+    """Aggregate and render one plot in this process."""
     try:
-        genres = df["listed_in"].dropna().str.split(",").explode().str.strip()
-        top = genres.value_counts().head(20).reset_index()
-        top.columns = ['Genre', 'Count']
-
-        plt.figure(figsize=(10, 6))
-        sns.barplot(data=top, x='Count', y='Genre', hue='Genre', legend=False, palette='viridis')
-        plt.title("Top 20 Netflix Genres", fontsize=15, fontweight='bold')
-        plt.xlabel("Number of Titles")
-        plt.ylabel("")
-        save_plot(out)
+        render(aggregate(as_cube(df)), out)
     except Exception as e:
-        logger.error(f"❌ Failed to plot genres: {e}")
+        logger.error(f"❌ Failed to plot {name.lower()}: {e}")
+
+def plot_top_genres(df, out=f"{PLOT_DIR}/top_genres.png"):
+    """Plot top 20 genres."""
+    _plot("Top Genres", aggregate_top_genres, render_top_genres, df, out)
 
-def plot_top_countries(df, out="outputs/plots/top_countries.png"):
+def plot_top_countries(df, out=f"{PLOT_DIR}/top_countries.png"):
     """Plot top 20 producing countries."""
-    try:
-        top = df["country_first"].value_counts().head(20).reset_index()
-        top.columns = ['Country', 'Count']
-        top = top[top['Country'] != 'Unknown']
-
-        plt.figure(figsize=(10, 6))
-        sns.barplot(data=top, x='Count', y='Country', hue='Country', legend=False, palette='magma')
-        plt.title("Top Producing Countries", fontsize=15, fontweight='bold')
-        plt.xlabel("Number of Titles")
-        plt.ylabel("")
-        save_plot(out)
-    except Exception as e:
-        logger.error(f"❌ Failed to plot countries: {e}")
+    _plot("Top Countries", aggregate_top_countries, render_top_countries, df, out)
 
-def plot_content_type(df, out="outputs/plots/content_type.png"):
+def plot_content_type(df, out=f"{PLOT_DIR}/content_type.png"):
     """Plot content type distribution."""
-    try:
-        type_counts = df['type'].value_counts().reset_index()
-        type_counts.columns = ['Type', 'Count']
-        
-        plt.figure(figsize=(8, 6))
-        colors = ['#e50914', "#5e5e5e"]
-        plt.pie(type_counts['Count'], labels=type_counts['Type'], autopct='%1.1f%%',
-                startangle=90, colors=colors, textprops={'fontsize': 12})
-        plt.title("Content Type Distribution", fontsize=15, fontweight='bold')
-        save_plot(out)
-    except Exception as e:
-        logger.error(f"❌ Failed to plot content type: {e}")
+    _plot("Content Type", aggregate_content_type, render_content_type, df, out)
 
-def plot_ratings_distribution(df, out="outputs/plots/ratings.png"):
+def plot_ratings_distribution(df, out=f"{PLOT_DIR}/ratings.png"):
     """Plot ratings distribution."""
-    try:
-        ratings = df['rating'].value_counts().head(15).reset_index()
-        ratings.columns = ['Rating', 'Count']
-        
-        plt.figure(figsize=(10, 6))
-        sns.barplot(data=ratings, x='Count', y='Rating', hue='Rating', 
-                   legend=False, palette='rocket')
-        plt.title("Top 15 Content Ratings", fontsize=15, fontweight='bold')
-        plt.xlabel("Number of Titles")
-        plt.ylabel("")
-        save_plot(out)
-    except Exception as e:
-        logger.error(f"❌ Failed to plot ratings: {e}")
+    _plot("Ratings", aggregate_ratings, render_ratings, df, out)
 
-def plot_release_year_trend(df, out="outputs/plots/release_trend.png"):
+def plot_release_year_trend(df, out=f"{PLOT_DIR}/release_trend.png"):
     """Plot release year trend."""
-    try:
-        year_counts = df['release_year'].value_counts().sort_index()
-        year_counts = year_counts[year_counts.index >= 1990]
-        
-        plt.figure(figsize=(12, 6))
-        plt.plot(year_counts.index, year_counts.values, linewidth=2, color='#e50914')
-        plt.fill_between(year_counts.index, year_counts.values, alpha=0.3, color='#e50914')
-        plt.title("Content Release Trend (1990+)", fontsize=15, fontweight='bold')
-        plt.xlabel("Year")
-        plt.ylabel("Number of Titles")
-        plt.grid(True, alpha=0.3)
-        save_plot(out)
-    except Exception as e:
-        logger.error(f"❌ Failed to plot release trend: {e}")
+    _plot("Release Trend", aggregate_release_trend, render_release_trend, df, out)
 
-def plot_duration_distribution(df, out="outputs/plots/duration.png"):
+def plot_duration_distribution(df, out=f"{PLOT_DIR}/duration.png"):
     """Plot movie duration distribution."""
-    try:
-        movies = df[df['type'] == 'Movie']['duration_value'].dropna()
-        
-        plt.figure(figsize=(10, 6))
-        plt.hist(movies, bins=30, color='#e50914', alpha=0.7, edgecolor='black')
-        plt.axvline(movies.median(), color='yellow', linestyle='--', 
-                   linewidth=2, label=f'Median: {movies.median():.0f} min')
-        plt.title("Movie Duration Distribution", fontsize=15, fontweight='bold')
-        plt.xlabel("Duration (minutes)")
-        plt.ylabel("Frequency")
-        plt.legend()
-        save_plot(out)
-    except Exception as e:
-        logger.error(f"❌ Failed to plot duration: {e}")
+    _plot("Duration", aggregate_duration, render_duration, df, out)
 
-def plot_added_by_year(df, out="outputs/plots/added_trend.png"):
+def plot_added_by_year(df, out=f"{PLOT_DIR}/added_trend.png"):
     """Plot content added to Netflix by year."""
+    _plot("Added Trend", aggregate_added_trend, render_added_trend, df, out)
+
+def _init_worker():
+    plt.switch_backend("Agg")
+
+def _render_task(task):
+    """Render one plot in a worker; returns (name, seconds, error)."""
+    name, render, data, out = task
+    start = time.perf_counter()
     try:
-        added_counts = df['year_added'].value_counts().sort_index()
-        added_counts = added_counts[added_counts.index >= 2010]
-        
-        plt.figure(figsize=(12, 6))
-        plt.bar(added_counts.index, added_counts.values, color='#221f1f', alpha=0.8)
-        plt.title("Content Added to Netflix by Year", fontsize=15, fontweight='bold')
-        plt.xlabel("Year Added")
-        plt.ylabel("Number of Titles")
-        plt.xticks(rotation=45)
-        save_plot(out)
+        render(data, out)
+        return name, time.perf_counter() - start, None
     except Exception as e:
-        logger.error(f"❌ Failed to plot added trend: {e}")
+        plt.close('all')
+        return name, time.perf_counter() - start, str(e)
+
+def _data_hash(render, data):
+    """Fingerprint of a plot's aggregated input plus its rendering code."""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(inspect.getsource(render).encode("utf-8"))
+    digest.update(pickle.dumps(data, protocol=4))
+    return digest.hexdigest()
+
+@instrumented
+def generate_all_plots(data, out_dir=PLOT_DIR, workers=-1, skip_unchanged=False):
+    """Generate all standard plots from a preprocessed DataFrame or an AggregateCube.
 
-def generate_all_plots(df):
-    """Generate all standard plots."""
+    Each plot's aggregate is a lookup in the shared cube; rendering runs at dpi=300 in a process pool with
+    the Agg backend (workers=-1 = all cores, 1 = in this process with its current backend), each
+    worker receiving only the small aggregated frame for its plot. With
+    skip_unchanged=True, plots whose aggregated input and rendering code
+    match the last render are not drawn again. Returns a per-plot report.
+    """
     logger.info("\n📊 Generating plots...")
-    
-    plots = [
-        ("Content Type", plot_content_type),
-        ("Top Genres", plot_top_genres),
-        ("Top Countries", plot_top_countries),
-        ("Ratings", plot_ratings_distribution),
-        ("Release Trend", plot_release_year_trend),
-        ("Duration", plot_duration_distribution),
-        ("Added Trend", plot_added_by_year)
-    ]
-    
-    for name, plot_func in plots:
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    state_file = out_dir / PLOT_STATE_FILE
+    state = json.loads(state_file.read_text(encoding="utf-8")) if state_file.exists() else {}
+
+    cube = as_cube(data)
+    report, tasks, hashes = {}, [], {}
+    for name, filename, aggregate, render in PLOTS:
+        start = time.perf_counter()
         try:
-            plot_func(df)
+            plot_data = aggregate(cube)
         except Exception as e:
             logger.error(f"❌ Failed to generate {name}: {e}")
-    
-    logger.info("✅ All plots generated successfully.\n")
\ No newline at end of file
+            report[name] = {"status": "failed", "aggregate_s": time.perf_counter() - start, "render_s": 0.0}
+            continue
+        out = out_dir / filename
+        hashes[name] = _data_hash(render, plot_data)
+        report[name] = {"status": "rendered", "aggregate_s": time.perf_counter() - start, "render_s": 0.0}
+        if skip_unchanged and out.exists() and state.get(name) == hashes[name]:
+            report[name]["status"] = "skipped"
+            continue
+        tasks.append((name, render, plot_data, str(out)))
+
+    workers = min(resolve_n_jobs(workers), max(1, len(tasks)))
+    if workers == 1:
+        # ไม่สลับ backend ของ process ผู้เรียก (switch_backend ปิดทุก figure ใน notebook ด้วย)
+        results = list(map(_render_task, tasks))
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+            results = list(executor.map(_render_task, tasks))
+    for name, seconds, error in results:
+        report[name]["render_s"] = seconds
+        if error:
+            logger.error(f"❌ Failed to generate {name}: {error}")
+            report[name]["status"] = "failed"
+
+    for name, info in report.items():
+        if info["status"] == "rendered":
+            state[name] = hashes[name]
+        elif info["status"] == "failed":
+            state.pop(name, None)
+    state_file.write_text(json.dumps(state, indent=2), encoding="utf-8")
+
+    logger.info(f"  {'plot':<14} {'status':<9} {'aggregate':>10} {'render':>8}")
+    for name, info in report.items():
+        logger.info(f"  {name:<14} {info['status']:<9} {info['aggregate_s']:>9.3f}s {info['render_s']:>7.2f}s")
+    logger.info("✅ All plots generated successfully.\n")
+    return report
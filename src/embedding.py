@@ -0,0 +1,126 @@
+import numpy as np
+import time
+from pathlib import Path
+from src.similarity import TopKNeighbors, select_topk, topk_rows, dense_topk_neighbors, DEFAULT_BLOCK_SIZE
+from src.artifacts import save_array, _open_npy
+from src.ann import recall_at_k
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DEFAULT_DIMS = 128
+REPORT_SAMPLE = 1000
+
+def _normalize_rows(E):
+    """L2-normalize rows in place (all-zero rows stay zero)."""
+    norms = np.linalg.norm(E, axis=1, keepdims=True)
+    np.divide(E, norms, out=E, where=norms > 0)
+    return E
+
+class SVDEmbedding:
+    """TruncatedSVD (LSA) projection of the TF-IDF rows to a few dense dimensions.
+
+    Embeddings are float32 and L2-normalized, so cosine similarity is one
+    dense matrix product: n_rows * dims * 4 bytes instead of the sparse
+    TF-IDF matrix, and BLAS instead of sparse products for scoring.
+    """
+
+    def __init__(self, dims=DEFAULT_DIMS, seed=42):
+        self.dims = dims
+        self.seed = seed
+        self.components = None
+        self.embeddings = None
+        self.explained_variance = None
+
+    @property
+    def params(self):
+        return {"dims": self.dims, "seed": self.seed}
+
+    def fit(self, X):
+        from sklearn.decomposition import TruncatedSVD
+
+        dims = max(1, min(self.dims, X.shape[1] - 1, X.shape[0] - 1))
+        svd = TruncatedSVD(n_components=dims, random_state=self.seed)
+        E = svd.fit_transform(X).astype(np.float32)
+        self.components = svd.components_.astype(np.float32)
+        self.explained_variance = float(svd.explained_variance_ratio_.sum())
+        self.embeddings = _normalize_rows(E)
+        return self
+
+    def transform(self, Q):
+        """Embed (sparse) TF-IDF rows with the fitted components."""
+        return _normalize_rows(np.asarray(Q @ self.components.T, dtype=np.float32))
+
+    def neighbors(self, top_k, block_size=DEFAULT_BLOCK_SIZE):
+        return dense_topk_neighbors(self.embeddings, top_k, block_size)
+
+    def query(self, Q, top_k, exclude=None):
+        """Top-k catalog rows for TF-IDF query rows Q (same interface as LSHIndex.query)."""
+        scores = self.transform(Q) @ self.embeddings.T
+        if exclude is not None:
+            scores[np.arange(len(scores)), np.asarray(exclude)] = -np.inf
+        return select_topk(scores, top_k)
+
+    def save(self, model_dir, prefix="svd"):
+        model_dir = Path(model_dir)
+        save_array(model_dir / f"{prefix}_components.npy", self.components)
+        save_array(model_dir / f"{prefix}_embeddings.npy", self.embeddings)
+        return {"type": "svd", "prefix": prefix, **self.params,
+                "explained_variance": self.explained_variance}
+
+    @classmethod
+    def load(cls, model_dir, spec):
+        model_dir = Path(model_dir)
+        embedding = cls(spec["dims"], spec["seed"])
+        embedding.components = np.asarray(_open_npy(model_dir / f"{spec['prefix']}_components.npy"))
+        embedding.embeddings = _open_npy(model_dir / f"{spec['prefix']}_embeddings.npy")
+        embedding.explained_variance = spec.get("explained_variance")
+        return embedding
+
+def _sparse_bytes(X):
+    return X.data.nbytes + X.indices.nbytes + X.indptr.nbytes
+
+def embedding_report(X, embedding, top_k, sim=None, sample=REPORT_SAMPLE, seed=42):
+    """Speed, memory and recall@k of an embedding against exact TF-IDF cosine top-k.
+
+    Both sides score the same sampled rows against the whole catalog;
+    sim, if given, is the embedding's own TopKNeighbors (otherwise the
+    sampled rows are scored here).
+    """
+    rng = np.random.default_rng(seed)
+    rows = np.sort(rng.choice(X.shape[0], size=min(sample, X.shape[0]), replace=False))
+
+    start = time.perf_counter()
+    exact_idx = topk_rows(X, rows, top_k)[0]
+    exact_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    approx_idx = embedding.query(X[rows], top_k, exclude=rows)[0]
+    embed_s = time.perf_counter() - start
+    if sim is not None:
+        approx_idx = np.asarray(sim.indices[rows, :top_k])
+
+    return {
+        **embedding.params,
+        "top_k": top_k,
+        "sample": len(rows),
+        "recall_at_k": recall_at_k(approx_idx, exact_idx),
+        "explained_variance": embedding.explained_variance,
+        "queries_per_second": len(rows) / embed_s,
+        "exact_queries_per_second": len(rows) / exact_s,
+        "embedding_mb": embedding.embeddings.nbytes / 1024 / 1024,
+        "tfidf_mb": _sparse_bytes(X) / 1024 / 1024,
+    }
+
+def embedding_topk_neighbors(X, top_k, embedding, block_size=DEFAULT_BLOCK_SIZE):
+    """Top-k neighbors of every row from a fitted SVDEmbedding, plus its report against exact TF-IDF."""
+    start = time.perf_counter()
+    sim = embedding.neighbors(top_k, block_size)
+    seconds = time.perf_counter() - start
+    report = embedding_report(X, embedding, top_k, sim=sim)
+    report["topk_seconds"] = seconds
+    logger.info(f"  📉 SVD {embedding.dims}d: recall@{top_k}={report['recall_at_k']:.3f} vs TF-IDF, "
+                f"{report['embedding_mb']:.1f} MB vs {report['tfidf_mb']:.1f} MB, "
+                f"{report['queries_per_second']:,.0f} vs {report['exact_queries_per_second']:,.0f} q/s")
+    return sim, report
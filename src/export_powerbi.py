@@ -1,10 +1,46 @@
 import pandas as pd
+import numpy as np
+import codecs
+import hashlib
+import os
+import sys
+import time
 from pathlib import Path
+from src.aggregates import as_cube
+from src.cache import _parquet_available
+from src.delta import export_delta, compact_deltas
+from src.preprocess import _WHITESPACE, _as_text
+from src.instrument import instrumented
 import logging
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+POWERBI_FILE = "outputs/cleaned_netflix_powerbi.csv"
+# ข้อความ CSV ของแต่ละ chunk อยู่ในหน่วยความจำทั้งก้อน (str อาจใช้ 4 byte/ตัวอักษร) จึงใช้ chunk เล็ก
+EXPORT_CHUNK_ROWS = 20_000
+
+# Clean text columns ที่มักมีปัญหา
+TEXT_COLUMNS = ['description', 'cast', 'director', 'title', 'listed_in', 'text']
+
+# เรียงลำดับ columns
+COLUMN_ORDER = [
+    "show_id", "type", "title", "director", "cast", "country", 
+    "country_first", "release_year", "rating", "duration", 
+    "duration_value", "listed_in", "description", "text", 
+    "year_added", "month_added", "has_director", "has_cast", "genre_count"
+]
+
+STAR_DIR = "outputs/powerbi_star"
+POWERBI_DELTA = "powerbi"
+
+# fact table ของ star schema: คอลัมน์ระดับ title (ไม่มี text และคอลัมน์ list ที่แยกเป็น bridge แล้ว)
+FACT_COLUMNS = [
+    "show_id", "type", "title", "country_first", "release_year", "rating",
+    "duration", "duration_value", "date_added", "year_added", "month_added",
+    "description", "has_director", "has_cast", "genre_count"
+]
+
 def clean_for_powerbi(text):
     """Clean text to prevent CSV parsing issues in Power BI"""
     if pd.isna(text) or text == "":
@@ -22,57 +58,206 @@ def clean_for_powerbi(text):
     
     return text.strip()
 
-def export_powerbi(df):
-    """Export data for Power BI with robust CSV handling"""
-    Path("outputs").mkdir(exist_ok=True)
-    
-    # สร้าง clean copy
-    df_export = df.copy()
-    
-    # Clean text columns ที่มักมีปัญหา
-    text_columns = ['description', 'cast', 'director', 'title', 'listed_in', 'text']
-    for col in text_columns:
-        if col in df_export.columns:
-            logger.info(f"  Cleaning column: {col}")
-            df_export[col] = df_export[col].apply(clean_for_powerbi)
-    
-    # เรียงลำดับ columns
-    column_order = [
-        "show_id", "type", "title", "director", "cast", "country", 
-        "country_first", "release_year", "rating", "duration", 
-        "duration_value", "listed_in", "description", "text", 
-        "year_added", "month_added", "has_director", "has_cast", "genre_count"
-    ]
-    
-    cols = [c for c in column_order if c in df_export.columns]
-    
-    output_file = "outputs/cleaned_netflix_powerbi.csv"
-    
-    # Export with explicit quoting and escaping
-    df_export[cols].to_csv(
-        output_file, 
-        index=False, 
-        encoding="utf-8-sig",
-        quoting=1,  # QUOTE_ALL - quote all fields
-        escapechar='\\',  # explicit escape character
-        doublequote=True,  # double quotes for quotes
-        lineterminator='\n'  # explicit line terminator
+def clean_for_powerbi_series(values):
+    """Vectorized clean_for_powerbi over a column (missing values become "")."""
+    return (
+        _as_text(values)
+        .str.replace(_WHITESPACE, " ", regex=True)
+        .str.strip(" ")
+        .str.replace('"', "'", regex=False)
+        .fillna("")
     )
+
+def _peak_rss_mb():
+    """Peak resident memory of this process so far; None where resource is unavailable (Windows)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    # ru_maxrss เป็น KB บน Linux แต่เป็น byte บน macOS
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+@instrumented
+def export_powerbi(df, output_file=POWERBI_FILE, chunk_rows=EXPORT_CHUNK_ROWS, star_schema=False):
+    """Export data for Power BI with robust CSV handling.
+
+    Rows are cleaned and written chunk by chunk (no full copy of df); the
+    row count and SHA-256 of the bytes written are computed on the way (no
+    second parse of the file), and the checksum is saved next to the file
+    in sha256sum format. Validation checks the written rows against len(df)
+    and the file size against the bytes hashed. Returns a report with rows,
+    bytes, checksum, seconds and peak RSS. With
+    star_schema=True the tables of export_star_schema are written as well.
+    """
+    start = time.perf_counter()
+    output_file = Path(output_file)
+    output_file.parent.mkdir(parents=True, exist_ok=True)
+    cols = [c for c in COLUMN_ORDER if c in df.columns]
+    text_columns = [c for c in TEXT_COLUMNS if c in cols]
+    logger.info(f"  Cleaning columns: {', '.join(text_columns)}")
+
+    digest = hashlib.sha256()
+    rows = n_bytes = 0
+    tmp = output_file.with_name(output_file.name + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(codecs.BOM_UTF8)
+        digest.update(codecs.BOM_UTF8)
+        n_bytes += len(codecs.BOM_UTF8)
+        for offset in range(0, max(len(df), 1), chunk_rows):
+            chunk = df.iloc[offset:offset + chunk_rows][cols]
+            chunk = chunk.assign(**{c: clean_for_powerbi_series(chunk[c]) for c in text_columns})
+            
+            # Export with explicit quoting and escaping
+            data = chunk.to_csv(
+                index=False,
+                header=offset == 0,
+                quoting=1,  # QUOTE_ALL - quote all fields
+                escapechar='\\',  # explicit escape character
+                doublequote=True,  # double quotes for quotes
+                lineterminator='\n'  # explicit line terminator
+            ).encode("utf-8")
+            digest.update(data)
+            rows += len(chunk)
+            n_bytes += len(data)
+            f.write(data)
+    os.replace(tmp, output_file)
+
+    checksum = digest.hexdigest()
+    output_file.with_name(output_file.name + ".sha256").write_text(
+        f"{checksum}  {output_file.name}\n", encoding="utf-8")
+    report = {
+        "rows": rows,
+        "bytes": n_bytes,
+        "sha256": checksum,
+        "seconds": time.perf_counter() - start,
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+    logger.info(f"💾 Export PowerBI: {output_file} ({len(df):,} rows, "
+                f"{n_bytes / 1024 / 1024:.1f} MB in {report['seconds']:.2f}s)")
     
-    logger.info(f"💾 Export PowerBI: {output_file} ({len(df_export):,} rows)")
+    # Validation check: จำนวนแถวที่เขียนจริง และขนาดไฟล์บนดิสก์ตรงกับ byte ที่ hash ไว้
+    size = output_file.stat().st_size
+    if rows != len(df):
+        logger.warning(f"⚠️ Row mismatch: Expected {len(df):,}, got {rows:,}")
+    elif size != n_bytes:
+        logger.warning(f"⚠️ Size mismatch: hashed {n_bytes:,} bytes, file has {size:,}")
+    else:
+        logger.info(f"✅ Validation passed: {rows:,} rows, {size:,} bytes, sha256 {checksum[:12]}…")
+    
+    if star_schema:
+        report["star_schema"] = {name: str(path) for name, path in export_star_schema(df).items()}
+    return report
+
+def _write_powerbi(df, path):
+    export_powerbi(df, path)
+
+def export_powerbi_delta(df):
+    """Incremental Power BI export keyed by show_id: only inserted/updated/deleted rows (see src.delta)."""
+    cols = [c for c in COLUMN_ORDER if c in df.columns]
+    return export_delta(df[cols], POWERBI_DELTA, key="show_id", write=_write_powerbi)
+
+def compact_powerbi_deltas():
+    """Fold the Power BI base snapshot and its deltas into a new base snapshot."""
+    return compact_deltas(POWERBI_DELTA, write=_write_powerbi)
+
+def _split_lists(values):
+    """Explode a comma-separated column without splitting every row.
+
+    Each distinct value is split once; returns (rows, positions, part_idx,
+    parts) where row rows[i] has parts[part_idx[i]] as its positions[i]-th item.
+    """
+    codes, uniques = pd.factorize(_as_text(values))
+    split = pd.Series(uniques, dtype=object).str.split(",").explode().str.strip()
+    split = split[split.notna() & (split != "")]
+    parts = split.to_numpy(dtype=object)
+    n_parts = np.bincount(split.index.to_numpy(), minlength=len(uniques))
+    first = np.cumsum(n_parts) - n_parts
+
+    rows = np.flatnonzero(codes >= 0)
+    lengths = n_parts[codes[rows]]
+    ends = np.cumsum(lengths)
+    positions = np.arange(ends[-1] if len(ends) else 0) - np.repeat(ends - lengths, lengths)
+    part_idx = np.repeat(first[codes[rows]], lengths) + positions
+    return np.repeat(rows, lengths), positions, part_idx, parts
+
+def _dimension(name, *exploded):
+    """Dimension table over the parts of one or more exploded columns, plus each column's keys."""
+    codes, values = pd.factorize(np.concatenate([parts for *_, parts in exploded]), sort=True)
+    keys, start = [], 0
+    for rows, positions, part_idx, parts in exploded:
+        keys.append(codes[start:start + len(parts)][part_idx].astype(np.int32))
+        start += len(parts)
+    dim = pd.DataFrame({f"{name}_key": np.arange(len(values), dtype=np.int32), name: values})
+    return dim, keys
+
+def _write_table(df, path):
+    """Parquet (read natively by Power BI) when pyarrow is installed, otherwise CSV."""
+    path = path.with_suffix(".parquet" if _parquet_available() else ".csv")
+    tmp = path.with_name(path.name + ".tmp")
+    if path.suffix == ".parquet":
+        df.to_parquet(tmp, index=False)
+    else:
+        df.to_csv(tmp, index=False, encoding="utf-8-sig", lineterminator='\n')
+    os.replace(tmp, path)
+    return path
+
+@instrumented
+def export_star_schema(df, out_dir=STAR_DIR):
+    """Export a fact table plus genre/country/person dimensions and bridge tables.
+
+    Every table is keyed by integer surrogate keys (title_key = row of the
+    fact table), so Power BI relates them instead of splitting listed_in,
+    country and cast strings on every refresh. Returns {table: path}.
+    """
+    start = time.perf_counter()
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    if not _parquet_available():
+        logger.warning("⚠️ pyarrow not installed, writing the star schema as CSV")
+
+    fact = df[[c for c in FACT_COLUMNS if c in df.columns]].reset_index(drop=True)
+    fact.insert(0, "title_key", np.arange(len(fact), dtype=np.int32))
+    tables = {"fact_title": fact}
+
+    genres = _split_lists(df["listed_in"])
+    tables["dim_genre"], (genre_keys,) = _dimension("genre", genres)
+    tables["bridge_title_genre"] = pd.DataFrame({
+        "title_key": genres[0].astype(np.int32), "genre_key": genre_keys})
+
+    countries = _split_lists(df["country"])
+    tables["dim_country"], (country_keys,) = _dimension("country", countries)
+    tables["bridge_title_country"] = pd.DataFrame({
+        "title_key": countries[0].astype(np.int32), "country_key": country_keys,
+        "is_primary": countries[1] == 0})
+
+    directors, cast = _split_lists(df["director"]), _split_lists(df["cast"])
+    tables["dim_person"], (director_keys, cast_keys) = _dimension("person", directors, cast)
+    tables["bridge_title_person"] = pd.DataFrame({
+        "title_key": np.concatenate([directors[0], cast[0]]).astype(np.int32),
+        "person_key": np.concatenate([director_keys, cast_keys]),
+        "role": pd.Categorical(np.repeat(["director", "cast"], [len(director_keys), len(cast_keys)]),
+                               categories=["director", "cast"]),
+        "billing": np.concatenate([directors[1], cast[1]]).astype(np.int16) + 1,
+    })
+
+    paths = {name: _write_table(table, out_dir / name) for name, table in tables.items()}
+    total_mb = sum(p.stat().st_size for p in paths.values()) / 1024 / 1024
+    for name, table in tables.items():
+        logger.info(f"  {name:<22} {len(table):>9,} rows")
+    logger.info(f"⭐ Export star schema: {out_dir}/ ({len(paths)} tables, {total_mb:.1f} MB "
+                f"in {time.perf_counter() - start:.2f}s)")
+    return paths
+
+def export_summary_stats(data):
+    """Export summary statistics from a preprocessed DataFrame or an AggregateCube"""
+    cube = as_cube(data)
+    types = cube.counts('type')
+    ratings = cube.counts('rating')
+    years = cube.counts('release_year').index
+    durations = cube.counts('movie_duration')
+    rows = cube.total('rows')
     
-    # Validation check
-    try:
-        test_df = pd.read_csv(output_file, encoding='utf-8-sig')
-        if len(test_df) == len(df_export):
-            logger.info(f"✅ Validation passed: {len(test_df):,} rows")
-        else:
-            logger.warning(f"⚠️ Row mismatch: Expected {len(df_export):,}, got {len(test_df):,}")
-    except Exception as e:
-        logger.error(f"❌ Validation failed: {e}")
-
-def export_summary_stats(df):
-    """Export summary statistics"""
     stats = {
         'Metric': [
             'Total Content',
@@ -89,18 +274,19 @@ def export_summary_stats(df):
             'Avg Genres per Title'
         ],
         'Value': [
-            len(df),
-            len(df[df['type'] == 'Movie']),
-            len(df[df['type'] == 'TV Show']),
-            df['country_first'].nunique(),
-            df['title'].nunique(),
-            int(df['release_year'].min()),
-            int(df['release_year'].max()),
-            f"{df[df['type'] == 'Movie']['duration_value'].mean():.1f}",
-            df['rating'].mode()[0] if len(df['rating'].mode()) > 0 else 'N/A',
-            f"{(df['has_director'].sum() / len(df) * 100):.1f}%",
-            f"{(df['has_cast'].sum() / len(df) * 100):.1f}%",
-            f"{df['genre_count'].mean():.1f}"
+            int(rows),
+            int(types.get('Movie', 0)),
+            int(types.get('TV Show', 0)),
+            len(cube.counts('country_first')),
+            int(cube.total('unique_titles')),
+            int(years.min()),
+            int(years.max()),
+            f"{(durations.index * durations).sum() / durations.sum():.1f}",
+            # mode: จำนวนมากสุด ถ้าเท่ากันเอาค่าที่เรียงก่อน
+            ratings.index[0] if len(ratings) > 0 else 'N/A',
+            f"{(cube.total('has_director') / rows * 100):.1f}%",
+            f"{(cube.total('has_cast') / rows * 100):.1f}%",
+            f"{cube.total('genre_count') / rows:.1f}"
         ]
     }
     
@@ -109,4 +295,4 @@ def export_summary_stats(df):
     stats_df.to_csv(output_file, index=False, encoding="utf-8-sig")
     logger.info(f"📊 Export statistics: {output_file}")
     
-    return stats_df
\ No newline at end of file
+    return stats_df
@@ -0,0 +1,160 @@
+import numpy as np
+import pandas as pd
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from src.artifacts import save_array, _open_npy
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+FILTER_DIR = "filters"
+# attribute -> คอลัมน์ใน catalog; genre เป็นหลายค่าต่อเรื่อง (listed_in คั่นด้วย ", ")
+FILTER_COLUMNS = {
+    "type": "type",
+    "rating": "rating",
+    "year": "release_year",
+    "country": "country_first",
+    "genre": "listed_in",
+}
+FILTER_KEYS = ("type", "rating", "max_rating", "min_year", "max_year", "country", "genre")
+# เรียงจากเหมาะกับเด็กที่สุดไปจำกัดอายุมากที่สุด; NR/UR ไม่อยู่ในลำดับ จึงไม่ผ่าน max_rating
+RATING_ORDER = ["TV-Y", "TV-Y7", "TV-Y7-FV", "G", "TV-G", "PG", "TV-PG", "PG-13", "TV-14", "R", "TV-MA", "NC-17"]
+MASK_CACHE_SIZE = 256
+
+def _values_per_row(df, attr):
+    """(row, value) pairs of an attribute; genres give one pair per genre."""
+    values = df[FILTER_COLUMNS[attr]]
+    if attr == "genre":
+        parts = values.astype(object).where(values.notna(), "").astype(str).str.split(",").explode()
+        parts = parts.str.strip()
+        parts = parts[parts != ""]
+        return parts.index.to_numpy(), parts.to_numpy(dtype=object)
+    keep = values.notna().to_numpy()
+    if attr == "year":
+        return np.flatnonzero(keep), values[keep].astype(np.int64).to_numpy()
+    return np.flatnonzero(keep), values[keep].astype(str).to_numpy(dtype=object)
+
+def write_filters(df, model_dir):
+    """Packed bitmaps (one bit per title) for every value of each filter attribute.
+
+    Returns the manifest entry {attr: [values...]}; row i of filters/<attr>.npy
+    is the np.packbits bitmap of the titles having values[i].
+    """
+    out_dir = Path(model_dir) / FILTER_DIR
+    out_dir.mkdir(parents=True, exist_ok=True)
+    df = df.reset_index(drop=True)
+    n = len(df)
+    spec = {}
+    for attr, col in FILTER_COLUMNS.items():
+        if col not in df.columns:
+            continue
+        rows, values = _values_per_row(df, attr)
+        codes, uniques = pd.factorize(values, sort=True)
+        # ตั้ง bit ใน array ที่ pack แล้วโดยตรง (ลำดับ bit เดียวกับ np.packbits) ไม่ต้องสร้าง bool ค่า x เรื่อง
+        packed = np.zeros((len(uniques), (n + 7) // 8), dtype=np.uint8)
+        np.bitwise_or.at(packed, (codes, rows >> 3), (0x80 >> (rows & 7)).astype(np.uint8))
+        save_array(out_dir / f"{attr}.npy", packed)
+        spec[attr] = [v.item() if hasattr(v, "item") else v for v in uniques]
+    return spec
+
+def _as_list(value):
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return [v.strip() for v in value.split(",") if v.strip()]
+    return list(value)
+
+def normalize_filters(filters):
+    """Validated filter dict with list values for multi-valued keys; None when empty."""
+    if not filters:
+        return None
+    unknown = set(filters) - set(FILTER_KEYS)
+    if unknown:
+        raise ValueError(f"❌ Unknown filter: {', '.join(sorted(unknown))}")
+    spec = {}
+    for key, value in filters.items():
+        if value is None or value == "" or value == []:
+            continue
+        if key in ("min_year", "max_year"):
+            spec[key] = int(value)
+        elif key == "max_rating":
+            if value not in RATING_ORDER:
+                raise ValueError(f"❌ max_rating must be one of {', '.join(RATING_ORDER)}")
+            spec[key] = value
+        else:
+            spec[key] = tuple(_as_list(value))
+    return spec or None
+
+class FilterIndex:
+    """Bitmap index over type, rating, release year, first country and genres.
+
+    mask(filters) ANDs one OR-ed bitmap per filter on packed bytes (n/8 bytes
+    per value) and caches the resulting boolean mask per filter set, so a
+    repeated filter costs a dict lookup. The cache is shared by the serving
+    threads and guarded by a lock.
+    """
+
+    def __init__(self, path, spec, n_items):
+        self.path = Path(path)
+        self.spec = spec
+        self.n_items = n_items
+        self._open = {}
+        self._lookup = {attr: {v: i for i, v in enumerate(values)} for attr, values in spec.items()}
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _bitmaps(self, attr):
+        if attr not in self._open:
+            self._open[attr] = _open_npy(self.path / f"{attr}.npy")
+        return self._open[attr]
+
+    def _any_of(self, attr, values):
+        """Packed bitmap of titles with any of the values (unknown values match nothing)."""
+        if attr not in self.spec:
+            raise ValueError(f"❌ This model has no '{attr}' filter index")
+        rows = [self._lookup[attr][v] for v in values if v in self._lookup[attr]]
+        if not rows:
+            return np.zeros(self._bitmaps(attr).shape[1], dtype=np.uint8)
+        return np.bitwise_or.reduce(np.asarray(self._bitmaps(attr)[sorted(rows)]), axis=0)
+
+    def _packed(self, spec):
+        parts = []
+        if "type" in spec:
+            parts.append(self._any_of("type", spec["type"]))
+        if "rating" in spec:
+            parts.append(self._any_of("rating", spec["rating"]))
+        if "max_rating" in spec:
+            allowed = RATING_ORDER[:RATING_ORDER.index(spec["max_rating"]) + 1]
+            parts.append(self._any_of("rating", allowed))
+        if "min_year" in spec or "max_year" in spec:
+            lo, hi = spec.get("min_year", -np.inf), spec.get("max_year", np.inf)
+            parts.append(self._any_of("year", [y for y in self.spec.get("year", []) if lo <= y <= hi]))
+        if "country" in spec:
+            parts.append(self._any_of("country", spec["country"]))
+        if "genre" in spec:
+            parts.append(self._any_of("genre", spec["genre"]))
+        return np.bitwise_and.reduce(parts, axis=0)
+
+    def mask(self, filters=None, **kwargs):
+        """Boolean array (one per title) of titles passing every filter, or None without filters.
+
+        Filters: type, rating, genre, country (a value or list, any-of),
+        max_rating (e.g. "TV-14", by RATING_ORDER), min_year / max_year
+        (inclusive release years).
+        """
+        spec = normalize_filters({**(filters or {}), **kwargs})
+        if spec is None:
+            return None
+        key = tuple(sorted(spec.items()))
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+        mask = np.unpackbits(self._packed(spec), count=self.n_items).astype(bool)
+        with self._lock:
+            self._cache[key] = mask
+            if len(self._cache) > MASK_CACHE_SIZE:
+                self._cache.popitem(last=False)
+        return mask
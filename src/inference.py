@@ -1,24 +1,41 @@
 import pandas as pd
 import numpy as np
-import joblib
 import json
+from collections import namedtuple
+from pathlib import Path
+from src.similarity import TopKNeighbors, select_topk
+from src.artifacts import Catalog, load_similarity, open_artifacts
+from src.cache import read_cached
 import logging
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+MODEL_DIR = Path("outputs/models")
+
 def load_model():
-    """Load trained model artifacts."""
+    """Load trained model artifacts.
+
+    Metadata comes from the preprocessed catalog cache the model was built
+    from (or the model's own catalog when the cache is gone or the model was
+    updated since); the similarity arrays are memory-mapped. Use
+    src.artifacts.open_artifacts when only a few titles are needed.
+    """
     logger.info("⏳ Loading model...")
     
     try:
-        vectorizer = joblib.load("outputs/models/tfidf_vectorizer.pkl")
-        sim = np.load("outputs/models/tfidf_similarity.npy")
+        sim = load_similarity(MODEL_DIR)
         
-        with open("outputs/models/tfidf_index_map.json", "r", encoding="utf-8") as f:
+        with open(MODEL_DIR / "tfidf_index_map.json", "r", encoding="utf-8") as f:
             index_map = json.load(f)
         
-        df = pd.read_csv("outputs/cleaned_netflix_powerbi.csv")
+        model = open_artifacts(MODEL_DIR)
+        source = model.manifest.get("source_cache")
+        if source and Path(source).exists():
+            df = read_cached(source)
+        else:
+            df = model.catalog.take(None)
+        df = df.reset_index(drop=True)
         
         logger.info(f"✅ Model loaded successfully ({len(df):,} items)\n")
         return df, sim, index_map
@@ -27,8 +44,155 @@ def load_model():
         logger.error(f"❌ Failed to load model: {e}")
         raise
 
-def get_recommendations(title, df, sim, index_map, top_k=5):
-    """Get content recommendations based on similarity."""
+def take_rows(df, positions, columns):
+    """Select rows by position from a DataFrame or a lazy Catalog."""
+    if isinstance(df, Catalog):
+        return df.take(positions, columns)
+    return df.iloc[positions][columns].copy()
+
+RECOMMENDATION_COLUMNS = ['title', 'type', 'release_year', 'rating', 'listed_in', 'description']
+SEARCH_COLUMNS = ['title', 'type', 'release_year', 'rating']
+DENSE_QUERY_CHUNK = 256
+
+BatchRecommendations = namedtuple("BatchRecommendations", ["query", "indices", "scores"])
+
+def _lookup_positions(titles, index_map):
+    """Row position per title, -1 for titles that are not in the index."""
+    positions = np.full(len(titles), -1, dtype=np.int64)
+    for i, title in enumerate(titles):
+        pos = index_map.get(str(title).strip())
+        if pos is not None:
+            positions[i] = pos
+    return positions
+
+def _topk_from_dense(sim, positions, top_k, mask=None):
+    """argpartition top-K over 2-D slices of the dense matrix, excluding each query itself.
+
+    Columns outside mask are set to -inf before selection; slots that
+    could only be filled with -inf come back as -1.
+    """
+    k = min(top_k, sim.shape[1] - 1)
+    indices = np.empty((len(positions), k), dtype=np.int32)
+    scores = np.empty((len(positions), k), dtype=np.float32)
+    for start in range(0, len(positions), DENSE_QUERY_CHUNK):
+        chunk = positions[start:start + DENSE_QUERY_CHUNK]
+        rows = np.array(sim[chunk], dtype=np.float32)
+        if mask is not None:
+            rows[:, ~mask] = -np.inf
+        rows[np.arange(len(chunk)), chunk] = -np.inf
+        indices[start:start + len(chunk)], scores[start:start + len(chunk)] = select_topk(rows, k)
+    if mask is not None:
+        indices[np.isneginf(scores)] = -1
+    return indices, scores
+
+def _topk_from_candidates(matrix, positions, candidates, top_k):
+    """Exact top-K among candidate rows, scored by dot products with the (L2-normalized) matrix."""
+    k = min(top_k, len(candidates))
+    indices = np.full((len(positions), top_k), -1, dtype=np.int32)
+    scores = np.full((len(positions), top_k), -np.inf, dtype=np.float32)
+    C = matrix[candidates]
+    for start in range(0, len(positions), DENSE_QUERY_CHUNK):
+        chunk = positions[start:start + DENSE_QUERY_CHUNK]
+        block = matrix[chunk] @ C.T
+        block = np.asarray(block.toarray() if hasattr(block, "toarray") else block, dtype=np.float32)
+        block[candidates[None, :] == chunk[:, None]] = -np.inf
+        idx, top = select_topk(block, k)
+        stop = start + len(chunk)
+        indices[start:stop, :k], scores[start:stop, :k] = candidates[idx], top
+    indices[np.isneginf(scores)] = -1
+    return indices, scores
+
+def _filter_topk(sim, positions, top_k, mask, matrix=None):
+    """Filtered top-K from stored neighbor lists, exact-scoring rows the lists cannot fill.
+
+    Stored neighbors that pass the mask keep their order, so when at least
+    top_k of them pass the result equals the filtered top-K. Rows left with
+    fewer than min(top_k, matching titles) fall back to scoring every
+    matching title against the matrix (model.scoring_matrix).
+    """
+    stored_idx = np.asarray(sim.indices[positions], dtype=np.int32)
+    stored_scores = np.asarray(sim.scores[positions], dtype=np.float32)
+    k = top_k if matrix is not None else min(top_k, stored_idx.shape[1])
+    keep = (stored_idx >= 0) & mask[np.maximum(stored_idx, 0)]
+    # ลำดับของเพื่อนบ้านที่ผ่าน filter ในแต่ละแถว (1, 2, ...) ใช้เลือก k ตัวแรกโดยไม่ต้องวน
+    rank = np.cumsum(keep, axis=1)
+    take = keep & (rank <= k)
+    rows, cols = np.nonzero(take)
+    indices = np.full((len(positions), k), -1, dtype=np.int32)
+    scores = np.full((len(positions), k), -np.inf, dtype=np.float32)
+    indices[rows, rank[rows, cols] - 1] = stored_idx[rows, cols]
+    scores[rows, rank[rows, cols] - 1] = stored_scores[rows, cols]
+
+    candidates = np.flatnonzero(mask)
+    need = np.minimum(k, len(candidates) - mask[positions])
+    short = take.sum(axis=1) < need
+    if short.any():
+        if matrix is None:
+            logger.warning(f"⚠️ {int(short.sum())} filtered queries have fewer than {k} stored matches "
+                           "and no matrix to score the rest")
+        else:
+            indices[short], scores[short] = _topk_from_candidates(matrix, positions[short], candidates, k)
+    return indices, scores
+
+def topk_for_positions(positions, sim, top_k, mask=None, matrix=None):
+    """Top-K neighbor positions and scores for known row positions.
+
+    mask (a boolean array over titles, e.g. from model.filters.mask) keeps
+    only matching titles during selection; see _filter_topk for top-K
+    indexes, where matrix enables the exact fallback.
+    """
+    if isinstance(sim, TopKNeighbors):
+        if top_k > sim.indices.shape[1] and (mask is None or matrix is None):
+            logger.warning(f"⚠️ Index stores only {sim.indices.shape[1]} neighbors per title")
+        if mask is not None:
+            return _filter_topk(sim, positions, top_k, mask, matrix)
+        k = min(top_k, sim.indices.shape[1])
+        return (np.asarray(sim.indices[positions, :k], dtype=np.int32),
+                np.asarray(sim.scores[positions, :k], dtype=np.float32))
+    return _topk_from_dense(sim, positions, top_k, mask)
+
+def get_recommendations_batch(titles, df, sim, index_map, top_k=5, as_frame=False, mask=None, matrix=None):
+    """Get recommendations for many titles in one vectorized call.
+
+    Returns BatchRecommendations(query, indices, scores): row positions of the
+    queries (-1 if unknown) and (n_queries, top_k) neighbor positions and
+    scores, padded with -1 / NaN. With as_frame=True the result is a long
+    DataFrame with one row per (source_title, rank) instead. mask and
+    matrix restrict results to matching titles (see topk_for_positions).
+    """
+    titles = [titles] if isinstance(titles, str) else list(titles)
+    positions = _lookup_positions(titles, index_map)
+    found = positions >= 0
+
+    found_idx, found_scores = topk_for_positions(positions[found], sim, top_k, mask, matrix)
+    k = found_idx.shape[1]
+
+    indices = np.full((len(titles), k), -1, dtype=np.int32)
+    scores = np.full((len(titles), k), np.nan, dtype=np.float32)
+    indices[found] = found_idx
+    scores[found] = np.where(found_idx >= 0, found_scores, np.nan)
+    result = BatchRecommendations(positions, indices, scores)
+
+    if as_frame:
+        return recommendations_to_frame(titles, result, df)
+    return result
+
+def recommendations_to_frame(titles, result, df, columns=RECOMMENDATION_COLUMNS):
+    """Flatten a BatchRecommendations result into a long DataFrame."""
+    valid = result.indices >= 0
+    query_rows, ranks = np.nonzero(valid)
+    frame = take_rows(df, result.indices[valid], columns).reset_index(drop=True)
+    frame.insert(0, 'rank', ranks + 1)
+    frame.insert(0, 'source_title', np.asarray(titles, dtype=object)[query_rows])
+    frame['similarity_score'] = result.scores[valid]
+    return frame
+
+def get_recommendations(title, df, sim, index_map, top_k=5, mask=None, matrix=None):
+    """Get content recommendations based on similarity.
+
+    For filtered results pass mask=model.filters.mask(type="Movie", max_rating="TV-14", min_year=2016)
+    and matrix=model.scoring_matrix from src.artifacts.open_artifacts.
+    """
     title = title.strip()
     
     if title not in index_map:
@@ -36,25 +200,74 @@ def get_recommendations(title, df, sim, index_map, top_k=5):
         return None
     
     try:
-        idx = index_map[title]
-        scores = list(enumerate(sim[idx]))
-        scores = sorted(scores, key=lambda x: x[1], reverse=True)
-        top_idx = [i[0] for i in scores[1:top_k+1]]
+        result = get_recommendations_batch([title], df, sim, index_map, top_k=top_k,
+                                           mask=mask, matrix=matrix)
+        valid = result.indices[0] >= 0
+        top_idx = result.indices[0][valid]
         
-        result = df.iloc[top_idx][['title', 'type', 'release_year', 'rating', 'listed_in', 'description']].copy()
-        result['similarity_score'] = [scores[i+1][1] for i in range(len(top_idx))]
+        recs = take_rows(df, top_idx, RECOMMENDATION_COLUMNS)
+        recs['similarity_score'] = result.scores[0][valid]
         
-        return result
+        return recs
         
     except Exception as e:
         logger.error(f"❌ Failed to get recommendations: {e}")
         return None
 
-def search_titles(query, df):
-    """Search for titles containing the query string."""
+def get_text_recommendations_batch(queries, vectorizer, matrix, top_k=5, ann=None):
+    """Score free-text queries against the stored TF-IDF matrix.
+
+    Queries are transformed with the saved vectorizer and scored with one
+    sparse product against the L2-normalized matrix; top-K selection uses
+    argpartition. With an ann index (e.g. model.ann) only its candidates
+    are scored. Returns BatchRecommendations with query=-1 for every row,
+    and positions with zero score are reported as padding (-1 / NaN).
+    """
+    queries = [queries] if isinstance(queries, str) else list(queries)
+    Q = vectorizer.transform(queries)
+    if ann is not None:
+        indices, top_scores = ann.query(Q, top_k)
+    else:
+        scores = (matrix @ Q.T).T.toarray().astype(np.float32)
+        indices, top_scores = select_topk(scores, top_k)
+    empty = ~(top_scores > 0)
+    indices[empty] = -1
+    top_scores[empty] = np.nan
+    return BatchRecommendations(np.full(len(queries), -1, dtype=np.int64), indices, top_scores)
+
+def get_text_recommendations(query, df, vectorizer, matrix, top_k=5, ann=None):
+    """Get recommendations for an arbitrary text query, e.g. "korean crime thriller"."""
     try:
+        result = get_text_recommendations_batch([query], vectorizer, matrix, top_k=top_k, ann=ann)
+        valid = result.indices[0] >= 0
+        if not valid.any():
+            logger.warning(f"❌ No known terms in query: {query}")
+            return None
+        
+        recs = take_rows(df, result.indices[0][valid], RECOMMENDATION_COLUMNS)
+        recs['similarity_score'] = result.scores[0][valid]
+        return recs
+        
+    except Exception as e:
+        logger.error(f"❌ Failed to get text recommendations: {e}")
+        return None
+
+def search_titles(query, df, index=None, limit=20):
+    """Search titles; with a TitleSearchIndex, matches are ranked prefix/substring/typo-tolerant hits."""
+    try:
+        if index is not None:
+            positions, scores, kinds = index.search(query, limit)
+            matches = take_rows(df, positions, SEARCH_COLUMNS)
+            matches['match'] = kinds
+            matches['match_score'] = scores
+            return matches.reset_index(drop=True)
         matches = df[df['title'].str.contains(query, case=False, na=False)]
-        return matches[['title', 'type', 'release_year', 'rating']].head(20)
+        return matches[SEARCH_COLUMNS].head(limit)
     except Exception as e:
         logger.error(f"❌ Search failed: {e}")
-        return pd.DataFrame()
\ No newline at end of file
+        return pd.DataFrame()
+
+def suggest_titles(title, df, index, limit=5):
+    """Closest catalog titles for a title that has no exact match."""
+    positions, _, _ = index.search(title, limit)
+    return take_rows(df, positions, ['title'])['title'].tolist()
@@ -0,0 +1,203 @@
+import cProfile
+import functools
+import io
+import os
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+import pandas as pd
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+PROFILE_DIR = Path("outputs/profiles")
+SAMPLE_INTERVAL = 0.05
+PROFILE_TOP = 40
+
+# stage ที่บันทึกไว้ใน process นี้ (ลำดับตามที่จบ)
+RECORDS = []
+_lock = threading.Lock()
+_local = threading.local()
+# เปิด cProfile ได้จาก env ด้วย เช่น NETFLIX_PROFILE=build_tfidf,preprocess
+_profile_stages = {s.strip() for s in os.environ.get("NETFLIX_PROFILE", "").split(",") if s.strip()}
+
+def enable_profiling(stages):
+    """Dump a cProfile of these stages (names as passed to track/instrumented)."""
+    _profile_stages.update(stages)
+
+def _rss_mb():
+    """Current resident memory of this process; psutil where /proc is unavailable, else None."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import psutil
+    except ImportError:
+        return None
+    return psutil.Process().memory_info().rss / 1024 / 1024
+
+class _RssSampler:
+    """Background thread that keeps the peak RSS of every open stage window.
+
+    Sampling (instead of resetting the kernel's peak counter) keeps windows
+    of stages that run concurrently in the pipeline independent; the value
+    is the process RSS, so overlapping stages see each other's memory.
+    """
+
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        self.interval = interval
+        self.windows = {}
+        self.cond = threading.Condition()
+        self.thread = None
+
+    def _run(self):
+        while True:
+            with self.cond:
+                while not self.windows:
+                    self.cond.wait()
+                windows = list(self.windows.values())
+            rss = _rss_mb()
+            for window in windows:
+                window["peak"] = max(window["peak"], rss)
+            time.sleep(self.interval)
+
+    def open(self):
+        rss = _rss_mb()
+        window = {"start": rss, "peak": rss}
+        if rss is None:
+            return window
+        with self.cond:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name="rss-sampler", daemon=True)
+                self.thread.start()
+            self.windows[id(window)] = window
+            self.cond.notify()
+        return window
+
+    def close(self, window):
+        if window["start"] is None:
+            return window
+        with self.cond:
+            self.windows.pop(id(window), None)
+        window["peak"] = max(window["peak"], _rss_mb())
+        return window
+
+_sampler = _RssSampler()
+
+def _children_cpu():
+    t = os.times()
+    return t.children_user + t.children_system
+
+def _start_profiler(stage):
+    if stage not in _profile_stages:
+        return None
+    # profile ซ้อนกันใน thread เดียวจะทับ hook ของตัวนอก จึงข้ามตัวใน
+    if getattr(_local, "profiling", None):
+        logger.warning(f"⚠️ '{_local.profiling}' is already being profiled, not profiling '{stage}'")
+        return None
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Python 3.12+: มี profiler อื่นทำงานอยู่แล้วใน thread อื่น
+        logger.warning(f"⚠️ Another profiler is active, not profiling '{stage}'")
+        return None
+    _local.profiling = stage
+    return profiler
+
+def _dump_profile(profiler, stage):
+    profiler.disable()
+    _local.profiling = None
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    path = PROFILE_DIR / f"{stage}.prof"
+    profiler.dump_stats(path)
+    text = io.StringIO()
+    pstats.Stats(profiler, stream=text).sort_stats("cumulative").print_stats(PROFILE_TOP)
+    path.with_suffix(".txt").write_text(text.getvalue(), encoding="utf-8")
+    return path
+
+@contextmanager
+def track(stage, rows=None):
+    """Record wall time, CPU time, peak RSS and rows processed for a block of code.
+
+    Yields the record dict, so the block can fill in "rows" once it knows.
+    CPU time is the calling thread's, plus worker processes that finished
+    during the block ("children_cpu_s").
+    """
+    record = {"stage": stage, "rows": rows}
+    window = _sampler.open()
+    profiler = _start_profiler(stage)
+    wall, cpu, children = time.perf_counter(), time.thread_time(), _children_cpu()
+    try:
+        yield record
+    finally:
+        wall = time.perf_counter() - wall
+        record.update({
+            "wall_s": wall,
+            "cpu_s": time.thread_time() - cpu,
+            "children_cpu_s": _children_cpu() - children,
+        })
+        if profiler is not None:
+            record["profile"] = str(_dump_profile(profiler, stage))
+        window = _sampler.close(window)
+        record["peak_rss_mb"] = window["peak"]
+        record["rss_delta_mb"] = None if window["start"] is None else window["peak"] - window["start"]
+        if record["rows"]:
+            record["rows_per_s"] = record["rows"] / wall if wall > 0 else None
+        with _lock:
+            RECORDS.append(record)
+        peak = f", peak RSS {record['peak_rss_mb']:.0f} MB" if record["peak_rss_mb"] is not None else ""
+        logger.info(f"⏱️ {stage}: {wall:.2f}s wall, {record['cpu_s']:.2f}s CPU{peak}")
+
+def _count_rows(result, args):
+    """Rows processed: the DataFrame returned, else the DataFrame passed first."""
+    if isinstance(result, pd.DataFrame):
+        return len(result)
+    if args and isinstance(args[0], pd.DataFrame):
+        return len(args[0])
+    return None
+
+def instrumented(func=None, *, stage=None):
+    """Decorator form of track(); the stage name defaults to the function name."""
+    if func is None:
+        return functools.partial(instrumented, stage=stage)
+    name = stage or func.__name__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with track(name) as record:
+            result = func(*args, **kwargs)
+            record["rows"] = _count_rows(result, args)
+        return result
+    return wrapper
+
+def reset():
+    with _lock:
+        RECORDS.clear()
+
+METRIC_FIELDS = ["wall_s", "cpu_s", "children_cpu_s", "peak_rss_mb", "rss_delta_mb", "rows", "rows_per_s"]
+
+def log_to_mlflow(records=None):
+    """Log stage records to the active MLflow run as <stage>.<field> metrics plus JSON/profile artifacts.
+
+    A stage that ran several times is logged with one step per call.
+    """
+    import mlflow
+    records = list(RECORDS if records is None else records)
+    steps = {}
+    for record in records:
+        step = steps.get(record["stage"], 0)
+        steps[record["stage"]] = step + 1
+        for field in METRIC_FIELDS:
+            if record.get(field) is not None:
+                mlflow.log_metric(f"{record['stage']}.{field}", float(record[field]), step=step)
+        if record.get("profile"):
+            mlflow.log_artifact(record["profile"], "instrumentation/profiles")
+            mlflow.log_artifact(str(Path(record["profile"]).with_suffix(".txt")), "instrumentation/profiles")
+    mlflow.log_dict({"stages": records}, "instrumentation/stages.json")
+    return records
@@ -1,30 +1,129 @@
 import pandas as pd
+import codecs
+import time
 from pathlib import Path
+from src.instrument import instrumented
 import logging
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def load_netflix(path="data/netflix_titles.csv"):
-    """Load Netflix dataset with encoding fallback handling."""
-    file_path = Path(path)
-    if not file_path.exists():
-        raise FileNotFoundError(f"❌ Error: File not found at {file_path}. Please check the 'data' folder.")
-    
-    encodings = ['utf-8', 'latin1', 'iso-8859-1', 'cp1252']
-    
-    for encoding in encodings:
+ENCODING_SAMPLE_BYTES = 1 << 20
+DEFAULT_CHUNKSIZE = 100_000
+
+# คอลัมน์ที่มีค่าซ้ำมากเก็บเป็น category; ข้อความอื่นเป็น str
+CATEGORICAL_COLUMNS = ["type", "rating", "country"]
+NETFLIX_SCHEMA = {
+    "show_id": str,
+    "type": "category",
+    "title": str,
+    "director": str,
+    "cast": str,
+    "country": "category",
+    "date_added": str,
+    "release_year": "Int64",
+    "rating": "category",
+    "duration": str,
+    "listed_in": str,
+    "description": str,
+}
+
+def detect_encoding(path, sample_bytes=ENCODING_SAMPLE_BYTES):
+    """Guess the file encoding from the first sample_bytes: UTF-8 (with or without BOM), else cp1252, else latin1."""
+    with open(path, "rb") as f:
+        sample = f.read(sample_bytes)
+    if sample.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    for encoding in ("utf-8", "cp1252"):
         try:
-            df = pd.read_csv(file_path, encoding=encoding)
-            logger.info(f"✅ Successfully loaded data using '{encoding}' encoding.")
-            return df
+            # final=False: ตัวอักษรหลายไบต์ที่ถูกตัดตรงท้าย sample ไม่นับว่าผิด
+            codecs.getincrementaldecoder(encoding)().decode(sample, final=False)
+            return encoding
         except UnicodeDecodeError:
             continue
-        except Exception as e:
-            logger.error(f"❌ Error loading file: {e}")
-            raise
-            
-    raise ValueError(f"❌ Failed to decode file {path} with common encodings.")
+    return "latin1"
+
+def parser_engine():
+    """pyarrow's multithreaded CSV parser when installed, otherwise pandas' C parser."""
+    try:
+        import pyarrow  # noqa: F401
+        return "pyarrow"
+    except ImportError:
+        return "c"
+
+def _schema_for(file_path, encoding):
+    """NETFLIX_SCHEMA restricted to the columns present in the file header."""
+    header = pd.read_csv(file_path, encoding=encoding, nrows=0).columns
+    return {col: dtype for col, dtype in NETFLIX_SCHEMA.items() if col in header}
+
+def _finish_types(df):
+    """release_year is read as nullable Int64; keep plain int64 unless values are missing."""
+    if "release_year" in df.columns and str(df["release_year"].dtype) == "Int64":
+        has_na = df["release_year"].isna().any()
+        df["release_year"] = df["release_year"].astype("float64" if has_na else "int64")
+    return df
+
+def _untyped_memory(df):
+    """Bytes the categorical columns would take as plain strings."""
+    total = df.memory_usage(deep=True).sum()
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            plain = df[col].astype(df[col].cat.categories.dtype)
+            total += plain.memory_usage(deep=True, index=False) - df[col].memory_usage(deep=True, index=False)
+    return int(total)
+
+@instrumented
+def load_netflix(path="data/netflix_titles.csv", engine=None):
+    """Load Netflix dataset in one pass with a detected encoding and an explicit schema."""
+    file_path = Path(path)
+    if not file_path.exists():
+        raise FileNotFoundError(f"❌ Error: File not found at {file_path}. Please check the 'data' folder.")
+
+    start = time.perf_counter()
+    encoding = detect_encoding(file_path)
+    engine = engine or parser_engine()
+    schema = _schema_for(file_path, encoding)
+
+    try:
+        df = pd.read_csv(file_path, encoding=encoding, dtype=schema, engine=engine)
+    except UnicodeDecodeError:
+        # sample ผ่านแต่ส่วนหลังของไฟล์ไม่ใช่ UTF-8; latin1 อ่านได้ทุกไบต์
+        logger.warning(f"⚠️ '{encoding}' failed past the sample, re-reading as latin1")
+        encoding = "latin1"
+        df = pd.read_csv(file_path, encoding=encoding, dtype=schema, engine=engine)
+    except Exception as e:
+        logger.error(f"❌ Error loading file: {e}")
+        raise
+    df = _finish_types(df)
+
+    df.attrs["load_info"] = {
+        "path": str(file_path),
+        "encoding": encoding,
+        "engine": engine,
+        "seconds": time.perf_counter() - start,
+        "memory_mb": df.memory_usage(deep=True).sum() / 1024 / 1024,
+        "untyped_memory_mb": _untyped_memory(df) / 1024 / 1024,
+    }
+    logger.info(f"✅ Successfully loaded data using '{encoding}' encoding ({engine} parser).")
+    return df
+
+def iter_netflix(path="data/netflix_titles.csv", chunksize=DEFAULT_CHUNKSIZE):
+    """Yield typed DataFrame chunks of a CSV that may not fit in memory.
+
+    Uses the C parser (pyarrow has no chunked mode); each chunk gets its
+    own categories, so concatenate with pandas.api.types.union_categoricals
+    or convert to str when combining chunks.
+    """
+    file_path = Path(path)
+    if not file_path.exists():
+        raise FileNotFoundError(f"❌ Error: File not found at {file_path}. Please check the 'data' folder.")
+
+    encoding = detect_encoding(file_path)
+    schema = _schema_for(file_path, encoding)
+    with pd.read_csv(file_path, encoding=encoding, dtype=schema, engine="c",
+                     chunksize=chunksize) as reader:
+        for chunk in reader:
+            yield _finish_types(chunk)
 
 def get_data_info(df):
     """Display basic data information."""
@@ -37,4 +136,10 @@ def get_data_info(df):
     logger.info(f"\nData Types:\n{df.dtypes}")
     logger.info(f"\nMissing Values:\n{df.isnull().sum()}")
     logger.info(f"\nMemory Usage: {df.memory_usage(deep=True).sum() / 1024 / 1024:.2f} MB")
-    logger.info("="*60 + "\n")
\ No newline at end of file
+    load_info = df.attrs.get("load_info")
+    if load_info:
+        logger.info(f"Load Time: {load_info['seconds']:.3f}s "
+                    f"({load_info['engine']} parser, {load_info['encoding']})")
+        logger.info(f"Memory Before Typing: {load_info['untyped_memory_mb']:.2f} MB | "
+                    f"After: {load_info['memory_mb']:.2f} MB")
+    logger.info("="*60 + "\n")
@@ -3,7 +3,16 @@ from sklearn.metrics.pairwise import cosine_similarity
 import joblib
 import json
 import numpy as np
+import scipy.sparse as sp
 from pathlib import Path
+from src.similarity import TopKNeighbors, topk_neighbors, DEFAULT_TOP_K, DEFAULT_BLOCK_SIZE
+from src.artifacts import save_array, write_artifacts, write_manifest
+from src.ann import LSHIndex, ann_topk_neighbors
+from src.embedding import SVDEmbedding, embedding_topk_neighbors
+from src.title_search import write_title_search
+from src.similarity_stats import similarity_stats
+from src.quantize import encode_similarity, check_ranking, storage_bytes
+from src.instrument import instrumented
 import logging
 
 logging.basicConfig(level=logging.INFO)
@@ -12,8 +21,95 @@ logger = logging.getLogger(__name__)
 MODEL_DIR = Path("outputs/models")
 MODEL_DIR.mkdir(parents=True, exist_ok=True)
 
-def build_tfidf(df, max_features=5000):
-    """Build TF-IDF model and calculate similarity matrix."""
+DENSE_FILES = ["tfidf_similarity.npy"]
+TOPK_FILES = ["tfidf_topk_indices.npy", "tfidf_topk_scores.npy"]
+SIM_STATS_FILE = "similarity_stats.json"
+
+def _remove_stale(files):
+    """Remove artifacts of the other similarity mode so inference never mixes them."""
+    for name in files:
+        (MODEL_DIR / name).unlink(missing_ok=True)
+
+OOV_SAMPLE = 5000
+
+def oov_rate(vectorizer, texts, sample=OOV_SAMPLE):
+    """Share of (non stop-word) tokens that fall outside the vocabulary, on an even sample of texts."""
+    texts = list(texts)
+    if len(texts) > sample:
+        texts = [texts[i] for i in np.linspace(0, len(texts) - 1, sample).astype(int)]
+    analyzer = vectorizer.build_analyzer()
+    vocab = vectorizer.vocabulary_
+    total = known = 0
+    for text in texts:
+        tokens = analyzer(text)
+        total += len(tokens)
+        known += sum(1 for t in tokens if t in vocab)
+    return 1 - known / total if total else 0.0
+
+def _save_npz(path, X):
+    tmp = path.with_name("tmp_" + path.name)
+    sp.save_npz(tmp, X.tocsr(), compressed=False)
+    tmp.replace(path)
+
+def save_model(df, vectorizer, X, sim, mode, top_k=None, precision="float32", **manifest_fields):
+    """Write every model artifact for df and the manifest that describes them.
+
+    precision="float16" or "uint8" stores the similarity scores (and top-K
+    neighbor ids, as uint16 when possible) in compact form; the manifest
+    records the encoding and a ranking-preservation check.
+    """
+    joblib.dump(vectorizer, MODEL_DIR / "tfidf_vectorizer.pkl")
+    # แถวของ TF-IDF ถูก normalize แบบ L2 แล้ว (norm="l2") ใช้ dot product เป็น cosine ได้เลย
+    _save_npz(MODEL_DIR / "tfidf_matrix.npz", X)
+
+    encoded, encoding = encode_similarity(sim, precision)
+    quantization = None
+    if precision != "float32":
+        quantization = {**check_ranking(sim, encoded, encoding),
+                        "bytes": storage_bytes(encoded), "float32_bytes": storage_bytes(sim)}
+        logger.info(f"  🗜️ {precision} scores: {quantization['float32_bytes'] / 1024 / 1024:.1f} MB -> "
+                    f"{quantization['bytes'] / 1024 / 1024:.1f} MB, "
+                    f"max error {quantization['max_abs_error']:.4f}")
+
+    if mode == "topk":
+        save_array(MODEL_DIR / "tfidf_topk_indices.npy", encoded.indices)
+        save_array(MODEL_DIR / "tfidf_topk_scores.npy", encoded.scores)
+        _remove_stale(DENSE_FILES)
+    else:
+        save_array(MODEL_DIR / "tfidf_similarity.npy", encoded)
+        _remove_stale(TOPK_FILES)
+
+    index_map = {title: i for i, title in enumerate(df["title"])}
+    with open(MODEL_DIR / "tfidf_index_map.json", "w", encoding="utf-8") as f:
+        json.dump(index_map, f, ensure_ascii=False, indent=2)
+
+    write_artifacts(df, mode, top_k=top_k, model_dir=MODEL_DIR)
+    return write_manifest(MODEL_DIR, tfidf_matrix="tfidf_matrix.npz",
+                          title_search=write_title_search(df["title"].tolist(), MODEL_DIR),
+                          score_encoding=encoding, quantization=quantization,
+                          **manifest_fields)
+
+@instrumented
+def build_tfidf(df, max_features=5000, mode="dense", top_k=DEFAULT_TOP_K,
+                block_size=DEFAULT_BLOCK_SIZE, n_jobs=None, engine="exact", ann_params=None,
+                embed_params=None, precision="float32"):
+    """Build TF-IDF model and calculate similarity matrix.
+
+    mode="dense" stores the full N x N matrix; mode="topk" stores only the
+    top_k neighbors and scores per title, computed block by block on
+    n_jobs worker processes (-1 = all cores). engine="lsh" (topk only)
+    finds neighbors through an LSH index (ann_params are LSHIndex options)
+    and saves the index for free-text queries. engine="svd" (topk only)
+    projects the rows to a float32 TruncatedSVD embedding (embed_params are
+    SVDEmbedding options), saves it and ranks neighbors by blocked dense
+    products, reporting recall@K against the exact TF-IDF neighbors.
+    precision is the stored score precision (see save_model).
+    """
+    if mode not in ("dense", "topk"):
+        raise ValueError(f"❌ Unknown similarity mode: {mode}")
+    if engine not in ("exact", "lsh", "svd") or (engine != "exact" and mode != "topk"):
+        raise ValueError(f"❌ Engine '{engine}' is not available for mode '{mode}'")
+
     logger.info("\n🤖 Building TF-IDF Model...")
     
     try:
@@ -28,16 +124,36 @@ def build_tfidf(df, max_features=5000):
         X = vectorizer.fit_transform(texts)
         logger.info(f"  📐 TF-IDF Matrix Shape: {X.shape}")
         
-        logger.info("  🔢 Calculating Cosine Similarity...")
-        sim = cosine_similarity(X)
+        ann_spec = embed_spec = None
+        if engine == "lsh":
+            index = LSHIndex(**(ann_params or {})).fit(X)
+            logger.info(f"  🔢 Approximate Top-{top_k} Neighbors with LSH {index.params}...")
+            sim = ann_topk_neighbors(X, top_k, index)
+            ann_spec = index.save(MODEL_DIR)
+        elif engine == "svd":
+            embedding = SVDEmbedding(**(embed_params or {})).fit(X)
+            logger.info(f"  🔢 Top-{top_k} Neighbors on {embedding.embeddings.shape[1]}-d SVD embeddings "
+                        f"({embedding.explained_variance:.1%} variance)...")
+            sim, report = embedding_topk_neighbors(X, top_k, embedding, block_size=block_size)
+            embed_spec = {**embedding.save(MODEL_DIR), "report": report}
+        elif mode == "topk":
+            logger.info(f"  🔢 Calculating Top-{top_k} Neighbors (block size {block_size})...")
+            sim = topk_neighbors(X, top_k=top_k, block_size=block_size, n_jobs=n_jobs)
+        else:
+            logger.info("  🔢 Calculating Cosine Similarity...")
+            sim = cosine_similarity(X)
 
         logger.info("  💾 Saving model artifacts...")
-        joblib.dump(vectorizer, MODEL_DIR / "tfidf_vectorizer.pkl")
-        np.save(MODEL_DIR / "tfidf_similarity.npy", sim)
-
-        index_map = {title: i for i, title in enumerate(df["title"])}
-        with open(MODEL_DIR / "tfidf_index_map.json", "w", encoding="utf-8") as f:
-            json.dump(index_map, f, ensure_ascii=False, indent=2)
+        save_model(
+            df, vectorizer, X, sim, mode, top_k=top_k, precision=precision,
+            max_features=max_features,
+            fit_n_docs=len(texts),
+            fit_oov_rate=oov_rate(vectorizer, texts),
+            updates_since_fit=0,
+            engine=engine,
+            ann=ann_spec,
+            embedding=embed_spec
+        )
 
         logger.info("  ✅ Model saved successfully.\n")
         return vectorizer, sim
@@ -46,24 +162,36 @@ def build_tfidf(df, max_features=5000):
         logger.error(f"❌ Failed to build TF-IDF model: {e}")
         raise
 
-def analyze_model_performance(df, sim):
-    """Analyze model metrics."""
+@instrumented
+def analyze_model_performance(df, sim, sample=None, block_size=DEFAULT_BLOCK_SIZE, stats_file=None):
+    """Analyze model metrics.
+
+    Mean/std/min/max and p50/p90/p99 of the pairwise similarities (dense)
+    or of the stored neighbor scores (top-K), in one blocked pass. With
+    sample=n they are estimated from n random scores, with 95% bounds.
+    stats_file, if given, receives the summary and histogram as JSON.
+    """
     logger.info("📈 Analyzing model performance...")
     
     try:
-        avg_sim = np.mean(sim[np.triu_indices_from(sim, k=1)])
-        max_sim = np.max(sim[np.triu_indices_from(sim, k=1)])
-        min_sim = np.min(sim[np.triu_indices_from(sim, k=1)])
-        
-        logger.info(f"  Avg Similarity: {avg_sim:.4f}")
-        logger.info(f"  Max Similarity: {max_sim:.4f}")
-        logger.info(f"  Min Similarity: {min_sim:.4f}")
-        
-        return {
-            'avg_similarity': avg_sim,
-            'max_similarity': max_sim,
-            'min_similarity': min_sim
-        }
+        summary, stats = similarity_stats(sim, block_size=block_size, sample=sample)
+        if not stats.n:
+            logger.warning("⚠️ No similarity scores to analyze")
+            return {}
+        # top-K มีเฉพาะคะแนนของเพื่อนบ้าน จึงรายงานแยกชื่อ metric
+        suffix = "topk_similarity" if isinstance(sim, TopKNeighbors) else "similarity"
+        names = {"mean": "avg", "mean_ci95": "avg_ci95", "sampled": "sample_size"}
+        metrics = {f"{names.get(key, key)}_{suffix}": value
+                   for key, value in summary.items() if key != "count"}
+
+        logger.info(f"  {'Estimated from ' if sample else ''}{stats.n:,} scores")
+        for key, value in metrics.items():
+            logger.info(f"  {key}: {value:.4f}")
+
+        if stats_file is not None:
+            with open(stats_file, "w", encoding="utf-8") as f:
+                json.dump({"summary": summary, "histogram": stats.histogram()}, f, indent=2)
+        return metrics
     except Exception as e:
         logger.error(f"❌ Failed to analyze model: {e}")
-        return {}
\ No newline at end of file
+        return {}
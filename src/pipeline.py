@@ -0,0 +1,181 @@
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from pathlib import Path
+from src.instrument import track
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+STATE_FILE = Path("outputs/pipeline_state.json")
+HASH_CHUNK = 1 << 20
+
+class Stage:
+    """One pipeline step.
+
+    run(results) computes the stage and returns its in-memory result;
+    results maps each dependency name to that dependency's result.
+    load(results), if given, recovers the result of a fresh stage without
+    recomputing it (e.g. by reading its output file) for stale dependants.
+    inputs are files/directories whose content is part of the fingerprint,
+    params are JSON-serializable settings that change the outputs.
+    exclusive marks stages that start their own process pool over all
+    cores; two exclusive stages never run at the same time.
+    """
+
+    def __init__(self, name, run, deps=(), inputs=(), outputs=(), params=None, load=None,
+                 exclusive=False):
+        self.name = name
+        self.run = run
+        self.deps = list(deps)
+        self.inputs = [Path(p) for p in inputs]
+        self.outputs = [Path(p) for p in outputs]
+        self.params = params or {}
+        self.load = load
+        self.exclusive = exclusive
+
+def hash_path(path):
+    """Content hash of a file, or of every file under a directory; None if missing."""
+    path = Path(path)
+    if not path.exists():
+        return None
+    files = sorted(p for p in path.rglob("*") if p.is_file()) if path.is_dir() else [path]
+    digest = hashlib.blake2b(digest_size=16)
+    for file in files:
+        digest.update(str(file.relative_to(path) if path.is_dir() else file.name).encode("utf-8"))
+        with open(file, "rb") as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+def fingerprint(stage, upstream):
+    """Hash of the stage's params, input contents and its dependencies' fingerprints."""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(json.dumps({
+        "stage": stage.name,
+        "params": stage.params,
+        "inputs": {str(p): hash_path(p) for p in stage.inputs},
+        "deps": {d: upstream[d] for d in stage.deps},
+    }, sort_keys=True, default=str).encode("utf-8"))
+    return digest.hexdigest()
+
+def _read_state(path):
+    if not Path(path).exists():
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def _write_state(path, state):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp, path)
+
+def _topological(stages):
+    by_name = {s.name: s for s in stages}
+    order, seen = [], set()
+
+    def visit(name, trail=()):
+        if name in trail:
+            raise ValueError(f"❌ Pipeline cycle: {' -> '.join(trail + (name,))}")
+        if name in seen:
+            return
+        for dep in by_name[name].deps:
+            if dep not in by_name:
+                raise ValueError(f"❌ Stage '{name}' depends on unknown stage '{dep}'")
+            visit(dep, trail + (name,))
+        seen.add(name)
+        order.append(by_name[name])
+
+    for stage in stages:
+        visit(stage.name)
+    return order
+
+def _is_fresh(stage, fp, record):
+    """Fresh if the fingerprint matches and every output still has the content the stage wrote."""
+    if not record or record.get("fingerprint") != fp:
+        return False
+    outputs = record.get("outputs", {})
+    return all(outputs.get(str(p)) is not None and outputs.get(str(p)) == hash_path(p)
+               for p in stage.outputs)
+
+def run_pipeline(stages, force=(), max_workers=3, state_file=STATE_FILE):
+    """Run only the stale stages of a DAG, independent stages concurrently (exclusive ones one at a time).
+
+    force names stages to run even when fresh ("all" forces every stage).
+    Returns {stage: {"status": "ran" | "skipped", "seconds": ...}}.
+    """
+    stages = _topological(stages)
+    state = _read_state(state_file)
+    force = {s.name for s in stages} if "all" in force else set(force)
+
+    fingerprints, stale = {}, {}
+    for stage in stages:
+        fingerprints[stage.name] = fingerprint(stage, fingerprints)
+        stale[stage.name] = (stage.name in force
+                             or not _is_fresh(stage, fingerprints[stage.name], state.get(stage.name)))
+
+    results, report = {}, {}
+
+    def needed(name):
+        """Result of a dependency: computed this run, or loaded from a fresh stage's outputs."""
+        if name not in results:
+            dep = next(s for s in stages if s.name == name)
+            results[name] = dep.load({d: needed(d) for d in dep.deps}) if dep.load else None
+        return results[name]
+
+    def execute(stage):
+        start = time.perf_counter()
+        logger.info(f"▶️ Stage '{stage.name}' started")
+        with track(stage.name):
+            value = stage.run({d: results[d] for d in stage.deps})
+        return value, time.perf_counter() - start
+
+    pending = [s for s in stages if stale[s.name]]
+    for stage in stages:
+        if not stale[stage.name]:
+            report[stage.name] = {"status": "skipped", "seconds": 0.0}
+            logger.info(f"⏭️ Stage '{stage.name}' is up to date, skipped")
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        running = {}
+        while pending or running:
+            for stage in list(pending):
+                if any(stale[d] and d not in report for d in stage.deps):
+                    continue
+                # process pool สองชุดที่ใช้ทุก core พร้อมกันจะแย่ง CPU กันเป็น 2 เท่า
+                if stage.exclusive and any(s.exclusive for s in running.values()):
+                    continue
+                # dependency ที่ไม่ได้รันรอบนี้ โหลดผลลัพธ์จาก output เดิม
+                for dep in stage.deps:
+                    needed(dep)
+                pending.remove(stage)
+                running[executor.submit(execute, stage)] = stage
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage = running.pop(future)
+                try:
+                    value, seconds = future.result()
+                except Exception:
+                    logger.error(f"❌ Stage '{stage.name}' failed")
+                    for other in running:
+                        other.cancel()
+                    raise
+                results[stage.name] = value
+                report[stage.name] = {"status": "ran", "seconds": seconds}
+                state[stage.name] = {
+                    "fingerprint": fingerprints[stage.name],
+                    "outputs": {str(p): hash_path(p) for p in stage.outputs},
+                    "finished_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                    "seconds": seconds,
+                }
+                _write_state(state_file, state)
+                logger.info(f"✅ Stage '{stage.name}' finished in {seconds:.1f}s")
+
+    return report
@@ -1,10 +1,18 @@
 import pandas as pd
 import re
+from src.instrument import instrumented
 import logging
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# whitespace ตาม str.isspace() (ยกเว้น " ") เขียนเป็น class ที่ใช้ได้ทั้ง re และ RE2 ของ pyarrow string
+_SPACE_CHARS = "\t\n\x0b\x0c\r\x1c-\x1f\x85\xa0\u1680\u2000-\u200a\u2028\u2029\u202f\u205f\u3000"
+# แทนเฉพาะช่วงที่ต้องเปลี่ยนจริง (ช่องว่างติดกัน หรือ whitespace ที่ไม่ใช่ " ") เร็วกว่า \s+ ที่ match ทุกช่องว่าง
+_WHITESPACE = f"[ {_SPACE_CHARS}]{{2,}}|[{_SPACE_CHARS}]"
+
+TEXT_COLUMNS = ["title", "listed_in", "description", "cast", "director"]
+
 def clean_text(text):
     """Clean text data."""
     if not isinstance(text, str):
@@ -14,11 +22,42 @@ def clean_text(text):
     text = text.strip()
     return text
 
-def validate_data(df: pd.DataFrame) -> dict:
+def clean_text_series(values: pd.Series) -> pd.Series:
+    """Vectorized clean_text over a string Series (non-strings become "")."""
+    return (
+        values.str.replace("\u0130", "i\u0307", regex=False)  # str.lower() ขยาย İ เป็น 2 ตัวอักษร
+        .str.lower()
+        .str.replace(_WHITESPACE, " ", regex=True)
+        .str.strip(" ")
+        .fillna("")
+    )
+
+def _as_text(values: pd.Series) -> pd.Series:
+    """Categorical columns (see load_data.NETFLIX_SCHEMA) as plain strings for .str operations."""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return values.astype(values.cat.categories.dtype)
+    return values
+
+def _fill(values: pd.Series, value) -> pd.Series:
+    """fillna that also works on categoricals whose categories lack the fill value."""
+    if isinstance(values.dtype, pd.CategoricalDtype) and value not in values.cat.categories:
+        values = values.cat.add_categories([value])
+    return values.fillna(value)
+
+def _map_unique(values: pd.Series, func) -> pd.Series:
+    """Apply a column-wise func to the distinct values only and broadcast the result back."""
+    codes, uniques = pd.factorize(values)
+    result = func(pd.Series(uniques, dtype=values.dtype)).reindex(codes)
+    result.index = values.index
+    return result
+
+def validate_data(df: pd.DataFrame, duplicated=None) -> dict:
     """Validate data quality and return report."""
+    if duplicated is None:
+        duplicated = df.duplicated(subset=['show_id'])
     report = {
         'total_rows': len(df),
-        'duplicates': df.duplicated(subset=['show_id']).sum(),
+        'duplicates': duplicated.sum(),
         'missing_critical': {},
         'invalid_years': 0,
         'empty_text': 0
@@ -30,62 +69,71 @@ def validate_data(df: pd.DataFrame) -> dict:
             report['missing_critical'][col] = df[col].isnull().sum()
     
     if 'release_year' in df.columns:
-        invalid_years = df['release_year'].apply(
-            lambda x: x < 1900 or x > 2030 if pd.notna(x) else False
-        )
-        report['invalid_years'] = invalid_years.sum()
+        years = df['release_year']
+        report['invalid_years'] = ((years < 1900) | (years > 2030)).sum()
     
     return report
 
+def derive_columns(df: pd.DataFrame) -> dict:
+    """Every derived column of preprocess(), computed with column-wise string/array operations."""
+    country_first = _as_text(df["country"]).str.replace(r"(?s),.*", "", regex=True).str.strip().fillna("Unknown")
+
+    # date_added/duration มีค่าไม่ซ้ำไม่กี่พันค่า แปลงครั้งเดียวต่อค่าแล้วกระจายกลับ
+    date_added = _map_unique(df['date_added'], lambda v: pd.to_datetime(v, errors='coerce'))
+    year_added = date_added.dt.year
+    month_added = date_added.dt.month
+    if year_added.notna().any():
+        year_added = year_added.fillna(year_added.median())
+        month_added = month_added.fillna(6)
+
+    text = df[TEXT_COLUMNS[0]].fillna("")
+    for col in TEXT_COLUMNS[1:]:
+        text = text + " " + df[col].fillna("")
+
+    duration = df["duration"].fillna("Unknown")
+    return {
+        "country_first": country_first,
+        "date_added": date_added,
+        "year_added": year_added,
+        "month_added": month_added,
+        "text": clean_text_series(text),
+        "rating": _fill(df["rating"], "UR"),
+        "duration": duration,
+        "duration_value": _map_unique(
+            duration, lambda v: v.str.extract(r'(\d+)', expand=False).astype(float)),
+        "has_director": df['director'].notna().astype(int),
+        "has_cast": df['cast'].notna().astype(int),
+        "genre_count": df['listed_in'].fillna("").str.count(',') + 1,
+    }
+
+def _fix_release_years(years: pd.Series) -> pd.Series:
+    """Replace out-of-range years with the median (below 1900 first, then above 2030)."""
+    for invalid in (years < 1900, years > 2030):
+        # แทนค่าเฉพาะเมื่อมีปีผิดจริง เพื่อไม่ให้ batch เล็กๆ ที่ median เป็นทศนิยมเปลี่ยน dtype
+        if invalid.any():
+            years = years.copy()
+            years[invalid] = years.median()
+    return years
+
+@instrumented
 def preprocess(df: pd.DataFrame) -> pd.DataFrame:
     """Clean and preprocess the dataframe for modeling and BI."""
     logger.info("🔄 Preprocessing data...")
     
-    validation = validate_data(df)
+    duplicated = df.duplicated(subset=['show_id'], keep='first')
+    validation = validate_data(df, duplicated)
     if validation['duplicates'] > 0:
         logger.warning(f"⚠️ Found {validation['duplicates']} duplicates")
+        df = df[~duplicated.to_numpy()]
+        logger.info(f"🗑️ Dropped {validation['duplicates']} duplicate rows")
     
-    initial_count = len(df)
-    df = df.drop_duplicates(subset=['show_id'], keep='first').copy()
-    if len(df) < initial_count:
-        logger.info(f"🗑️ Dropped {initial_count - len(df)} duplicate rows")
-    
-    df["country_first"] = df["country"].fillna("Unknown").apply(
-        lambda x: x.split(",")[0].strip() if isinstance(x, str) else "Unknown"
-    )
-    
-    df['date_added'] = pd.to_datetime(df['date_added'], errors='coerce')
-    df['year_added'] = df['date_added'].dt.year
-    df['month_added'] = df['date_added'].dt.month
-    
-    if df['year_added'].notna().any():
-        median_year = df['year_added'].median()
-        df['year_added'].fillna(median_year, inplace=True)
-        df['month_added'].fillna(6, inplace=True)
-    
-    df["text"] = (
-        df["title"].fillna("") + " " +
-        df["listed_in"].fillna("") + " " +
-        df["description"].fillna("") + " " +
-        df["cast"].fillna("") + " " +
-        df["director"].fillna("")
-    ).apply(clean_text)
+    derived = derive_columns(df)
+    df = df.assign(**derived, release_year=_fix_release_years(df['release_year']))
     
     empty_text = (df["text"].str.len() < 10).sum()
     if empty_text > 0:
         logger.warning(f"⚠️ Found {empty_text} items with minimal text content")
     
-    df["rating"] = df["rating"].fillna("UR")
-    df["duration"] = df["duration"].fillna("Unknown")
-    df['duration_value'] = df['duration'].str.extract(r'(\d+)').astype(float)
-    
-    df.loc[df['release_year'] < 1900, 'release_year'] = df['release_year'].median()
-    df.loc[df['release_year'] > 2030, 'release_year'] = df['release_year'].median()
-    
-    df['has_director'] = df['director'].notna().astype(int)
-    df['has_cast'] = df['cast'].notna().astype(int)
-    df['genre_count'] = df['listed_in'].fillna("").str.count(',') + 1
-    
     before_clean = len(df)
     df = df.dropna(subset=['title', 'type'])
     if len(df) < before_clean:
@@ -0,0 +1,195 @@
+import numpy as np
+from src.similarity import TopKNeighbors, select_topk
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+PRECISIONS = ("float32", "float16", "uint8")
+# ค่าสงวนของ uint8 = ช่องว่าง/-inf, uint16 = index -1
+UINT8_EMPTY = 255
+UINT8_LEVELS = 254
+UINT16_EMPTY = np.iinfo(np.uint16).max
+CHECK_SAMPLE = 1000
+CHECK_TOP_K = 10
+
+def index_dtype(n_items):
+    """Smallest neighbor-id dtype for a catalog: uint16 below 65,535 titles, else int32."""
+    return np.uint16 if n_items < UINT16_EMPTY else np.int32
+
+def encode_indices(indices, n_items):
+    indices = np.asarray(indices)
+    if index_dtype(n_items) is np.int32:
+        return indices.astype(np.int32)
+    return np.where(indices < 0, UINT16_EMPTY, indices).astype(np.uint16)
+
+def decode_indices(values):
+    values = np.asarray(values)
+    if values.dtype == np.uint16:
+        out = values.astype(np.int32)
+        out[values == UINT16_EMPTY] = -1
+        return out
+    return values.astype(np.int32, copy=False)
+
+def score_range(scores, chunk_rows=4096):
+    """(min, max) of the finite scores, read in row chunks (works on memmaps)."""
+    lo, hi = np.inf, -np.inf
+    for start in range(0, scores.shape[0], chunk_rows):
+        chunk = np.asarray(scores[start:start + chunk_rows], dtype=np.float32)
+        finite = chunk[np.isfinite(chunk)]
+        if len(finite):
+            lo, hi = min(lo, float(finite.min())), max(hi, float(finite.max()))
+    if lo > hi:
+        lo = hi = 0.0
+    return lo, hi
+
+def encode_scores(scores, precision, lo=None, hi=None):
+    """Scores in the given precision; uint8 maps [lo, hi] linearly onto 0..254 (255 = -inf)."""
+    scores = np.asarray(scores, dtype=np.float32)
+    if precision == "float32":
+        return scores
+    if precision == "float16":
+        return scores.astype(np.float16)
+    if precision != "uint8":
+        raise ValueError(f"❌ Unknown score precision: {precision}")
+    scale = UINT8_LEVELS / (hi - lo) if hi > lo else 0.0
+    finite = np.isfinite(scores)
+    out = np.full(scores.shape, UINT8_EMPTY, dtype=np.uint8)
+    out[finite] = np.rint((np.clip(scores[finite], lo, hi) - lo) * scale).astype(np.uint8)
+    return out
+
+def decode_scores(values, encoding=None):
+    """float32 scores back from any stored precision (encoding holds lo/hi for uint8)."""
+    values = np.asarray(values)
+    if values.dtype != np.uint8:
+        return values.astype(np.float32, copy=False)
+    lo, hi = encoding["lo"], encoding["hi"]
+    out = lo + values.astype(np.float32) * np.float32((hi - lo) / UINT8_LEVELS)
+    out[values == UINT8_EMPTY] = -np.inf
+    return out
+
+class DecodedArray:
+    """Read-only view of a stored (possibly memory-mapped) compact array.
+
+    Indexing decodes only the selected cells, so serving reads a few rows
+    of uint8/uint16 data and gets the usual float32/int32 values back.
+    """
+
+    def __init__(self, values, decode):
+        self.values = values
+        self.decode = decode
+
+    @property
+    def shape(self):
+        return self.values.shape
+
+    @property
+    def dtype(self):
+        return self.decode(self.values[:0]).dtype
+
+    @property
+    def nbytes(self):
+        return self.values.nbytes
+
+    def __len__(self):
+        return len(self.values)
+
+    def __getitem__(self, key):
+        return self.decode(self.values[key])
+
+    def __array__(self, dtype=None, copy=None):
+        out = self.decode(self.values)
+        return out if dtype is None else out.astype(dtype)
+
+def _chunks(array, chunk_rows=4096):
+    for start in range(0, array.shape[0], chunk_rows):
+        yield start, array[start:start + chunk_rows]
+
+def encode_similarity(sim, precision="float32"):
+    """Compact arrays for a TopKNeighbors index or a dense matrix, plus the manifest encoding.
+
+    Returns (encoded, encoding) where encoded has the same structure as sim.
+    Compact precisions also narrow top-K neighbor ids to uint16 when the
+    catalog allows; float32 keeps the arrays exactly as they are.
+    """
+    if precision not in PRECISIONS:
+        raise ValueError(f"❌ Unknown score precision: {precision}")
+    if precision == "float32":
+        return sim, {"precision": precision}
+    scores = sim.scores if isinstance(sim, TopKNeighbors) else sim
+    encoding = {"precision": precision}
+    if precision == "uint8":
+        encoding["lo"], encoding["hi"] = score_range(scores)
+    lo, hi = encoding.get("lo"), encoding.get("hi")
+
+    if isinstance(sim, TopKNeighbors):
+        n = sim.indices.shape[0]
+        encoding["index_dtype"] = np.dtype(index_dtype(n)).name
+        return TopKNeighbors(encode_indices(sim.indices, n),
+                             encode_scores(sim.scores, precision, lo, hi)), encoding
+    # dense ทีละ chunk ไม่ให้ต้องมีสำเนา float32 ทั้ง N x N เพิ่มอีกชุด
+    dtype = {"float32": np.float32, "float16": np.float16, "uint8": np.uint8}[precision]
+    encoded = np.empty(sim.shape, dtype=dtype)
+    for start, chunk in _chunks(sim):
+        encoded[start:start + len(chunk)] = encode_scores(chunk, precision, lo, hi)
+    return encoded, encoding
+
+def decoded_similarity(encoded, encoding=None):
+    """Wrap stored arrays so readers see int32 ids and float32 scores (float32 artifacts as they are)."""
+    if not encoding or encoding.get("precision", "float32") == "float32":
+        return encoded
+    if isinstance(encoded, TopKNeighbors):
+        return TopKNeighbors(DecodedArray(encoded.indices, decode_indices),
+                             DecodedArray(encoded.scores, lambda v: decode_scores(v, encoding)))
+    return DecodedArray(encoded, lambda v: decode_scores(v, encoding))
+
+def check_ranking(sim, encoded, encoding, sample=CHECK_SAMPLE, top_k=CHECK_TOP_K, seed=42):
+    """How well the compact encoding preserves rankings and scores.
+
+    Top-K: neighbor order is stored explicitly, so the check is that the
+    decoded scores never increase along a row (order_violations), how many
+    strictly ordered neighbors became ties (new_ties) and the largest score
+    error. Dense: top_k neighbors of sampled rows from the original and the
+    decoded matrix are compared (recall_at_k and rows with identical lists).
+    """
+    decoded = decoded_similarity(encoded, encoding)
+    if isinstance(sim, TopKNeighbors):
+        violations = ties = pairs = 0
+        max_error = 0.0
+        ids_equal = True
+        for (start, orig), (_, enc) in zip(_chunks(sim.scores), _chunks(encoded.scores)):
+            orig = np.asarray(orig, dtype=np.float32)
+            dec = decode_scores(enc, encoding)
+            finite = np.isfinite(orig)
+            max_error = max(max_error, float(np.abs(dec[finite] - orig[finite]).max(initial=0.0)))
+            valid = finite[:, 1:] & finite[:, :-1]
+            violations += int((np.diff(dec, axis=1) > 0)[valid].sum())
+            ties += int(((np.diff(dec, axis=1) == 0) & (np.diff(orig, axis=1) < 0))[valid].sum())
+            pairs += int(valid.sum())
+            stop = start + len(orig)
+            ids_equal &= bool(np.array_equal(decoded.indices[start:stop], np.asarray(sim.indices[start:stop])))
+        return {"precision": encoding["precision"], "ids_preserved": ids_equal,
+                "order_violations": violations, "new_ties": ties / pairs if pairs else 0.0,
+                "max_abs_error": max_error}
+
+    rng = np.random.default_rng(seed)
+    n = sim.shape[0]
+    rows = np.sort(rng.choice(n, size=min(sample, n), replace=False))
+    orig = np.array(sim[rows], dtype=np.float32)
+    dec = np.array(decoded[rows], dtype=np.float32)
+    max_error = float(np.abs(dec - orig).max(initial=0.0))
+    orig[np.arange(len(rows)), rows] = -np.inf
+    dec[np.arange(len(rows)), rows] = -np.inf
+    k = max(0, min(top_k, n - 1))
+    a, b = select_topk(orig, k)[0], select_topk(dec, k)[0]
+    hits = sum(len(np.intersect1d(x, y)) for x, y in zip(a, b))
+    return {"precision": encoding["precision"], "top_k": k, "sample": len(rows),
+            "recall_at_k": hits / a.size if a.size else 1.0,
+            "identical_rows": float((a == b).all(axis=1).mean()) if len(rows) else 1.0,
+            "max_abs_error": max_error}
+
+def storage_bytes(sim):
+    """Bytes the similarity arrays take on disk (and in RAM when fully read)."""
+    if isinstance(sim, TopKNeighbors):
+        return int(sim.indices.nbytes + sim.scores.nbytes)
+    return int(sim.nbytes)
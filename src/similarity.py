@@ -0,0 +1,145 @@
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import os
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DEFAULT_TOP_K = 50
+DEFAULT_BLOCK_SIZE = 1024
+
+TopKNeighbors = namedtuple("TopKNeighbors", ["indices", "scores"])
+
+def select_topk(block, k):
+    """Select top-k columns per row, ordered by score desc then column index asc.
+
+    Ties are broken by the lowest column index, which is the same order a
+    stable descending sort over the full row would give.
+    """
+    n_rows, n_cols = block.shape
+    k = min(k, n_cols)
+    if k <= 0:
+        return (np.empty((n_rows, 0), dtype=np.int32),
+                np.empty((n_rows, 0), dtype=np.float32))
+
+    part = np.argpartition(-block, k - 1, axis=1)[:, :k]
+    threshold = np.take_along_axis(block, part, axis=1).min(axis=1)[:, None]
+
+    above = block > threshold
+    at_threshold = block == threshold
+    missing = k - above.sum(axis=1, keepdims=True)
+    selected = above | (at_threshold & (np.cumsum(at_threshold, axis=1) <= missing))
+
+    cols = np.nonzero(selected)[1].reshape(n_rows, k)
+    scores = np.take_along_axis(block, cols, axis=1)
+    order = np.argsort(-scores, axis=1, kind="stable")
+
+    return (np.take_along_axis(cols, order, axis=1).astype(np.int32),
+            np.take_along_axis(scores, order, axis=1).astype(np.float32))
+
+def topk_block(X, start, stop, top_k):
+    """Compute top-k cosine neighbors for rows [start, stop) of an L2-normalized matrix."""
+    block = (X[start:stop] @ X.T).toarray()
+    rows = np.arange(stop - start)
+    block[rows, rows + start] = -np.inf  # ไม่แนะนำเรื่องตัวเอง
+    return select_topk(block, top_k)
+
+def topk_rows(X, rows, top_k, block_size=DEFAULT_BLOCK_SIZE):
+    """Top-k neighbors of the given rows against all rows of an L2-normalized matrix."""
+    rows = np.asarray(rows, dtype=np.int64)
+    k = max(0, min(top_k, X.shape[0] - 1))
+    indices = np.empty((len(rows), k), dtype=np.int32)
+    scores = np.empty((len(rows), k), dtype=np.float32)
+    for start in range(0, len(rows), block_size):
+        chunk = rows[start:start + block_size]
+        block = (X[chunk] @ X.T).toarray()
+        block[np.arange(len(chunk)), chunk] = -np.inf
+        indices[start:start + len(chunk)], scores[start:start + len(chunk)] = select_topk(block, k)
+    return indices, scores
+
+def merge_topk(indices, scores, cand_indices, cand_scores, k):
+    """Merge candidate neighbors into existing top-k lists (same ordering rules as select_topk).
+
+    All arrays are 2-D with one row per query; -1 marks an empty slot.
+    """
+    all_idx = np.concatenate([indices, cand_indices], axis=1)
+    all_scores = np.concatenate([scores, cand_scores], axis=1).astype(np.float32)
+    all_scores[all_idx < 0] = -np.inf
+    # ตำแหน่งว่างเรียงไว้ท้ายสุด
+    tie_key = np.where(all_idx < 0, np.iinfo(np.int64).max, all_idx)
+    order = np.lexsort((tie_key, -all_scores), axis=1)[:, :k]
+    return (np.take_along_axis(all_idx, order, axis=1).astype(np.int32),
+            np.take_along_axis(all_scores, order, axis=1))
+
+_worker_X = None
+
+def _init_worker(X):
+    """Keep one copy of the matrix per worker process instead of one per tile."""
+    global _worker_X
+    _worker_X = X
+
+def _topk_task(args):
+    start, stop, top_k = args
+    return start, topk_block(_worker_X, start, stop, top_k)
+
+def resolve_n_jobs(n_jobs):
+    """Translate an n_jobs setting (None, 1, N, -1 = all cores) to a worker count."""
+    cpu_count = os.cpu_count() or 1
+    if n_jobs is None:
+        return 1
+    if n_jobs < 0:
+        return max(1, cpu_count + 1 + n_jobs)
+    return max(1, n_jobs)
+
+def topk_neighbors(X, top_k=DEFAULT_TOP_K, block_size=DEFAULT_BLOCK_SIZE, n_jobs=None):
+    """Compute top-k cosine neighbors for every row, one row block at a time.
+
+    Peak memory is about block_size * n_rows * 4 bytes per worker instead of
+    the n_rows * n_rows matrix that cosine_similarity would allocate. With
+    n_jobs > 1 the row blocks are computed in a process pool and each worker
+    only sends back its per-row top-k.
+    """
+    # import ตอนใช้งาน เพื่อไม่ให้ฝั่ง inference ต้องโหลด sklearn ตอนเริ่มต้น
+    from sklearn.preprocessing import normalize
+
+    X = normalize(X).tocsr()
+    n = X.shape[0]
+    k = max(0, min(top_k, n - 1))
+    workers = resolve_n_jobs(n_jobs)
+
+    indices = np.empty((n, k), dtype=np.int32)
+    scores = np.empty((n, k), dtype=np.float32)
+    tiles = [(start, min(start + block_size, n), k) for start in range(0, n, block_size)]
+
+    if workers == 1 or len(tiles) == 1:
+        for start, stop, _ in tiles:
+            indices[start:stop], scores[start:stop] = topk_block(X, start, stop, k)
+        return TopKNeighbors(indices, scores)
+
+    logger.info(f"  ⚙️ Computing {len(tiles)} tiles on {workers} workers")
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(X,)) as executor:
+        for start, (idx, sc) in executor.map(_topk_task, tiles):
+            indices[start:start + len(idx)] = idx
+            scores[start:start + len(sc)] = sc
+
+    return TopKNeighbors(indices, scores)
+
+def dense_topk_neighbors(E, top_k=DEFAULT_TOP_K, block_size=DEFAULT_BLOCK_SIZE):
+    """Top-k cosine neighbors of every row of a dense L2-normalized float32 matrix.
+
+    Each row block is one BLAS matrix product (block_size x n_rows scores),
+    which already uses every core, so there is no process pool here.
+    """
+    n = E.shape[0]
+    k = max(0, min(top_k, n - 1))
+    indices = np.empty((n, k), dtype=np.int32)
+    scores = np.empty((n, k), dtype=np.float32)
+    for start in range(0, n, block_size):
+        stop = min(start + block_size, n)
+        block = np.asarray(E[start:stop]) @ E.T
+        block[np.arange(stop - start), np.arange(start, stop)] = -np.inf  # ไม่แนะนำเรื่องตัวเอง
+        indices[start:stop], scores[start:stop] = select_topk(block, k)
+    return TopKNeighbors(indices, scores)
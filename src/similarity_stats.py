@@ -0,0 +1,166 @@
+import numpy as np
+from src.similarity import TopKNeighbors, DEFAULT_BLOCK_SIZE
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# histogram ครอบช่วง cosine [-1, 1]; quantile จาก histogram คลาดไม่เกินความกว้าง 1 bin (0.001)
+HIST_BINS = 2000
+HIST_RANGE = (-1.0, 1.0)
+QUANTILES = (0.5, 0.9, 0.99)
+Z_95 = 1.96
+# จำนวนคะแนนสูงสุดต่อ chunk (~100 MB ของ array ชั่วคราวใน update) ไม่ว่า catalog จะใหญ่แค่ไหน
+CHUNK_VALUES = 1 << 22
+
+class SimilarityStats:
+    """Running count/sum/min/max and a fixed-bin histogram of similarity scores.
+
+    update() takes any 1-D chunk of scores, so a matrix of any size is
+    summarized in one pass at the memory cost of the largest chunk.
+    """
+
+    def __init__(self, bins=HIST_BINS, value_range=HIST_RANGE):
+        self.low, self.high = value_range
+        self.counts = np.zeros(bins, dtype=np.int64)
+        self.n = 0
+        self.total = 0.0
+        self.total_sq = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+
+    @property
+    def edges(self):
+        return np.linspace(self.low, self.high, len(self.counts) + 1)
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[np.isfinite(values)]
+        if not len(values):
+            return self
+        self.n += len(values)
+        self.total += values.sum()
+        self.total_sq += np.dot(values, values)
+        self.min = min(self.min, values.min())
+        self.max = max(self.max, values.max())
+        bins = len(self.counts)
+        # ค่าที่เกินช่วงเล็กน้อยจาก floating point (เช่น 1.0000001) นับรวมใน bin ริม
+        pos = ((values - self.low) * (bins / (self.high - self.low))).astype(np.int64)
+        self.counts += np.bincount(np.clip(pos, 0, bins - 1), minlength=bins)
+        return self
+
+    @property
+    def mean(self):
+        return self.total / self.n
+
+    @property
+    def std(self):
+        return float(np.sqrt(max(0.0, self.total_sq / self.n - self.mean ** 2)))
+
+    def quantile(self, q):
+        """q-quantile interpolated inside its histogram bin, clamped to the exact min/max."""
+        target = q * self.n
+        cum = np.cumsum(self.counts)
+        b = int(np.searchsorted(cum, target, side="left"))
+        b = min(b, len(self.counts) - 1)
+        before = cum[b - 1] if b else 0
+        width = (self.high - self.low) / len(self.counts)
+        inside = (target - before) / self.counts[b] if self.counts[b] else 0.0
+        return float(np.clip(self.low + (b + inside) * width, self.min, self.max))
+
+    def summary(self, quantiles=QUANTILES):
+        if not self.n:
+            return {"count": 0}
+        result = {"count": self.n, "mean": float(self.mean), "std": self.std,
+                  "min": float(self.min), "max": float(self.max)}
+        for q in quantiles:
+            result[f"p{q * 100:g}"] = self.quantile(q)
+        return result
+
+    def histogram(self):
+        """Non-empty bins as {"edges": [...], "counts": [...]} (edges has one more entry)."""
+        used = np.nonzero(self.counts)[0]
+        if not len(used):
+            return {"edges": [], "counts": []}
+        lo, hi = used[0], used[-1] + 1
+        return {"edges": self.edges[lo:hi + 1].round(6).tolist(), "counts": self.counts[lo:hi].tolist()}
+
+def dense_pair_stats(sim, block_size=DEFAULT_BLOCK_SIZE):
+    """Stats over the upper triangle (i < j) of a dense N x N matrix, one row block at a time.
+
+    Works on np.memmap too: each block reads at most block_size rows and
+    CHUNK_VALUES scores, instead of the three N^2/2 index arrays and copies
+    of np.triu_indices_from.
+    """
+    n = sim.shape[0]
+    rows = max(1, min(block_size, CHUNK_VALUES // max(n, 1)))
+    stats = SimilarityStats()
+    for start in range(0, n - 1, rows):
+        stop = min(start + rows, n)
+        block = np.asarray(sim[start:stop, start + 1:])
+        upper = np.arange(start + 1, n)[None, :] > np.arange(start, stop)[:, None]
+        stats.update(block[upper])
+    return stats
+
+def topk_stats(sim, block_size=DEFAULT_BLOCK_SIZE):
+    """Stats over every stored neighbor score of a TopKNeighbors index (empty slots ignored)."""
+    n, k = sim.scores.shape
+    rows = max(1, min(block_size, CHUNK_VALUES // max(k, 1)))
+    stats = SimilarityStats()
+    for start in range(0, n, rows):
+        stats.update(sim.scores[start:start + rows])
+    return stats
+
+def sample_scores(sim, n_samples, seed=42):
+    """n_samples similarity scores drawn uniformly: pairs i < j of a dense matrix or stored top-K scores."""
+    rng = np.random.default_rng(seed)
+    if isinstance(sim, TopKNeighbors):
+        n, k = sim.scores.shape
+        flat = np.sort(rng.integers(0, n * k, n_samples))
+        values = np.asarray(sim.scores[flat // k, flat % k], dtype=np.float64)
+        return values[np.isfinite(values)]
+    n = sim.shape[0]
+    if n < 2:
+        return np.empty(0)
+    i = rng.integers(0, n, n_samples)
+    j = rng.integers(0, n - 1, n_samples)
+    j = j + (j >= i)  # สุ่ม j != i แบบสม่ำเสมอ
+    rows, cols = np.minimum(i, j), np.maximum(i, j)
+    order = np.lexsort((cols, rows))  # อ่านตามลำดับแถวเพื่อให้ memmap อ่านต่อเนื่อง
+    return np.asarray(sim[rows[order], cols[order]], dtype=np.float64)
+
+def sampled_stats(sim, n_samples, seed=42, quantiles=QUANTILES):
+    """Estimated summary from a uniform sample, with 95% bounds.
+
+    The mean gets a normal-approximation interval (mean_ci95 is the half
+    width); each quantile gets a distribution-free interval from the
+    binomial ranks of the sample order statistics (p50_lo, p50_hi, ...).
+    min/max are those of the sample and only bound the true range from inside.
+    """
+    values = np.sort(sample_scores(sim, n_samples, seed))
+    stats = SimilarityStats().update(values)
+    result = stats.summary(quantiles)
+    m = len(values)
+    if not m:
+        return result, stats
+    result["sampled"] = m
+    result["mean_ci95"] = float(Z_95 * stats.std / np.sqrt(m))
+    for q in quantiles:
+        key = f"p{q * 100:g}"
+        result[key] = float(np.quantile(values, q))
+        spread = Z_95 * np.sqrt(m * q * (1 - q))
+        result[f"{key}_lo"] = float(values[max(0, int(np.floor(q * m - spread)))])
+        result[f"{key}_hi"] = float(values[min(m - 1, int(np.ceil(q * m + spread)))])
+    return result, stats
+
+def similarity_stats(sim, block_size=DEFAULT_BLOCK_SIZE, sample=None, seed=42):
+    """Summary and histogram of a similarity model (dense matrix or TopKNeighbors).
+
+    sample=None scans every score in one blocked pass; sample=n estimates
+    from n uniformly drawn scores with error bounds (for catalogs too large
+    to scan). Returns (summary dict, SimilarityStats).
+    """
+    if sample:
+        return sampled_stats(sim, sample, seed)
+    stats = topk_stats(sim, block_size) if isinstance(sim, TopKNeighbors) else dense_pair_stats(sim, block_size)
+    return stats.summary(), stats
@@ -0,0 +1,169 @@
+import numpy as np
+import re
+import unicodedata
+from bisect import bisect_left
+from pathlib import Path
+from src.artifacts import save_array, _open_npy, _write_string_column
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SEARCH_DIR = "title_search"
+MIN_FUZZY_SIMILARITY = 0.3
+CANDIDATE_BUDGET = 512
+PREFIX_SCAN = 4
+
+# ลำดับคุณภาพของการ match (น้อย = ดีกว่า)
+MATCH_KINDS = ["exact", "prefix", "word_prefix", "substring", "fuzzy"]
+
+_NON_WORD = re.compile(r"[\W_]+")
+
+def normalize_title(title):
+    """Lowercase, strip accents and collapse punctuation/whitespace to single spaces."""
+    text = unicodedata.normalize("NFKD", str(title).lower())
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return _NON_WORD.sub(" ", text).strip()
+
+def _trigram_codes(text):
+    """Distinct character trigrams of text packed into int64 (21 bits per code point)."""
+    codes = {(ord(text[i]) << 42) | (ord(text[i + 1]) << 21) | ord(text[i + 2])
+             for i in range(len(text) - 2)}
+    return np.fromiter(codes, dtype=np.int64, count=len(codes))
+
+def write_title_search(titles, model_dir):
+    """Build the trigram inverted index and sorted prefix list for titles and save it."""
+    out_dir = Path(model_dir) / SEARCH_DIR
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    norms = [normalize_title(t) if isinstance(t, str) else "" for t in titles]
+    grams = [_trigram_codes(f" {n} ") for n in norms]
+    counts = np.fromiter((len(g) for g in grams), dtype=np.int32, count=len(grams))
+    codes = np.concatenate(grams) if grams else np.empty(0, dtype=np.int64)
+    owners = np.repeat(np.arange(len(norms), dtype=np.int32), counts)
+
+    order = np.lexsort((owners, codes))
+    codes, owners = codes[order], owners[order]
+    vocab, starts = np.unique(codes, return_index=True)
+    offsets = np.append(starts, len(codes)).astype(np.int64)
+
+    save_array(out_dir / "grams.npy", vocab)
+    save_array(out_dir / "gram_offsets.npy", offsets)
+    save_array(out_dir / "postings.npy", owners)
+    save_array(out_dir / "gram_counts.npy", counts)
+    save_array(out_dir / "sorted.npy", np.array(sorted(range(len(norms)), key=norms.__getitem__),
+                                                dtype=np.int32))
+    _write_string_column(np.array(norms, dtype=object), out_dir, "norm")
+    logger.info(f"  🔤 Title search index: {len(norms):,} titles, {len(vocab):,} trigrams")
+    return SEARCH_DIR
+
+class TitleSearchIndex:
+    """Prefix, substring and typo-tolerant title lookup over a persisted trigram index.
+
+    Prefix matches come from a sorted list of normalized titles; other
+    candidates are the titles sharing the most trigrams with the query.
+    Results are ranked by match kind (exact > prefix > word prefix >
+    substring > fuzzy), then trigram Dice similarity, then shorter title.
+    """
+
+    def __init__(self, path):
+        path = Path(path)
+        self.grams = np.asarray(_open_npy(path / "grams.npy"))
+        self.offsets = np.asarray(_open_npy(path / "gram_offsets.npy"))
+        self.postings = np.asarray(_open_npy(path / "postings.npy"))
+        self.counts = np.asarray(_open_npy(path / "gram_counts.npy"))
+        self.sorted = np.asarray(_open_npy(path / "sorted.npy"))
+        blob = np.asarray(_open_npy(path / "norm.blob.npy")).tobytes()
+        offsets = _open_npy(path / "norm.offsets.npy").tolist()
+        self.norms = [blob[a:b].decode("utf-8") for a, b in zip(offsets[:-1], offsets[1:])]
+        self.sorted_norms = [self.norms[i] for i in self.sorted.tolist()]
+
+    def __len__(self):
+        return len(self.norms)
+
+    def _prefix(self, norm, limit):
+        lo = bisect_left(self.sorted_norms, norm)
+        hi = lo
+        while hi < len(self.sorted_norms) and hi - lo < limit and self.sorted_norms[hi].startswith(norm):
+            hi += 1
+        return self.sorted[lo:hi]
+
+    def _shared_trigrams(self, codes, inner):
+        """Candidate titles and how many of the query trigrams each contains.
+
+        Candidates come from the rarest trigrams' posting lists, up to
+        CANDIDATE_BUDGET entries, always including the rarest trigram inside
+        the query so every substring match is found; counts are then
+        completed by binary search in the remaining posting lists.
+        """
+        slot = np.searchsorted(self.grams, codes)
+        found = slot < len(self.grams)
+        found[found] = self.grams[slot[found]] == codes[found]
+        if not found.any():
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.int64)
+        slot, is_inner = slot[found], np.isin(codes[found], inner)
+
+        sizes = self.offsets[slot + 1] - self.offsets[slot]
+        order = np.argsort(sizes, kind="stable")
+        probe = np.cumsum(sizes[order]) <= CANDIDATE_BUDGET
+        probe[0] = True
+        probe = order[probe]
+        if is_inner.any():
+            probe = np.union1d(probe, order[is_inner[order]][:1])
+
+        lists = [self.postings[self.offsets[s]:self.offsets[s + 1]] for s in slot.tolist()]
+        pos = np.unique(np.concatenate([lists[i] for i in probe.tolist()]))
+        shared = np.zeros(len(pos), dtype=np.int64)
+        for plist in lists:
+            i = np.searchsorted(plist, pos)
+            i[i == len(plist)] = 0
+            shared += plist[i] == pos
+        return pos, shared
+
+    def _kind(self, norm, title):
+        if title == norm:
+            return 0
+        if title.startswith(norm):
+            return 1
+        if f" {norm}" in f" {title}":
+            return 2
+        if norm in title:
+            return 3
+        return 4
+
+    def search(self, query, limit=20, min_similarity=MIN_FUZZY_SIMILARITY):
+        """Best matches as (positions, scores, kinds); score is trigram Dice similarity."""
+        norm = normalize_title(query)
+        if not norm:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32), []
+
+        codes = _trigram_codes(f" {norm} ")
+        prefix = self._prefix(norm, limit * PREFIX_SCAN)
+        if len(prefix) >= limit:
+            # prefix match อยู่อันดับเหนือกว่า substring/fuzzy เสมอ ไม่ต้องค้น trigram
+            # title ที่ขึ้นต้นด้วย query มี trigram ของ query ครบ ยกเว้นตัวปิดท้าย (ถ้าไม่ใช่ exact)
+            pos = prefix
+            shared = len(codes) - (self.counts[pos] != len(codes))
+        else:
+            pos, shared = self._shared_trigrams(codes, _trigram_codes(norm))
+        dice = 2 * shared / (len(codes) + self.counts[pos])
+        n_keep = min(len(pos), max(limit * 5, 50))
+        if len(pos) > n_keep:
+            # ตัวที่มี trigram ร่วมครบกว่าก่อน (substring) แล้วจึงดู Dice
+            keep = np.argpartition(-(shared + dice), n_keep - 1)[:n_keep]
+            pos, dice = pos[keep], dice[keep]
+        score = dict(zip(pos.tolist(), dice.tolist()))
+        for p in prefix.tolist():
+            score.setdefault(p, 0.0)
+
+        ranked = []
+        for p, s in score.items():
+            kind = self._kind(norm, self.norms[p])
+            if kind == 4 and s < min_similarity:
+                continue
+            ranked.append((kind, -s, len(self.norms[p]), p))
+        ranked.sort()
+        ranked = ranked[:limit]
+        return (np.array([r[3] for r in ranked], dtype=np.int64),
+                np.array([-r[1] for r in ranked], dtype=np.float32),
+                [MATCH_KINDS[r[0]] for r in ranked])
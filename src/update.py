@@ -0,0 +1,185 @@
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from src.artifacts import CATALOG_COLUMNS, open_artifacts, save_array, _open_npy
+from src.model_tfidf import build_tfidf, save_model, oov_rate
+from src.preprocess import preprocess
+from src.similarity import TopKNeighbors, topk_rows, merge_topk, DEFAULT_BLOCK_SIZE
+from src.ann import LSHIndex
+from src.instrument import instrumented
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+IDF_DRIFT_THRESHOLD = 0.05
+OOV_DRIFT_THRESHOLD = 0.05
+DF_DELTA_FILE = "tfidf_df_delta.npy"
+
+def _doc_freq(X):
+    """Number of documents containing each vocabulary term."""
+    return np.asarray((X > 0).sum(axis=0), dtype=np.float64).ravel()
+
+def _transform(vectorizer, texts):
+    """vectorizer.transform that also accepts an empty batch."""
+    if len(texts) == 0:
+        return sp.csr_matrix((0, len(vectorizer.vocabulary_)), dtype=np.float32)
+    return vectorizer.transform(texts)
+
+def measure_drift(vectorizer, manifest, df_delta, n_delta, new_texts):
+    """IDF and out-of-vocabulary drift of the current catalog relative to the last full fit.
+
+    idf_drift is the L1 change of the IDF vector (relative to the fitted one)
+    after adding every document inserted/changed since the fit;
+    oov_drift is how much more of the new text falls outside the vocabulary
+    than the fit corpus did.
+    """
+    idf = vectorizer.idf_.astype(np.float64)
+    n_fit = manifest["fit_n_docs"]
+    # smooth_idf: idf = ln((1 + n) / (1 + df)) + 1
+    df_fit = (1 + n_fit) / np.exp(idf - 1) - 1
+    n_now = n_fit + n_delta
+    idf_now = np.log((1 + n_now) / (1 + np.maximum(df_fit + df_delta, 0))) + 1
+    return {
+        "idf_drift": float(np.abs(idf_now - idf).sum() / idf.sum()),
+        "oov_drift": max(0.0, oov_rate(vectorizer, new_texts) - manifest.get("fit_oov_rate", 0.0))
+    }
+
+def _split_rows(catalog_df, new):
+    """Classify incoming rows by show_id into inserted, text-changed and metadata-only updates."""
+    existing = pd.Series(np.arange(len(catalog_df)), index=catalog_df["show_id"].to_numpy())
+    existing = existing[~existing.index.duplicated(keep="first")]
+    positions = new["show_id"].map(existing)
+    known = positions.notna().to_numpy()
+    positions = positions[known].astype(np.int64).to_numpy()
+
+    old_text = catalog_df["text"].to_numpy()[positions]
+    text_changed = new["text"].to_numpy()[known] != old_text
+    return known, positions, text_changed
+
+@instrumented
+def update_model(df_raw, idf_threshold=IDF_DRIFT_THRESHOLD, oov_threshold=OOV_DRIFT_THRESHOLD,
+                 block_size=DEFAULT_BLOCK_SIZE, n_jobs=None):
+    """Apply new or changed catalog rows (keyed by show_id) to the stored model.
+
+    Rows are transformed with the existing vocabulary and patched into the
+    TF-IDF matrix and top-K index; only affected titles, and titles whose
+    neighbor lists change, are re-scored. When vocabulary/IDF drift since
+    the last full fit passes a threshold the model is rebuilt from scratch.
+    """
+    model = open_artifacts()
+    manifest = model.manifest
+    if manifest["similarity_mode"] != "topk" or model.matrix is None \
+            or "text" not in manifest["catalog_columns"] or "fit_n_docs" not in manifest:
+        raise ValueError("❌ Incremental update needs a topk model with tfidf_matrix.npz. "
+                         "Run 'python main.py --mode topk' first.")
+
+    logger.info("\n🔁 Incremental model update...")
+    new = preprocess(df_raw).reset_index(drop=True)
+    catalog_df = model.catalog.take(None).reset_index(drop=True)
+    known, changed_pos, text_changed = _split_rows(catalog_df, new)
+    inserted = new[~known]
+    changed = new[known]
+    logger.info(f"  ➕ {len(inserted):,} new | ✏️ {len(changed):,} updated "
+                f"({int(text_changed.sum()):,} with new text)")
+
+    merged = catalog_df.copy()
+    cols = [c for c in CATALOG_COLUMNS if c in merged.columns and c in new.columns]
+    for col in cols:
+        merged.loc[changed_pos, col] = changed[col].to_numpy()
+    merged = pd.concat([merged, inserted[cols]], ignore_index=True)
+
+    vectorizer = model.vectorizer
+    X_old = model.matrix
+    retexted = changed_pos[text_changed]
+    X_retexted = _transform(vectorizer, changed["text"][text_changed].tolist())
+    X_inserted = _transform(vectorizer, inserted["text"].tolist())
+
+    # สะสม document frequency ที่เปลี่ยนไปตั้งแต่ fit ครั้งล่าสุด
+    df_delta = np.zeros(X_old.shape[1])
+    if manifest.get("df_delta"):
+        df_delta += np.asarray(_open_npy(model.model_dir / manifest["df_delta"]))
+    df_delta += _doc_freq(X_retexted) + _doc_freq(X_inserted) - _doc_freq(X_old[retexted])
+    n_delta = manifest.get("df_delta_docs", 0) + len(inserted)
+
+    drift = measure_drift(vectorizer, manifest, df_delta, n_delta,
+                          pd.concat([inserted["text"], changed["text"][text_changed]]).tolist())
+    logger.info(f"  📏 IDF drift: {drift['idf_drift']:.4f} | OOV drift: {drift['oov_drift']:.4f}")
+
+    embedding = manifest.get("embedding")
+    precision = (manifest.get("score_encoding") or {}).get("precision", "float32")
+    drifted = drift["idf_drift"] > idf_threshold or drift["oov_drift"] > oov_threshold
+    if drifted or embedding:
+        if drifted:
+            logger.warning("⚠️ Drift above threshold, rebuilding the full model")
+        else:
+            # SVD components ขึ้นกับทั้ง catalog จึงไม่ patch ทีละแถว
+            logger.info("  📉 Model uses SVD embeddings, rebuilding the full model")
+        ann = manifest.get("ann")
+        build_tfidf(merged, max_features=manifest["max_features"], mode="topk",
+                    top_k=manifest["top_k"], block_size=block_size, n_jobs=n_jobs,
+                    engine=manifest.get("engine", "exact"),
+                    ann_params={k: ann[k] for k in ("n_tables", "n_bits", "n_probes", "seed")} if ann else None,
+                    embed_params={k: embedding[k] for k in ("dims", "seed")} if embedding else None,
+                    precision=precision)
+        return {"mode": "rebuild", "inserted": len(inserted), "updated": len(changed), **drift}
+
+    n_old, n_total = X_old.shape[0], len(merged)
+    X = sp.vstack([X_old, X_retexted, X_inserted]).tocsr()
+    row_map = np.arange(n_old)
+    row_map[retexted] = n_old + np.arange(len(retexted))
+    X = X[np.concatenate([row_map, n_old + len(retexted) + np.arange(len(inserted))])]
+
+    sim = model.sim
+    k = sim.indices.shape[1]
+    indices = np.full((n_total, k), -1, dtype=np.int32)
+    scores = np.full((n_total, k), -np.inf, dtype=np.float32)
+    indices[:n_old] = sim.indices
+    scores[:n_old] = sim.scores
+
+    affected = np.concatenate([retexted, np.arange(n_old, n_total)]).astype(np.int64)
+    # แถวที่มีเพื่อนบ้านเป็นเรื่องที่ข้อความเปลี่ยน คะแนนเดิมใช้ไม่ได้แล้ว ต้องคำนวณใหม่ทั้งแถว
+    dirty = np.flatnonzero(np.isin(indices[:n_old], retexted).any(axis=1))
+    recompute = np.union1d(affected, dirty)
+    if len(recompute):
+        indices[recompute], scores[recompute] = topk_rows(X, recompute, k, block_size)
+
+    others = np.setdiff1d(np.arange(n_old), recompute)
+    patched = 0
+    if len(affected):
+        X_affected_T = X[affected].T.tocsc()
+        for start in range(0, len(others), block_size):
+            rows = others[start:start + block_size]
+            cand_scores = (X[rows] @ X_affected_T).toarray().astype(np.float32)
+            hit = (cand_scores.max(axis=1) > scores[rows, -1]) | (indices[rows, -1] < 0)
+            if not hit.any():
+                continue
+            rows, cand_scores = rows[hit], cand_scores[hit]
+            cand_idx = np.broadcast_to(affected, cand_scores.shape)
+            indices[rows], scores[rows] = merge_topk(indices[rows], scores[rows],
+                                                     cand_idx, cand_scores, k)
+            patched += len(rows)
+
+    logger.info(f"  🔢 Re-scored {len(recompute):,} titles, patched {patched:,} neighbor lists")
+    ann_spec = manifest.get("ann")
+    if ann_spec:
+        # hash แถวใหม่ด้วย hyperplanes ชุดเดิม (seed เดิม) ให้ index ครอบคลุมทั้ง catalog
+        params = {k: ann_spec[k] for k in ("n_tables", "n_bits", "n_probes", "seed")}
+        ann_spec = LSHIndex(**params).fit(X).save(model.model_dir, ann_spec["prefix"])
+    save_array(model.model_dir / DF_DELTA_FILE, df_delta)
+    save_model(
+        merged, vectorizer, X, TopKNeighbors(indices, scores), "topk", top_k=manifest["top_k"],
+        precision=precision,
+        max_features=manifest["max_features"],
+        fit_n_docs=manifest["fit_n_docs"],
+        fit_oov_rate=manifest.get("fit_oov_rate", 0.0),
+        updates_since_fit=manifest.get("updates_since_fit", 0) + 1,
+        df_delta=DF_DELTA_FILE,
+        df_delta_docs=n_delta,
+        last_drift=drift,
+        engine=manifest.get("engine", "exact"),
+        ann=ann_spec
+    )
+    logger.info("  ✅ Model updated.\n")
+    return {"mode": "incremental", "inserted": len(inserted), "updated": len(changed),
+            "rescored": len(recompute), "patched": patched, **drift}